@@ -31,8 +31,10 @@ ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
 SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 """
 
+__version__ = "0.5.0"
 
-from .mdparser import PlueprintExtension
+from .mdparser import PlueprintExtension, APIBlueprint, BlueprintParser, \
+    parse
 
 
 def makeExtension(**kwargs):
@@ -1,20 +1,33 @@
 import argparse
 import codecs
-from markdown import Markdown
+import os
 import pickle
+import sys
 
+from .batch import collect_inputs, parse_files
+from .cache import BlueprintCache, DEFAULT_CACHE_DIR
+from .mdparser import ENGINES, parse
+from .profiling import ParseProfile
 
-def main():
-    parser = argparse.ArgumentParser()
-    parser.add_argument("-o", "--output", help="Output pickle file path",
-                        default=None)
-    parser.add_argument("input", help="Input API Blueprint file")
-    args = parser.parse_args()
-    with codecs.open(args.input, "r", "utf-8") as fin:
+
+def report_diagnostics(api):
+    if api.diagnostics:
+        sys.stderr.write(api.diagnostics.format() + "\n")
+
+
+def parse_single(args):
+    with codecs.open(args.input[0], "r", "utf-8") as fin:
         txt = fin.read()
-    m = Markdown(extensions=["plueprint"])
-    m.set_output_format("apiblueprint")
-    api = m.convert(txt)
+    if args.profile or args.profile_memory:
+        # the cached blueprints are not profiled
+        api = parse(txt, args.engine, ParseProfile(args.profile_memory))
+        sys.stderr.write("%s\n" % api.profile)
+    elif args.cache is not None:
+        cache = BlueprintCache(args.cache, args.cache_size * 1024 * 1024)
+        api = cache.parse(txt, args.engine)
+    else:
+        api = parse(txt, args.engine)
+    report_diagnostics(api)
     if args.output is not None:
         with open(args.output, "wb") as fout:
             pickle.dump(api, fout, protocol=-1)
@@ -30,5 +43,223 @@ def main():
                 for a in r:
                     print("      %s" % a)
 
+
+def parse_batch(args):
+    combined = {}
+    failed = 0
+    root = os.path.dirname(os.path.commonprefix(collect_inputs(args.input)))
+    for result in parse_files(
+            args.input, args.jobs, args.cache,
+            args.cache_size * 1024 * 1024, args.engine):
+        sys.stderr.write("%s\n" % result)
+        if not result.ok:
+            failed += 1
+            continue
+        if args.output is None:
+            print("%s: %s" % (result.path, result.api))
+        elif args.combined:
+            combined[result.path] = result.api
+        else:
+            name = os.path.join(args.output, os.path.splitext(
+                os.path.relpath(result.path, root))[0] + ".pickle")
+            if not os.path.isdir(os.path.dirname(name)):
+                os.makedirs(os.path.dirname(name))
+            with open(name, "wb") as fout:
+                fout.write(result.data)
+    if args.output is not None and args.combined:
+        with open(args.output, "wb") as fout:
+            pickle.dump(combined, fout, protocol=-1)
+    if failed:
+        sys.stderr.write("%d file(s) failed\n" % failed)
+        sys.exit(1)
+
+
+def serve_main(argv):
+    from .server import serve
+
+    parser = argparse.ArgumentParser(
+        prog="python -m plueprint serve",
+        description="Mock HTTP server which answers with the responses "
+                    "documented in the blueprint. Send \"Prefer: status=NNN\" "
+                    "to choose the response.")
+    parser.add_argument("--host", default="127.0.0.1",
+                        help="Address to listen on")
+    parser.add_argument("-p", "--port", type=int, default=3000,
+                        help="Port to listen on")
+    parser.add_argument("-w", "--workers", type=int, default=1,
+                        help="Number of processes sharing the port")
+    parser.add_argument("--engine", choices=ENGINES, default="markdown",
+                        help="Parsing engine")
+    parser.add_argument("input", help="Input API Blueprint file")
+    args = parser.parse_args(argv)
+    with codecs.open(args.input, "r", "utf-8") as fin:
+        api = parse(fin.read(), args.engine)
+    report_diagnostics(api)
+    sys.stderr.write("Serving %s on http://%s:%d\n" % (
+        api, args.host, args.port))
+    serve(api, args.host, args.port, args.workers)
+
+
+def compile_main(argv):
+    from .compiled import dump
+
+    parser = argparse.ArgumentParser(
+        prog="python -m plueprint compile",
+        description="Writes the compiled blueprint artifact which is loaded "
+                    "lazily by plueprint.compiled.load().")
+    parser.add_argument("-o", "--output", required=True,
+                        help="Output artifact file path")
+    parser.add_argument("--engine", choices=ENGINES, default="markdown",
+                        help="Parsing engine")
+    parser.add_argument("input", help="Input API Blueprint file")
+    args = parser.parse_args(argv)
+    with codecs.open(args.input, "r", "utf-8") as fin:
+        api = parse(fin.read(), args.engine)
+    report_diagnostics(api)
+    dump(api, args.output)
+
+
+def routes_main(argv):
+    from .compiled import load
+
+    parser = argparse.ArgumentParser(
+        prog="python -m plueprint routes",
+        description="Lists the routes of the compiled blueprint or finds the "
+                    "route which serves the request path.")
+    parser.add_argument("-m", "--method", default=None,
+                        help="HTTP method of the request")
+    parser.add_argument("--show", action="store_true",
+                        help="Print the matched action")
+    parser.add_argument("--match", dest="path", default=None,
+                        help="Request path to match, e.g. /users/42")
+    parser.add_argument("input", help="Compiled blueprint file")
+    args = parser.parse_args(argv)
+    with load(args.input) as compiled:
+        if args.path is None:
+            for route in compiled.routes:
+                if args.method is None or route.request_method == args.method:
+                    print("%-7s %s\t>%s>%s>%s" % (
+                        route.request_method, route.uri_template,
+                        route.group or "", route.resource, route.action))
+            return
+        try:
+            route, variables = compiled.match_route(args.path, args.method)
+        except KeyError:
+            sys.stderr.write("No route matches %s\n" % args.path)
+            sys.exit(1)
+        print("%-7s %s\t>%s>%s>%s" % (
+            route.request_method, route.uri_template, route.group or "",
+            route.resource, route.action))
+        for name, value in sorted(variables.items()):
+            print("  %s = %s" % (name, value))
+        if args.show:
+            action = compiled.action(route.group, route.resource,
+                                     route.action)
+            print(action)
+            for code, responses in action.responses.items():
+                for response in responses:
+                    print("  %s" % response)
+
+
+def bench_main(argv):
+    import json
+    from .benchmark import MIN_COMPARED_REPEAT, SIZES, \
+        IncomparableResultsError, compare, format_regressions, \
+        format_results, run
+
+    parser = argparse.ArgumentParser(
+        prog="python -m plueprint bench",
+        description="Benchmarks parsing, route matching and pickling of the "
+                    "synthetic blueprints of several sizes.")
+    parser.add_argument("-s", "--sizes", nargs="+", choices=list(SIZES),
+                        default=None, help="Sizes to run (default: all)")
+    parser.add_argument("--engine", choices=ENGINES, default="markdown",
+                        help="Parsing engine")
+    parser.add_argument("-r", "--repeat", type=int, default=None,
+                        help="The median of this many runs is reported "
+                        "(default: 3, %d with --compare)" %
+                        MIN_COMPARED_REPEAT)
+    parser.add_argument("--lookups", type=int, default=10000,
+                        help="Number of the measured route lookups")
+    parser.add_argument("-o", "--output", default=None,
+                        help="Write the results to this JSON file")
+    parser.add_argument("--compare", default=None,
+                        help="Baseline JSON file written by -o; exit with "
+                        "code 1 if any metric is worse beyond the noise")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="Relative change which counts as a regression")
+    args = parser.parse_args(argv)
+    if args.repeat is None:
+        args.repeat = 3 if args.compare is None else MIN_COMPARED_REPEAT
+    elif args.compare is not None and args.repeat < MIN_COMPARED_REPEAT:
+        parser.error("--compare needs --repeat %d or more" %
+                     MIN_COMPARED_REPEAT)
+    results = run(args.sizes, args.engine, args.repeat, args.lookups)
+    print(format_results(results))
+    if args.output is not None:
+        with open(args.output, "w") as fout:
+            json.dump(results, fout, indent=2)
+    if args.compare is not None:
+        with open(args.compare) as fin:
+            baseline = json.load(fin)
+        try:
+            regressions = compare(baseline, results, args.tolerance)
+        except IncomparableResultsError as e:
+            sys.stderr.write("%s\n" % e)
+            sys.exit(2)
+        if regressions:
+            sys.stderr.write("Regressions:\n%s\n" %
+                             format_regressions(regressions))
+            sys.exit(1)
+
+
+SUBCOMMANDS = {
+    "bench": bench_main,
+    "serve": serve_main,
+    "compile": compile_main,
+    "routes": routes_main,
+}
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] in SUBCOMMANDS:
+        SUBCOMMANDS[sys.argv[1]](sys.argv[2:])
+        return
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-o", "--output", help="Output pickle file path. "
+                        "Output directory in batch mode unless --combined "
+                        "is specified.", default=None)
+    parser.add_argument("--cache", nargs="?", const=DEFAULT_CACHE_DIR,
+                        default=None, help="Reuse the parsed blueprints "
+                        "cached in this directory (default: %s)" %
+                        DEFAULT_CACHE_DIR)
+    parser.add_argument("--cache-size", type=int, default=256,
+                        help="Maximal cache size in megabytes")
+    parser.add_argument("-j", "--jobs", type=int, default=None,
+                        help="Number of parallel processes in batch mode "
+                        "(default: the number of CPUs)")
+    parser.add_argument("--combined", action="store_true",
+                        help="Write all the parsed blueprints to a single "
+                        "pickle with {path: APIBlueprint} in batch mode")
+    parser.add_argument("--engine", choices=ENGINES, default="markdown",
+                        help="Parsing engine: \"fast\" skips Markdown and "
+                        "does not render the inline markup in descriptions")
+    parser.add_argument("--profile", action="store_true",
+                        help="Print the time spent in each parsing phase "
+                        "and top level section")
+    parser.add_argument("--profile-memory", action="store_true",
+                        help="--profile with the peak memory of each phase "
+                        "(slower)")
+    parser.add_argument("input", nargs="+",
+                        help="Input API Blueprint files or directories")
+    args = parser.parse_args()
+    if len(args.input) == 1 and not os.path.isdir(args.input[0]):
+        parse_single(args)
+        return
+    if args.output is not None and not args.combined and \
+            not os.path.isdir(args.output):
+        os.makedirs(args.output)
+    parse_batch(args)
+
 if __name__ == "__main__":
     main()
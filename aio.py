@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+API Blueprint (https://github.com/apiaryio/api-blueprint) parser which uses
+Markdown (https://pythonhosted.org/Markdown/).
+
+Released under New BSD License.
+
+Copyright © 2015, Vadim Markovtsev :: AO InvestGroup
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+    * Redistributions of source code must retain the above copyright
+      notice, this list of conditions and the following disclaimer.
+    * Redistributions in binary form must reproduce the above copyright
+      notice, this list of conditions and the following disclaimer in the
+      documentation and/or other materials provided with the distribution.
+    * Neither the name of the AO InvestGroup nor the
+      names of its contributors may be used to endorse or promote products
+      derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL VADIM MARKOVTSEV BE LIABLE FOR ANY
+DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+from . import profiling
+from .mdparser import BlueprintParser
+
+
+class ParseCancelledError(Exception):
+    """Aborts the parse in the worker thread after the awaiting task was
+    cancelled.
+    """
+    pass
+
+
+class AsyncBlueprintParser(object):
+    """Parses API Blueprint in worker threads without blocking the event
+    loop. At most max_workers documents are parsed at once and at most
+    max_queued callers wait for a free worker; the others get
+    asyncio.QueueFull immediately. Cancelling the awaiting task stops the
+    parse at the next Markdown block, text chunk or top level section.
+    """
+    def __init__(self, parser=None, max_workers=2, max_queued=64,
+                 executor=None):
+        if max_workers < 1:
+            raise ValueError("max_workers must be positive")
+        self._parser = parser if parser is not None else BlueprintParser()
+        self._max_workers = max_workers
+        self._max_queued = max_queued
+        self._executor = executor
+        self._own_executor = executor is None
+        self._semaphore = None
+        self._waiting = 0
+
+    @property
+    def parser(self):
+        return self._parser
+
+    @property
+    def waiting(self):
+        """The number of callers waiting for a free worker.
+        """
+        return self._waiting
+
+    async def parse(self, txt, profile=None):
+        """Parses API Blueprint, see BlueprintParser.parse().
+        """
+        await self._acquire()
+        cancelled = threading.Event()
+
+        def check(name):
+            if cancelled.is_set():
+                raise ParseCancelledError(name)
+
+        def run():
+            with profiling.cancellation(check):
+                return self._parser.parse(txt, profile)
+
+        loop = asyncio.get_running_loop()
+        try:
+            future = self._get_executor().submit(run)
+        except RuntimeError:
+            # the executor is shut down
+            self._semaphore.release()
+            raise
+        # the worker slot is busy until the thread actually finishes
+        future.add_done_callback(lambda _: self._release(loop))
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    async def _acquire(self):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._max_workers)
+        if self._semaphore.locked() and self._max_queued is not None and \
+                self._waiting >= self._max_queued:
+            raise asyncio.QueueFull()
+        self._waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._waiting -= 1
+
+    def _release(self, loop):
+        try:
+            loop.call_soon_threadsafe(self._semaphore.release)
+        except RuntimeError:
+            # the loop is closed, nobody waits anymore
+            pass
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                self._max_workers, thread_name_prefix="plueprint")
+        return self._executor
+
+    def close(self, wait=True):
+        """Shuts down the executor if it was created by this object.
+        """
+        if self._own_executor and self._executor is not None:
+            self._executor.shutdown(wait)
+            self._executor = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self.close(wait=False)
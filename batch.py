@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+API Blueprint (https://github.com/apiaryio/api-blueprint) parser which uses
+Markdown (https://pythonhosted.org/Markdown/).
+
+Released under New BSD License.
+
+Copyright © 2015, Vadim Markovtsev :: AO InvestGroup
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+    * Redistributions of source code must retain the above copyright
+      notice, this list of conditions and the following disclaimer.
+    * Redistributions in binary form must reproduce the above copyright
+      notice, this list of conditions and the following disclaimer in the
+      documentation and/or other materials provided with the distribution.
+    * Neither the name of the AO InvestGroup nor the
+      names of its contributors may be used to endorse or promote products
+      derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL VADIM MARKOVTSEV BE LIABLE FOR ANY
+DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+import codecs
+from multiprocessing import Pool
+import os
+import pickle
+import time
+
+from .mdparser import parse
+
+
+EXTENSIONS = ".md", ".apib"
+
+
+class BatchResult(object):
+    def __init__(self, path, data, error, elapsed):
+        self._path = path
+        self._data = data
+        self._error = error
+        self._elapsed = elapsed
+
+    @property
+    def path(self):
+        return self._path
+
+    @property
+    def data(self):
+        """Pickled APIBlueprint or None if parsing failed.
+        """
+        return self._data
+
+    @property
+    def error(self):
+        return self._error
+
+    @property
+    def elapsed(self):
+        return self._elapsed
+
+    @property
+    def ok(self):
+        return self._error is None
+
+    @property
+    def api(self):
+        if self._data is None:
+            return None
+        return pickle.loads(self._data)
+
+    def __str__(self):
+        if self.ok:
+            return "%.3fs %s" % (self.elapsed, self.path)
+        return "%.3fs %s FAILED: %s" % (self.elapsed, self.path, self.error)
+
+
+def collect_inputs(paths, extensions=EXTENSIONS):
+    files = []
+    for path in paths:
+        if not os.path.isdir(path):
+            files.append(path)
+            continue
+        for root, dirs, names in os.walk(path):
+            dirs.sort()
+            for name in sorted(names):
+                if os.path.splitext(name)[1] in extensions and \
+                        name != "README.md":
+                    files.append(os.path.join(root, name))
+    return files
+
+
+def parse_file(args):
+    path, cache_path, cache_size, engine = args
+    start = time.time()
+    try:
+        with codecs.open(path, "r", "utf-8") as fin:
+            txt = fin.read()
+        if cache_path is not None:
+            from .cache import BlueprintCache
+            api = BlueprintCache(cache_path, cache_size).parse(txt, engine)
+        else:
+            api = parse(txt, engine)
+        data = pickle.dumps(api, protocol=-1)
+    except Exception as e:
+        return BatchResult(path, None, "%s: %s" % (type(e).__name__, e),
+                           time.time() - start)
+    return BatchResult(path, data, None, time.time() - start)
+
+
+def parse_files(paths, jobs=None, cache_path=None,
+                cache_size=256 * 1024 * 1024, engine="markdown"):
+    """Parses the specified files and directories in a process pool and
+    yields BatchResult-s in the order of completion. Failures are reported
+    in the results and never abort the whole run.
+    """
+    files = collect_inputs(paths)
+    tasks = [(f, cache_path, cache_size, engine) for f in files]
+    if jobs == 1 or len(tasks) < 2:
+        for task in tasks:
+            yield parse_file(task)
+        return
+    pool = Pool(jobs)
+    try:
+        for result in pool.imap_unordered(parse_file, tasks):
+            yield result
+    finally:
+        pool.terminate()
+        pool.join()
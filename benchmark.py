@@ -0,0 +1,343 @@
+# -*- coding: utf-8 -*-
+"""
+API Blueprint (https://github.com/apiaryio/api-blueprint) parser which uses
+Markdown (https://pythonhosted.org/Markdown/).
+
+Released under New BSD License.
+
+Copyright © 2015, Vadim Markovtsev :: AO InvestGroup
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+    * Redistributions of source code must retain the above copyright
+      notice, this list of conditions and the following disclaimer.
+    * Redistributions in binary form must reproduce the above copyright
+      notice, this list of conditions and the following disclaimer in the
+      documentation and/or other materials provided with the distribution.
+    * Neither the name of the AO InvestGroup nor the
+      names of its contributors may be used to endorse or promote products
+      derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL VADIM MARKOVTSEV BE LIABLE FOR ANY
+DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+from collections import OrderedDict
+import os
+import pickle
+import platform
+import random
+import subprocess
+from timeit import default_timer
+
+from . import __version__
+from .mdparser import parse
+
+
+METHODS = "GET", "POST", "PUT", "PATCH", "DELETE"
+
+# generate() arguments of the standard sizes
+SIZES = OrderedDict((
+    ("small", dict(groups=2, resources=5, actions=3, mson_depth=2,
+                   body_size=256, data_structures=5)),
+    ("medium", dict(groups=10, resources=10, actions=4, mson_depth=3,
+                    body_size=1024, data_structures=50)),
+    ("large", dict(groups=40, resources=20, actions=5, mson_depth=4,
+                   body_size=4096, data_structures=200)),
+))
+
+# the compared metrics, all better when lower, and the absolute changes
+# below which they are considered noise
+NOISE_FLOORS = {
+    "parse_time": 0.005,
+    "peak_memory": 256 * 1024,
+    "match_mean": 2e-6,
+    "match_p99": 10e-6,
+    "pickle_time": 0.005,
+    "pickle_size": 1024,
+    "unpickle_time": 0.005,
+}
+# the fewest runs of which the medians are stable enough to compare
+MIN_COMPARED_REPEAT = 5
+
+
+def _mson(lines, indent, depth, seed):
+    prefix = "    " * indent
+    lines.append("%s+ id: %d (number, required) - The identifier" % (
+        prefix, seed))
+    lines.append("%s+ name: item%d (string) - The name" % (prefix, seed))
+    if depth > 1:
+        lines.append("%s+ nested (object) - The nested object" % prefix)
+        _mson(lines, indent + 1, depth - 1, seed + 1)
+
+
+def _body(size, rnd):
+    items = []
+    length = 2
+    while length < size:
+        item = '"k%d": "%s"' % (
+            len(items), "".join(rnd.choice("abcdefghij") for _ in range(24)))
+        items.append(item)
+        length += len(item) + 2
+    return "{%s}" % ", ".join(items)
+
+
+def _payload(lines, keyword, body, indent="        "):
+    lines.append("+ %s (application/json)" % keyword)
+    lines.append("")
+    lines.append("    + Body")
+    lines.append("")
+    lines.append(indent + body)
+    lines.append("")
+
+
+def generate(groups=2, resources=5, actions=3, mson_depth=2, body_size=256,
+             data_structures=5, seed=0):
+    """Returns the text of a synthetic blueprint with the specified numbers
+    of resource groups, resources per group, actions per resource (at most
+    len(METHODS)) and Data Structures. Every action has MSON attributes
+    nested mson_depth levels deep and JSON request and response bodies of
+    about body_size characters. The text depends only on the arguments.
+    """
+    rnd = random.Random(seed)
+    lines = ["FORMAT: 1A", "", "# Synthetic API", "",
+             "Generated by plueprint.benchmark.", ""]
+    for g in range(groups):
+        lines.extend(("# Group Group%d" % g, "", "Group %d." % g, ""))
+        for r in range(resources):
+            lines.extend((
+                "## Resource%d_%d [/g%d/r%d/{id}]" % (g, r, g, r), "",
+                "+ Parameters", "",
+                "    + id: 1 (number) - The identifier", ""))
+            for a, method in enumerate(METHODS[:actions]):
+                lines.extend(("### Action%d_%d_%d [%s]" % (g, r, a, method),
+                              "", "Action %d." % a, "", "+ Attributes", ""))
+                _mson(lines, 1, mson_depth, a)
+                lines.append("")
+                if method != "GET":
+                    _payload(lines, "Request", _body(body_size, rnd))
+                _payload(lines, "Response 200", _body(body_size, rnd))
+                lines.extend(("+ Response 404", ""))
+    if data_structures:
+        lines.extend(("# Data Structures", ""))
+        for d in range(data_structures):
+            lines.extend(("## Structure%d (object)" % d, ""))
+            _mson(lines, 0, mson_depth, d)
+            if d > 0:
+                lines.append("+ previous (Structure%d)" % (d - 1))
+            lines.append("")
+    return "\n".join(lines) + "\n"
+
+
+def _median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+    if len(values) % 2:
+        return values[middle]
+    return (values[middle - 1] + values[middle]) / 2.0
+
+
+def _measure_parse(txt, engine, repeat):
+    times = []
+    api = None
+    for _ in range(repeat):
+        start = default_timer()
+        api = parse(txt, engine)
+        times.append(default_timer() - start)
+    return api, _median(times)
+
+
+def _measure_memory(txt, engine):
+    try:
+        import tracemalloc
+    except ImportError:
+        return None
+    if tracemalloc.is_tracing():
+        return None
+    tracemalloc.start()
+    try:
+        parse(txt, engine)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def _measure_match(api, lookups):
+    routes = [(a.uri, a.request_method) for a in api.actions
+              if a.uri is not None]
+    if not routes:
+        return None, None
+    times = []
+    for i in range(lookups):
+        path, method = routes[i % len(routes)]
+        start = default_timer()
+        api.match(path, method)
+        times.append(default_timer() - start)
+    times.sort()
+    return sum(times) / len(times), times[int(len(times) * 0.99)]
+
+
+def _measure_pickle(api, repeat):
+    dump_times = []
+    load_times = []
+    data = None
+    for _ in range(repeat):
+        start = default_timer()
+        data = pickle.dumps(api, protocol=pickle.HIGHEST_PROTOCOL)
+        dump_times.append(default_timer() - start)
+        start = default_timer()
+        pickle.loads(data)
+        load_times.append(default_timer() - start)
+    return _median(dump_times), len(data), _median(load_times)
+
+
+def measure(txt, engine="markdown", repeat=3, lookups=10000):
+    """Parses the blueprint text and returns the dict with the metrics: the
+    median parse time of repeat runs and the throughput, the tracemalloc peak
+    memory of parsing, the mean and the 99th percentile of the route lookup
+    time, the pickle size and the median pickling and unpickling times. The
+    times are in seconds and the sizes in bytes.
+    """
+    api, parse_time = _measure_parse(txt, engine, repeat)
+    match_mean, match_p99 = _measure_match(api, lookups)
+    pickle_time, pickle_size, unpickle_time = _measure_pickle(api, repeat)
+    size = len(txt.encode("utf-8"))
+    return OrderedDict((
+        ("source_size", size),
+        ("actions", api.count_actions()),
+        ("parse_time", parse_time),
+        ("parse_throughput", size / parse_time),
+        ("actions_per_second", api.count_actions() / parse_time),
+        ("peak_memory", _measure_memory(txt, engine)),
+        ("match_mean", match_mean),
+        ("match_p99", match_p99),
+        ("pickle_time", pickle_time),
+        ("pickle_size", pickle_size),
+        ("unpickle_time", unpickle_time),
+    ))
+
+
+def _commit():
+    try:
+        with open(os.devnull, "w") as devnull:
+            output = subprocess.check_output(
+                ["git", "rev-parse", "HEAD"], stderr=devnull,
+                cwd=os.path.dirname(os.path.abspath(__file__)))
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return output.decode("ascii").strip()
+
+
+def run(sizes=None, engine="markdown", repeat=3, lookups=10000):
+    """Benchmarks the synthetic blueprints of the named SIZES (all by
+    default) and returns the JSON serializable results together with the
+    environment: the plueprint version, the git commit and the Python
+    version.
+    """
+    if sizes is None:
+        sizes = list(SIZES)
+    results = OrderedDict()
+    for name in sizes:
+        params = SIZES[name]
+        metrics = measure(generate(**params), engine, repeat, lookups)
+        results[name] = OrderedDict((("params", params),
+                                     ("metrics", metrics)))
+    return OrderedDict((
+        ("version", __version__),
+        ("commit", _commit()),
+        ("python", platform.python_version()),
+        ("implementation", platform.python_implementation()),
+        ("engine", engine),
+        ("sizes", results),
+    ))
+
+
+class IncomparableResultsError(ValueError):
+    """The benchmark results were measured in different conditions.
+    """
+    pass
+
+
+def _python_release(results):
+    return results["implementation"], \
+        ".".join(results["python"].split(".")[:2])
+
+
+def check_comparable(baseline, current):
+    """Raises IncomparableResultsError if the results were measured with
+    different engines, Python implementations or minor versions, or if any
+    of the current sizes is missing in the baseline or was generated with
+    other parameters.
+    """
+    problems = []
+    if baseline.get("engine") != current["engine"]:
+        problems.append("engine %s != %s" % (
+            baseline.get("engine"), current["engine"]))
+    if _python_release(baseline) != _python_release(current):
+        problems.append("Python %s %s != %s %s" % (
+            baseline["implementation"], baseline["python"],
+            current["implementation"], current["python"]))
+    for name, result in current["sizes"].items():
+        base = baseline["sizes"].get(name)
+        if base is None:
+            problems.append("size %s is missing in the baseline" % name)
+        elif base["params"] != result["params"]:
+            problems.append("size %s has different parameters" % name)
+    if problems:
+        raise IncomparableResultsError(
+            "The baseline is not comparable: " + "; ".join(problems))
+
+
+def compare(baseline, current, tolerance=0.1):
+    """Compares two run() results and returns the list of regressions
+    (size, metric, baseline value, current value), i.e. the metrics in
+    NOISE_FLOORS which became worse by more than the tolerance fraction
+    and by more than the noise floor. Raises IncomparableResultsError if
+    the results cannot be compared, see check_comparable().
+    """
+    check_comparable(baseline, current)
+    regressions = []
+    for name, result in current["sizes"].items():
+        base = baseline["sizes"][name]
+        for metric, floor in sorted(NOISE_FLOORS.items()):
+            old = base["metrics"].get(metric)
+            value = result["metrics"].get(metric)
+            if not old or value is None:
+                continue
+            if value > old * (1 + tolerance) and value - old > floor:
+                regressions.append((name, metric, old, value))
+    return regressions
+
+
+def format_results(results):
+    lines = ["plueprint %s (%s), %s %s, engine %s" % (
+        results["version"], (results["commit"] or "unknown commit")[:10],
+        results["implementation"], results["python"], results["engine"])]
+    for name, result in results["sizes"].items():
+        m = result["metrics"]
+        lines.append("  %-8s %7.1f KB, %5d actions: parse %.3f s "
+                     "(%.1f KB/s), match %.1f us (p99 %.1f us), "
+                     "pickle %.3f s / %.1f KB, unpickle %.3f s" % (
+                         name, m["source_size"] / 1024.0, m["actions"],
+                         m["parse_time"], m["parse_throughput"] / 1024.0,
+                         (m["match_mean"] or 0) * 1e6,
+                         (m["match_p99"] or 0) * 1e6, m["pickle_time"],
+                         m["pickle_size"] / 1024.0, m["unpickle_time"]))
+        if m["peak_memory"] is not None:
+            lines[-1] += ", peak %.1f MB" % (
+                m["peak_memory"] / (1024.0 * 1024))
+    return "\n".join(lines)
+
+
+def format_regressions(regressions):
+    return "\n".join("%s %s: %.6g -> %.6g (%+.1f%%)" % (
+        name, metric, old, new, (new - old) * 100.0 / old)
+        for name, metric, old, new in regressions)
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""
+API Blueprint (https://github.com/apiaryio/api-blueprint) parser which uses
+Markdown (https://pythonhosted.org/Markdown/).
+
+Released under New BSD License.
+
+Copyright © 2015, Vadim Markovtsev :: AO InvestGroup
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+    * Redistributions of source code must retain the above copyright
+      notice, this list of conditions and the following disclaimer.
+    * Redistributions in binary form must reproduce the above copyright
+      notice, this list of conditions and the following disclaimer in the
+      documentation and/or other materials provided with the distribution.
+    * Neither the name of the AO InvestGroup nor the
+      names of its contributors may be used to endorse or promote products
+      derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL VADIM MARKOVTSEV BE LIABLE FOR ANY
+DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+import hashlib
+import logging
+import os
+import pickle
+import tempfile
+
+import markdown
+
+from . import __version__
+from .entities import PICKLE_FORMAT, get_description_format, \
+    use_description_format
+from .mdparser import parse
+
+
+_logger = logging.getLogger(__name__)
+
+
+DEFAULT_CACHE_DIR = os.path.join(
+    os.path.expanduser("~"), ".cache", "plueprint")
+
+
+class BlueprintCache(object):
+    """Persistent cache of parsed blueprints. Entries are keyed on the
+    hash of the source text, parsing engine, description format, plueprint
+    and Markdown versions and entities.PICKLE_FORMAT. The least recently
+    used entries are evicted once the total size exceeds max_size.
+    """
+    SUFFIX = ".pickle"
+
+    def __init__(self, path=DEFAULT_CACHE_DIR, max_size=256 * 1024 * 1024):
+        self._path = path
+        self._max_size = max_size
+        self.hits = self.misses = 0
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+    @property
+    def path(self):
+        return self._path
+
+    @property
+    def max_size(self):
+        return self._max_size
+
+    @staticmethod
+    def key(txt, engine="markdown", description_format=None):
+        if description_format is None:
+            description_format = get_description_format()
+        md_version = getattr(markdown, "__version__", None) or \
+            markdown.version
+        digest = hashlib.sha256((
+            "plueprint %s format %d markdown %s pickle %d engine %s "
+            "description %s\n" % (
+                __version__, PICKLE_FORMAT, md_version,
+                pickle.HIGHEST_PROTOCOL, engine, description_format))
+            .encode("utf-8"))
+        digest.update(txt.encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, txt, engine="markdown", description_format=None):
+        file_name = self._file_name(
+            self.key(txt, engine, description_format))
+        try:
+            with open(file_name, "rb") as fin:
+                api = pickle.load(fin)
+        except (IOError, OSError):
+            self.misses += 1
+            return None
+        except (pickle.UnpicklingError, EOFError, AttributeError,
+                ImportError, IndexError, TypeError, ValueError):
+            # corrupted or incompatible entry
+            self._remove(file_name)
+            self.misses += 1
+            return None
+        try:
+            os.utime(file_name, None)
+        except OSError:
+            pass
+        self.hits += 1
+        return api
+
+    def put(self, txt, api, engine="markdown", description_format=None):
+        file_name = self._file_name(
+            self.key(txt, engine, description_format))
+        fd, tmp_name = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as fout:
+                pickle.dump(api, fout, protocol=-1)
+            os.rename(tmp_name, file_name)
+        except (IOError, OSError, pickle.PicklingError, AttributeError,
+                TypeError):
+            self._remove(tmp_name)
+            raise
+        self.evict()
+
+    def parse(self, txt, engine="markdown", description_format=None):
+        """Returns the cached blueprint or parses and caches it. The
+        description format defaults to entities.get_description_format().
+        Failing to write the entry is logged and does not fail the parse.
+        """
+        if description_format is None:
+            description_format = get_description_format()
+        api = self.get(txt, engine, description_format)
+        if api is None:
+            with use_description_format(description_format):
+                api = parse(txt, engine)
+            try:
+                self.put(txt, api, engine, description_format)
+            except (IOError, OSError, pickle.PicklingError, AttributeError,
+                    TypeError) as e:
+                _logger.warning("Failed to cache the parsed blueprint: "
+                                "%s: %s", type(e).__name__, e)
+        return api
+
+    def evict(self):
+        entries = []
+        total = 0
+        for name in os.listdir(self.path):
+            if not name.endswith(self.SUFFIX):
+                continue
+            file_name = os.path.join(self.path, name)
+            try:
+                stat = os.stat(file_name)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, file_name))
+            total += stat.st_size
+        entries.sort()
+        for _, size, file_name in entries:
+            if total <= self.max_size:
+                break
+            self._remove(file_name)
+            total -= size
+
+    def clear(self):
+        for name in os.listdir(self.path):
+            if name.endswith(self.SUFFIX):
+                self._remove(os.path.join(self.path, name))
+
+    def _file_name(self, key):
+        return os.path.join(self.path, key + self.SUFFIX)
+
+    @staticmethod
+    def _remove(file_name):
+        try:
+            os.remove(file_name)
+        except OSError:
+            pass
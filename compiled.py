@@ -0,0 +1,423 @@
+# -*- coding: utf-8 -*-
+"""
+API Blueprint (https://github.com/apiaryio/api-blueprint) parser which uses
+Markdown (https://pythonhosted.org/Markdown/).
+
+Released under New BSD License.
+
+Copyright © 2015, Vadim Markovtsev :: AO InvestGroup
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+    * Redistributions of source code must retain the above copyright
+      notice, this list of conditions and the following disclaimer.
+    * Redistributions in binary form must reproduce the above copyright
+      notice, this list of conditions and the following disclaimer in the
+      documentation and/or other materials provided with the distribution.
+    * Neither the name of the AO InvestGroup nor the
+      names of its contributors may be used to endorse or promote products
+      derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL VADIM MARKOVTSEV BE LIABLE FOR ANY
+DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+from collections import OrderedDict, namedtuple
+from functools import partial
+from io import BytesIO
+import mmap
+import os
+import pickle
+import struct
+import tempfile
+
+from . import __version__
+from .entities import AssetSection, DataStructure, DeferredContent, \
+    ResourceGroup, decode_content
+from .index import status_codes
+from .router import Router
+
+
+MAGIC = b"PLUEPRNT"
+FORMAT_VERSION = 2
+# magic, format version, header offset, header length
+PREAMBLE = struct.Struct(">8sIQQ")
+
+RouteEntry = namedtuple("RouteEntry", (
+    "request_method", "uri_template", "group", "resource", "action"))
+
+
+def dump(api, path):
+    """Writes the compiled artifact of APIBlueprint. Every resource and the
+    data structures are pickled separately and the header with the route
+    table, the indexes and the offsets of the sections goes last. The
+    contents of the bodies and the schemas are written as UTF-8 right
+    before their resource and referenced from its pickle.
+    """
+    fd, tmp_name = tempfile.mkstemp(
+        dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as fout:
+            fout.write(PREAMBLE.pack(MAGIC, FORMAT_VERSION, 0, 0))
+            header = _write_sections(api, fout)
+            data = pickle.dumps(header, protocol=-1)
+            offset = fout.tell()
+            fout.write(data)
+            fout.seek(0)
+            fout.write(PREAMBLE.pack(
+                MAGIC, FORMAT_VERSION, offset, len(data)))
+        os.rename(tmp_name, path)
+    except (IOError, OSError, pickle.PicklingError, AttributeError,
+            TypeError):
+        if os.path.exists(tmp_name):
+            os.remove(tmp_name)
+        raise
+
+
+class _SectionPickler(pickle.Pickler):
+    """Writes the asset contents to the artifact and pickles the assets as
+    references to them.
+    """
+    def __init__(self, buffer, fout):
+        pickle.Pickler.__init__(self, buffer, protocol=-1)
+        self._fout = fout
+
+    def persistent_id(self, obj):
+        if not isinstance(obj, AssetSection):
+            return None
+        content = obj.content
+        if content is None:
+            return None
+        data = content.encode("utf-8")
+        offset = self._fout.tell()
+        self._fout.write(data)
+        return type(obj), obj.keyword, type(content), offset, len(data)
+
+
+def _write_section(fout, obj):
+    buffer = BytesIO()
+    _SectionPickler(buffer, fout).dump(obj)
+    data = buffer.getvalue()
+    offset = fout.tell()
+    fout.write(data)
+    return offset, len(data)
+
+
+def _write_sections(api, fout):
+    groups = []
+    routes = []
+    # id() of the entity -> its locator in the artifact
+    locators = {}
+    for group in api:
+        resources = []
+        for resource in group:
+            key = group.name, resource.id
+            if resource.model is not None:
+                locators[id(resource.model)] = ("model",) + key
+            for action in resource:
+                akey = key + (action.id,)
+                locators[id(action)] = akey
+                for name, request in action.requests.items():
+                    locators[id(request)] = ("request",) + akey + (name,)
+                for code, responses in action.responses.items():
+                    for i, response in enumerate(responses):
+                        locators[id(response)] = \
+                            ("response",) + akey + (code, i)
+                if action.uri_template is not None:
+                    routes.append(RouteEntry(
+                        action.request_method, str(action.uri_template),
+                        *akey))
+            resources.append(
+                (resource.id,) + _write_section(fout, resource))
+        groups.append((group.name, group._description, resources))
+    index = api._index
+
+    def locate(table):
+        return {key: [locators[id(v)] for v in values]
+                for key, values in table.items()}
+
+    return {
+        "version": __version__,
+        "metadata": api.metadata,
+        "name": api.name,
+        "overview": api.overview,
+        "groups": groups,
+        "data_structures": _write_section(fout, api._data_structures),
+        "routes": [tuple(r) for r in routes],
+        "actions_by_name": locate(index._actions_by_name),
+        "actions_by_relation": locate(index._actions_by_relation),
+        "responses_by_status": locate(index._responses_by_status),
+        "payloads_by_media_type": locate(index._payloads_by_media_type),
+    }
+
+
+def load(path):
+    """Opens the compiled artifact, see CompiledBlueprint.
+    """
+    return CompiledBlueprint(path)
+
+
+class CompiledBlueprint(object):
+    """Memory mapped compiled artifact written by dump(). Only the header is
+    read on open; the resources and the data structures are unpickled on
+    the first access, and the contents of their bodies and schemas are
+    decoded on the first access to each of them, so they must not be read
+    after close(). The routing and the query methods follow APIBlueprint;
+    load() materializes the whole APIBlueprint.
+    """
+    def __init__(self, path):
+        self._path = path
+        with open(path, "rb") as fin:
+            self._mmap = mmap.mmap(fin.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._header = self._read_header()
+        except (ValueError, KeyError, EOFError, pickle.UnpicklingError):
+            self._mmap.close()
+            raise
+        self._routes = tuple(RouteEntry(*r) for r in self._header["routes"])
+        self._router = None
+        self._groups = {}
+        self._group_resources = {}
+        for name, _, resources in self._header["groups"]:
+            self._group_resources[name] = OrderedDict(
+                (rid, (offset, length)) for rid, offset, length in resources)
+        self._resources = {}
+        self._data_structures = None
+
+    def _read_header(self):
+        if len(self._mmap) < PREAMBLE.size:
+            raise ValueError("%s is not a compiled blueprint" % self._path)
+        magic, version, offset, length = PREAMBLE.unpack_from(self._mmap)
+        if magic != MAGIC:
+            raise ValueError("%s is not a compiled blueprint" % self._path)
+        if version != FORMAT_VERSION:
+            raise ValueError("Unsupported compiled blueprint format "
+                             "version: %d" % version)
+        header = pickle.loads(self._mmap[offset:offset + length])
+        if header["version"] != __version__:
+            raise ValueError(
+                "%s was compiled by plueprint %s, this is %s" % (
+                    self._path, header["version"], __version__))
+        return header
+
+    def _unpickle(self, offset, length, lazy=True):
+        unpickler = pickle.Unpickler(BytesIO(
+            self._mmap[offset:offset + length]))
+        unpickler.persistent_load = partial(self._load_asset, lazy)
+        return unpickler.load()
+
+    def _load_asset(self, lazy, pid):
+        cls, keyword, content_type, offset, length = pid
+        if lazy:
+            content = DeferredContent(partial(
+                self._read_content, content_type, offset, length))
+        else:
+            content = self._read_content(content_type, offset, length)
+        asset = cls.__new__(cls)
+        AssetSection.__init__(asset, None, keyword, content)
+        return asset
+
+    def _read_content(self, content_type, offset, length):
+        return decode_content(content_type, self._mmap[offset:offset + length])
+
+    @property
+    def path(self):
+        return self._path
+
+    @property
+    def metadata(self):
+        return self._header["metadata"]
+
+    @property
+    def format(self):
+        return self.metadata.get("FORMAT")
+
+    @property
+    def name(self):
+        return self._header["name"]
+
+    @property
+    def overview(self):
+        return self._header["overview"]
+
+    @property
+    def routes(self):
+        """RouteEntry-s of all the actions, available without unpickling.
+        """
+        return self._routes
+
+    @property
+    def data_structures(self):
+        if self._data_structures is None:
+            structures = self._unpickle(*self._header["data_structures"])
+            for ds in structures.values():
+                if isinstance(ds, DataStructure):
+                    ds._fix_parents(self)
+            self._data_structures = structures
+        return self._data_structures
+
+    @property
+    def resources(self):
+        for g in self:
+            for r in g:
+                yield r
+
+    @property
+    def actions(self):
+        for r in self.resources:
+            for a in r:
+                yield a
+
+    def keys(self):
+        return self._group_resources.keys()
+
+    def __iter__(self):
+        for name in self._group_resources:
+            yield self.group(name)
+
+    def __len__(self):
+        return len(self._group_resources)
+
+    def group(self, name):
+        """Returns the ResourceGroup with all its resources loaded.
+        """
+        group = self._group_shell(name)
+        if len(group._resources) < len(self._group_resources[name]):
+            for rid in self._group_resources[name]:
+                group._resources[rid] = self.resource(name, rid)
+        return group
+
+    def resource(self, group, rid):
+        key = group, rid
+        resource = self._resources.get(key)
+        if resource is None:
+            resource = self._unpickle(*self._group_resources[group][rid])
+            resource._fix_parents(self._group_shell(group))
+            self._resources[key] = resource
+        return resource
+
+    def action(self, group, rid, aid):
+        return self.resource(group, rid)[aid]
+
+    def _group_shell(self, name):
+        group = self._groups.get(name)
+        if group is None:
+            if name not in self._group_resources:
+                raise KeyError(name)
+            for gname, description, _ in self._header["groups"]:
+                if gname == name:
+                    break
+            group = self._groups[name] = ResourceGroup(
+                self, name, description)
+        return group
+
+    def __getitem__(self, item):
+        """Returns the group by name or the group, the resource or the action
+        by ">group>resource>action".
+        """
+        if not item or item[0] != ">":
+            return self.group(item)
+        path = item[1:].split(">")
+        group = path[0] or None
+        if len(path) == 1:
+            return self.group(group)
+        if len(path) == 2:
+            return self.resource(group, path[1])
+        return self.action(group, path[1], path[2])
+
+    def match(self, path, method=None):
+        """Finds the action which serves the concrete request path, see
+        APIBlueprint.match(). Only the matched resource is loaded.
+        """
+        route, variables = self.match_route(path, method)
+        return self.action(route.group, route.resource, route.action), \
+            variables
+
+    def match_route(self, path, method=None):
+        """Returns (RouteEntry, variables) without loading anything.
+        """
+        if self._router is None:
+            self._router = Router(self._routes)
+        result = self._router.match(path, method)
+        if result is None:
+            raise KeyError(
+                path if method is None else "%s:%s" % (path, method))
+        return result
+
+    def actions_by_name(self, name):
+        return self._locate("actions_by_name", name)
+
+    def actions_by_relation(self, link_id):
+        return self._locate("actions_by_relation", link_id)
+
+    def responses_by_status(self, status):
+        """status is either the exact code, e.g. 404, or the class, e.g.
+        "4xx".
+        """
+        if isinstance(status, int):
+            return self._locate("responses_by_status", status)
+        result = []
+        for code in status_codes(status, self._header["responses_by_status"]):
+            result.extend(self._locate("responses_by_status", code))
+        return tuple(result)
+
+    def payloads_by_media_type(self, media_type):
+        if not isinstance(media_type, tuple):
+            media_type = tuple(media_type.split("/", 1))
+        return self._locate("payloads_by_media_type", media_type)
+
+    def _locate(self, table, key):
+        return tuple(self._resolve(locator)
+                     for locator in self._header[table].get(key, tuple()))
+
+    def _resolve(self, locator):
+        kind = locator[0]
+        if kind == "model":
+            return self.resource(*locator[1:]).model
+        if kind == "request":
+            return self.action(*locator[1:4]).requests[locator[4]]
+        if kind == "response":
+            return self.action(*locator[1:4]).responses[locator[4]][
+                locator[5]]
+        return self.action(*locator)
+
+    def load(self):
+        """Returns the complete APIBlueprint.
+        """
+        from .mdparser import APIBlueprint
+        api = APIBlueprint()
+        api._metadata = dict(self.metadata)
+        api._name = self.name
+        api._overview = self.overview
+        for name, description, resources in self._header["groups"]:
+            group = api._groups[name] = ResourceGroup(api, name, description)
+            for rid, offset, length in resources:
+                group._resources[rid] = self._unpickle(offset, length, False)
+        offset, length = self._header["data_structures"]
+        api._data_structures = self._unpickle(offset, length, False)
+        api._fix_children()
+        api._reset_trie()
+        return api
+
+    def close(self):
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __str__(self):
+        return "Compiled API Blueprint \"%s\", format %s, with %d resource " \
+               "groups (%d routes)" % (
+                   self.name, self.format, len(self), len(self._routes))
@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+"""
+API Blueprint (https://github.com/apiaryio/api-blueprint) parser which uses
+Markdown (https://pythonhosted.org/Markdown/).
+
+Released under New BSD License.
+
+Copyright © 2015, Vadim Markovtsev :: AO InvestGroup
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+    * Redistributions of source code must retain the above copyright
+      notice, this list of conditions and the following disclaimer.
+    * Redistributions in binary form must reproduce the above copyright
+      notice, this list of conditions and the following disclaimer in the
+      documentation and/or other materials provided with the distribution.
+    * Neither the name of the AO InvestGroup nor the
+      names of its contributors may be used to endorse or promote products
+      derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL VADIM MARKOVTSEV BE LIABLE FOR ANY
+DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+from collections import Counter, namedtuple
+from contextlib import contextmanager
+import re
+import sys
+import threading
+
+from six import string_types, text_type
+
+
+MESSAGES = {
+    "unknown-section": "Section \"%s\" is unknown",
+    "invalid-payload-section":
+        "Failed to parse section \"%s\" in payload section %s: %s",
+    "invalid-action-section":
+        "Failed to parse section \"%s\" in action %s: %s",
+    "invalid-resource-section":
+        "Failed to parse section \"%s\" in resource %s: %s",
+    "discarded-description":
+        "Invalid format, description was discarded: \"%s\"",
+    "empty-resource": "Skipping empty resource %s",
+    "invalid-resource": "Invalid section in resource %s: %s",
+    "implicit-action": "Assumed single implicit action in %s",
+    "bad-reference": "Bad reference: %s",
+    "invalid-data-structure-reference":
+        "Invalid attributes reference in Data Structures: %s",
+    "invalid-attributes-reference": "Invalid attributes reference: %s",
+    "lifted-headers": "There is only one <h1> in the document => raising all "
+                      "the other headers",
+    "invalid-schema": "Invalid schema in %s: %s",
+}
+
+ATX_HEADER_REGEXP = re.compile(r"^ {0,3}#+\s*(.*?)\s*#*\s*$")
+
+_local = threading.local()
+
+
+def current():
+    """Returns the Diagnostics which collects the warnings in this thread or
+    None.
+    """
+    return getattr(_local, "diagnostics", None)
+
+
+def warn(code, *args):
+    """Records the warning in the current Diagnostics. If there is none, the
+    message is written to stderr unless entities.report_warnings is False.
+    """
+    diagnostics = current()
+    if diagnostics is not None:
+        diagnostics.report(code, args)
+        return
+    from .entities import report_warnings
+    if report_warnings:
+        sys.stderr.write("%s\n" % (Diagnostic(
+            code, format_args(args), None, None),))
+
+
+def format_args(args):
+    """Converts the formatting arguments to strings, so that the recorded
+    warnings do not keep the entities and the exceptions alive.
+    """
+    return tuple(a if isinstance(a, string_types) else text_type(a)
+                 for a in args)
+
+
+@contextmanager
+def section(name):
+    """Sets the location of the warnings recorded inside the block.
+    """
+    diagnostics = current()
+    if diagnostics is None:
+        yield
+        return
+    diagnostics._enter(name)
+    try:
+        yield
+    finally:
+        diagnostics._exit()
+
+
+class Diagnostic(namedtuple("Diagnostic",
+                            ("code", "args", "location", "line"))):
+    """Warning with the code from MESSAGES, the formatting arguments as
+    strings, the titles of the enclosing sections and the 1-based source
+    line of the innermost of them (None if unknown). The message is
+    formatted on demand.
+    """
+    __slots__ = ()
+
+    @property
+    def message(self):
+        return MESSAGES[self.code] % self.args
+
+    def __str__(self):
+        res = self.message
+        if self.location:
+            res = "%s: %s" % (" > ".join(self.location), res)
+        if self.line is not None:
+            res = "line %d: %s" % (self.line, res)
+        return res
+
+
+class Diagnostics(object):
+    """Collects the warnings of a parse call, see APIBlueprint.diagnostics.
+    If the source text is given, the warnings record the line numbers of
+    the section headers, which are found in the document order.
+    """
+    def __init__(self, source=None):
+        self._items = []
+        self._location = []
+        self._lines = []
+        # [(line number, header text), ...] and the next one to check
+        self._headers = None
+        self._cursor = 0
+        if source is not None:
+            self._headers = []
+            for number, line in enumerate(source.splitlines(), 1):
+                match = ATX_HEADER_REGEXP.match(line)
+                if match is not None:
+                    self._headers.append((number, match.group(1)))
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __len__(self):
+        return len(self._items)
+
+    def __getitem__(self, item):
+        return self._items[item]
+
+    def __getstate__(self):
+        return {"_items": self._items, "_location": [], "_lines": [],
+                "_headers": None, "_cursor": 0}
+
+    @contextmanager
+    def collect(self):
+        """Records the warnings in this thread while the block runs.
+        """
+        previous = current()
+        _local.diagnostics = self
+        try:
+            yield self
+        finally:
+            _local.diagnostics = previous
+
+    def report(self, code, args):
+        line = None
+        for line in reversed(self._lines):
+            if line is not None:
+                break
+        self._items.append(Diagnostic(
+            code, format_args(args), tuple(self._location), line))
+
+    def _enter(self, name):
+        self._location.append(name)
+        self._lines.append(self._find_header(name))
+
+    def _exit(self):
+        self._location.pop()
+        self._lines.pop()
+
+    def _find_header(self, name):
+        headers = self._headers
+        if not headers or name is None:
+            return None
+        name = " ".join(name.split())
+        for index in range(self._cursor, len(headers)):
+            number, text = headers[index]
+            if " ".join(text.split()) == name:
+                self._cursor = index + 1
+                return number
+        return None
+
+    def extend(self, other):
+        self._items.extend(other)
+
+    def counts(self):
+        return Counter(d.code for d in self._items)
+
+    def format(self):
+        return "\n".join(str(d) for d in self._items)
+
+    def __str__(self):
+        return "%d warning(s)" % len(self._items)
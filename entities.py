@@ -30,22 +30,64 @@ ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
 (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
 SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 """
+import codecs
+from contextlib import contextmanager
 from copy import deepcopy
 
+from importlib import import_module
 from itertools import chain
 from collections import OrderedDict
 import json
 from markdown import to_html_string
 import re
-from six import add_metaclass, string_types
-import sys
+from six import add_metaclass, string_types, text_type
+import threading
 from types import GeneratorType
 from uritemplate import URITemplate
 import weakref
 from xml.etree import ElementTree
 
+from . import diagnostics
+from .router import UriExpander
+
 
 report_warnings = True
+# "html" renders the descriptions with Markdown on the first access, "text"
+# keeps only their plain text
+description_format = "html"
+DESCRIPTION_FORMATS = "html", "text"
+# overrides description_format in the current thread, see BlueprintParser
+_local = threading.local()
+
+
+def get_description_format():
+    return getattr(_local, "description_format", None) or description_format
+
+
+@contextmanager
+def use_description_format(value):
+    """Overrides description_format in this thread while the block runs.
+    """
+    if value not in DESCRIPTION_FORMATS:
+        raise ValueError("Unknown description format: %s (must be one of "
+                         "%s)" % (value, ", ".join(DESCRIPTION_FORMATS)))
+    previous = getattr(_local, "description_format", None)
+    _local.description_format = value
+    try:
+        yield
+    finally:
+        _local.description_format = previous
+
+
+try:
+    from pickle import PickleBuffer
+except ImportError:
+    PickleBuffer = None
+
+# the version of the pickled layout of the entities; bumped whenever the
+# slots or the pickled state of any entity change, so that the cached
+# blueprints written before are not loaded as the wrong objects
+PICKLE_FORMAT = 2
 
 try:
     ustr = unicode
@@ -53,6 +95,34 @@ except NameError:
     ustr = str
 
 
+def detect_json_loads(backends=("orjson", "ujson", "simplejson")):
+    """Returns loads() of the first installed JSON package among backends
+    or json.loads() if none is installed.
+    """
+    for name in backends:
+        try:
+            return import_module(name).loads
+        except ImportError:
+            continue
+    return json.loads
+
+
+def use_fast_json(backends=("orjson", "ujson", "simplejson")):
+    """Decodes the JSON payloads with the first installed package among
+    backends instead of json. They may differ from json in the details,
+    e.g. the number types or the handling of duplicate keys. Returns the
+    selected loads().
+    """
+    global json_loads
+    json_loads = detect_json_loads(backends)
+    return json_loads
+
+
+# decodes the JSON payloads in PayloadSection.value(); may be replaced, see
+# use_fast_json()
+json_loads = json.loads
+
+
 def select_pos(*args):
     pos = 100500
     if len(args) == 1 and isinstance(args[0], GeneratorType):
@@ -83,11 +153,63 @@ def get_pre_contents(node):
 
 
 def parse_description(sequence, index, *stop_tags):
-    desc = ""
+    start = index
     while len(sequence) > index and sequence[index].tag not in stop_tags:
-        desc += to_html_string(sequence[index]) + "\n"
         index += 1
-    return desc.strip() if desc else None, index
+    if index == start:
+        return None, index
+    nodes = sequence[start:index]
+    if get_description_format() == "text":
+        return "\n\n".join("".join(node.itertext()).strip()
+                           for node in nodes).strip(), index
+    return LazyDescription(nodes), index
+
+
+class LazyDescription(object):
+    """HTML description which is rendered from the element tree nodes on
+    the first access. Can be concatenated with strings.
+    """
+    __slots__ = "_parts", "_html"
+
+    def __init__(self, *parts):
+        # lists of nodes and strings
+        self._parts = parts
+        self._html = None
+
+    def _snapshot(self):
+        # render() sets _html before dropping _parts
+        parts = self._parts
+        return parts if parts is not None else (self._html,)
+
+    def __add__(self, other):
+        if isinstance(other, LazyDescription):
+            return LazyDescription(*(self._snapshot() + other._snapshot()))
+        return LazyDescription(*(self._snapshot() + (other,)))
+
+    def __radd__(self, other):
+        return LazyDescription(*((other,) + self._snapshot()))
+
+    def __str__(self):
+        return self.render()
+
+    def __reduce__(self):
+        return text_type, (self.render(),)
+
+    def render(self):
+        # the concurrent calls may render twice, the results are equal
+        html = self._html
+        if html is not None:
+            return html
+        parts = self._parts
+        if parts is None:
+            return self._html
+        html = "".join(
+            part if isinstance(part, string_types) else
+            "".join(to_html_string(node) + "\n" for node in part).strip()
+            for part in parts)
+        self._html = html
+        self._parts = None
+        return html
 
 
 def from_none(exc):
@@ -101,19 +223,84 @@ def from_none(exc):
 
 
 def property_with_parent(name, ptype):
+    # the value is stored in the slot name + "_value"
+    storage = name + "_value"
+
     def getter(self):
-        return getattr(self, "_" + name)
+        return getattr(self, storage)
 
     def setter(self, value):
         if value is not None:
             assert isinstance(value, ptype)
             if value.parent is None:
                 value._parent = self
-        setattr(self, "_" + name, value)
+        setattr(self, storage, value)
 
     return property(getter, setter)
 
 
+_slot_names = {}
+
+
+def slot_names(cls):
+    """Returns the names of all the slots declared in the class hierarchy.
+    """
+    try:
+        return _slot_names[cls]
+    except KeyError:
+        pass
+    names = []
+    for klass in cls.__mro__:
+        slots = vars(klass).get("__slots__", tuple())
+        if isinstance(slots, string_types):
+            slots = slots,
+        for name in slots:
+            if name in ("__dict__", "__weakref__"):
+                continue
+            if name.startswith("__") and not name.endswith("__"):
+                name = "_%s%s" % (klass.__name__.lstrip("_"), name)
+            names.append(name)
+    names = _slot_names[cls] = tuple(names)
+    return names
+
+
+class FrozenDict(dict):
+    """Read-only dict which is returned by PayloadSection.value(frozen=True).
+    """
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("%s is read-only" % type(self).__name__)
+
+    __setitem__ = __delitem__ = __ior__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+    def __reduce__(self):
+        return type(self), (dict(self),)
+
+
+def copy_value(value):
+    """Deep copies the decoded payload value faster than deepcopy().
+    """
+    if isinstance(value, dict):
+        return {k: copy_value(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [copy_value(v) for v in value]
+    if isinstance(value, ElementTree.Element):
+        return deepcopy(value)
+    return value
+
+
+def freeze_value(value):
+    """Converts the decoded payload value to the read-only equivalent.
+    """
+    if isinstance(value, dict):
+        return FrozenDict((k, freeze_value(v)) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze_value(v) for v in value)
+    if isinstance(value, ElementTree.Element):
+        raise ValueError("XML values cannot be frozen")
+    return value
+
+
 class OrderedDefaultDict(OrderedDict):
     def __init__(self, factory, *args, **kwargs):
         super(OrderedDefaultDict, self).__init__(*args, **kwargs)
@@ -123,6 +310,10 @@ class OrderedDefaultDict(OrderedDict):
         result = self[key] = self.default_factory()
         return result
 
+    def __reduce__(self):
+        return type(self), (self.default_factory,), None, None, \
+            iter(self.items())
+
 
 class SelfParsingSectionRegistryDict(type):
     registry = {}
@@ -149,6 +340,8 @@ class SelfParsingSectionRegistry(type):
 
 
 class SmartReprMixin(object):
+    __slots__ = tuple()
+
     def __repr__(self):
         s = str(self)
         if s.startswith(type(self).__name__):
@@ -157,6 +350,7 @@ class SmartReprMixin(object):
 
 
 class Section(SmartReprMixin):
+    __slots__ = "__parent", "__weakref__"
     NESTED_ATTRS = tuple()
 
     def __init__(self, parent):
@@ -177,23 +371,65 @@ class Section(SmartReprMixin):
             value = weakref.proxy(value)
         self.__parent = value
 
-    def _fix_parents(self, parent):
-        self._parent = parent
+    def __getstate__(self):
+        state = {}
+        for name in slot_names(type(self)):
+            try:
+                state[name] = getattr(self, name)
+            except AttributeError:
+                continue
+        # weak references cannot be pickled, _fix_parents() restores them
+        state["_Section__parent"] = None
+        return state
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+
+    def _nested_sections(self):
+        """Returns the sections which have this one as the parent.
+        """
+        result = []
         for attr in self.NESTED_ATTRS:
             attr = getattr(self, attr)
             if attr is None:
                 continue
             if isinstance(attr, Section):
-                attr._fix_parents(self)
+                result.append(attr)
                 continue
             children = getattr(attr, "values", None)
-            children = children() if children is not None else attr
-            for child in children:
+            for child in children() if children is not None else attr:
                 if isinstance(child, Section):
-                    child._fix_parents(self)
+                    result.append(child)
+        return result
+
+    def _relink(self):
+        """Called by _fix_parents() after the parent of this section is set.
+        """
+        pass
+
+    def _fix_parents(self, parent):
+        """Restores the parent references in the whole subtree. The tree is
+        walked with an explicit stack, so the nesting depth is not limited.
+        """
+        self._parent = parent
+        stack = [self]
+        pop = stack.pop
+        push = stack.append
+        while stack:
+            section = pop()
+            section._relink()
+            children = section._nested_sections()
+            if children:
+                proxy = weakref.proxy(section)
+                for child in children:
+                    child.__parent = proxy
+                    push(child)
 
 
 class NamedSection(Section):
+    __slots__ = "_name", "_description"
+
     def __init__(self, parent, name, description):
         super(NamedSection, self).__init__(parent)
         self._name = name
@@ -205,12 +441,15 @@ class NamedSection(Section):
 
     @property
     def description(self):
+        if isinstance(self._description, LazyDescription):
+            self._description = self._description.render()
         return self._description
 
 
 def Collection(child_type):
     @add_metaclass(SelfParsingSectionRegistry)
     class Base(Section):
+        __slots__ = "_children",
         NESTED_ATTRS = "_children",
 
         def __init__(self, parent, children):
@@ -221,7 +460,15 @@ def Collection(child_type):
                 if child.parent is None:
                     child._parent = self
                 self._children[child.name] = child
-            self.__dict__.update(self._children)
+
+        def __getattr__(self, item):
+            # the children are accessible as attributes
+            if item == "_children":
+                raise AttributeError(item)
+            try:
+                return self._children[item]
+            except KeyError:
+                raise from_none(AttributeError(item))
 
         def __iter__(self):
             for child in self._children.values():
@@ -249,6 +496,8 @@ def Collection(child_type):
 
 
 class Attribute(NamedSection):
+    __slots__ = "_type", "_required", "_value"
+
     def __init__(self, parent, name, type_, required, description, value):
         super(Attribute, self).__init__(parent, name, description)
         self._type = type_ or "object"
@@ -307,12 +556,11 @@ class Attribute(NamedSection):
                     res += "  %s\n" % line
         return res
 
-    def _fix_parents(self, parent):
-        super(Attribute, self)._fix_parents(parent)
+    def _nested_sections(self):
+        result = super(Attribute, self)._nested_sections()
         if isinstance(self.value, list):
-            for v in self.value:
-                if isinstance(v, Attribute):
-                    v._fix_parents(self)
+            result.extend(v for v in self.value if isinstance(v, Attribute))
+        return result
 
     @classmethod
     def parse_from_string(cls, parent, line):
@@ -388,6 +636,8 @@ class Attribute(NamedSection):
 
 
 class ParameterMember(NamedSection):
+    __slots__ = tuple()
+
     @staticmethod
     def parse_from_string(parent, txt):
         attr = Attribute.parse_from_string(parent, txt)
@@ -398,6 +648,7 @@ class ParameterMember(NamedSection):
 
 
 class Parameter(Attribute):
+    __slots__ = "_default_value", "_members"
     NESTED_ATTRS = Attribute.NESTED_ATTRS + ("_members",)
 
     def __init__(self, parent, name, type_, required, description, value,
@@ -454,6 +705,9 @@ class Parameter(Attribute):
 
 
 class ReferenceableMixin(object):
+    # the concrete classes declare the _reference slot
+    __slots__ = tuple()
+
     def __init__(self, *args, **kwargs):
         super(ReferenceableMixin, self).__init__(*args, **kwargs)
         self._reference = None
@@ -466,6 +720,8 @@ class ReferenceableMixin(object):
 
 
 class DataStructure(Attribute, ReferenceableMixin):
+    __slots__ = "_reference",
+
     @classmethod
     def parse_from_etree(cls, parent, node):
         instance = super(DataStructure, cls).parse_from_etree(parent, node)
@@ -478,11 +734,13 @@ class DataStructure(Attribute, ReferenceableMixin):
 
 
 class Parameters(Collection(Parameter)):
+    __slots__ = tuple()
     NESTED_SECTION_ID = "parameters"
     SECTION_TYPE = "Parameters", "Parameter"
 
 
 class Attributes(Collection(Attribute)):
+    __slots__ = "_reference",
     NESTED_SECTION_ID = "attributes"
     SECTION_TYPE = "Attributes", "Attribute"
 
@@ -508,6 +766,7 @@ class Attributes(Collection(Attribute)):
 
 @add_metaclass(SelfParsingSectionRegistry)
 class Headers(Section):
+    __slots__ = "_headers",
     NESTED_SECTION_ID = "headers"
     SECTION_TYPE = "Headers", "Header"
     NESTED_ATTRS = "_headers",
@@ -548,7 +807,43 @@ class Headers(Section):
         return Headers(parent, headers)
 
 
+def decode_content(cls, data):
+    """Restores the asset content which was pickled out-of-band.
+    """
+    return cls(codecs.decode(data, "utf-8"))
+
+
+class OutOfBandContent(object):
+    """Pickles the asset content as PickleBuffer, so that the protocol 5
+    consumers which pass buffer_callback receive it out-of-band.
+    """
+    __slots__ = "content",
+
+    def __init__(self, content):
+        self.content = content
+
+    def __reduce_ex__(self, protocol):
+        content = self.content
+        return decode_content, (
+            type(content), PickleBuffer(content.encode("utf-8")))
+
+
+class DeferredContent(object):
+    """The asset content which is read by load() on the first access, see
+    compiled.CompiledBlueprint.
+    """
+    __slots__ = "load",
+
+    def __init__(self, load):
+        self.load = load
+
+
 class AssetSection(Section):
+    __slots__ = "_keyword", "_content"
+    # the contents of at least this many characters are pickled out-of-band
+    # with protocol 5
+    OUT_OF_BAND_SIZE = 64 * 1024
+
     def __init__(self, parent, keyword, content):
         super(AssetSection, self).__init__(parent)
         self._keyword = keyword
@@ -560,7 +855,18 @@ class AssetSection(Section):
 
     @property
     def content(self):
-        return self._content
+        content = self._content
+        if isinstance(content, DeferredContent):
+            content = self._content = content.load()
+        return content
+
+    def __reduce_ex__(self, protocol):
+        content = self.content
+        reduced = super(AssetSection, self).__reduce_ex__(protocol)
+        if protocol >= 5 and PickleBuffer is not None and \
+                content is not None and len(content) >= self.OUT_OF_BAND_SIZE:
+            reduced[2]["_content"] = OutOfBandContent(content)
+        return reduced
 
     def __str__(self):
         return "%s\n%s" % (self.keyword, self.content)
@@ -568,6 +874,8 @@ class AssetSection(Section):
 
 @add_metaclass(SelfParsingSectionRegistry)
 class PredefinedAssetSection(AssetSection):
+    __slots__ = tuple()
+
     def __init__(self, parent, content):
         super(PredefinedAssetSection, self).__init__(
             parent, self.SECTION_TYPE, content)
@@ -582,16 +890,22 @@ class PredefinedAssetSection(AssetSection):
 
 
 class Body(PredefinedAssetSection):
+    __slots__ = tuple()
     NESTED_SECTION_ID = "body"
     SECTION_TYPE = "Body"
 
 
 class Schema(PredefinedAssetSection):
+    __slots__ = tuple()
     NESTED_SECTION_ID = "schema"
     SECTION_TYPE = "Schema"
 
 
 class PayloadSection(NamedSection):
+    # _decoded caches value()
+    __slots__ = ("_keyword", "_media_type", "_headers_value",
+                 "_attributes_value", "_body_value", "_schema_value",
+                 "_reference", "_decoded")
     NESTED_ATTRS = "_headers", "_attributes", "_body", "_schema", "_reference"
 
     def __init__(self, parent, keyword, name, media_type, description,
@@ -613,6 +927,7 @@ class PayloadSection(NamedSection):
         self._body = body
         self._schema = schema
         self._reference = reference
+        self._decoded = None
 
     @property
     def keyword(self):
@@ -643,17 +958,42 @@ class PayloadSection(NamedSection):
     _body = property_with_parent("_body", Body)
     _schema = property_with_parent("_schema", Schema)
 
-    def value(self):
+    def value(self, copy=True, frozen=False):
+        """Returns the body decoded according to the media type. It is
+        decoded once and cached, so by default a copy is returned which the
+        caller is free to modify. copy=False returns the cached object itself
+        and frozen=True returns the cached read-only version of it.
+        """
+        content = self.body.content
+        decoded = self._decoded
+        # the body may be replaced, e.g. by the references resolution
+        if decoded is None or decoded[0] is not content:
+            decoded = self._decoded = [content, self._decode(content), None]
+        if frozen:
+            if decoded[2] is None:
+                decoded[2] = freeze_value(decoded[1])
+            return decoded[2]
+        if copy:
+            return copy_value(decoded[1])
+        return decoded[1]
+
+    def _decode(self, content):
         if self.media_type == ("application", "json"):
-            return json.loads(self.body.content)
+            # orjson does not accept str subclasses like AtomicString
+            return json_loads(text_type(content))
         elif self.media_type == ("application", "xml"):
-            return ElementTree.fromstring(self.body.content)
+            return ElementTree.fromstring(content)
         elif self.media_type == ("text", "plain"):
-            return self.body.content.strip()
-        raise NotImplemented(
+            return content.strip()
+        raise NotImplementedError(
             "value() is not implemented for media type %s/%s" %
             self.media_type)
 
+    def __getstate__(self):
+        state = super(PayloadSection, self).__getstate__()
+        state["_decoded"] = None
+        return state
+
     def __str__(self):
         res = "%s%s" % (self.keyword, (" " + self.name) if self.name else "")
         if self.media_type is not None:
@@ -681,6 +1021,8 @@ class PayloadSection(NamedSection):
 
 @add_metaclass(SelfParsingSectionRegistry)
 class PredefinedPayloadSection(PayloadSection):
+    __slots__ = tuple()
+
     def __init__(self, parent, name, media_type, description,
                  headers, attributes, body, schema):
         super(PredefinedPayloadSection, self).__init__(
@@ -708,15 +1050,10 @@ class PredefinedPayloadSection(PayloadSection):
                         section = SelfParsingSectionRegistry[
                             section_name].parse_from_etree(None, li)
                     except KeyError:
-                        if report_warnings:
-                            sys.stderr.write(
-                                "Section \"%s\" is unknown\n" % section_name)
+                        diagnostics.warn("unknown-section", section_name)
                     except ValueError as e:
-                        if report_warnings:
-                            sys.stderr.write(
-                                "Failed to parse section \"%s\" in payload "
-                                "section %s: %s\n" % (
-                                    section_name, defs[0], e))
+                        diagnostics.warn("invalid-payload-section",
+                                         section_name, defs[0], e)
                     else:
                         kwargs[section.NESTED_SECTION_ID] = section
         return cls(parent, *defs, **kwargs)
@@ -724,10 +1061,7 @@ class PredefinedPayloadSection(PayloadSection):
     @staticmethod
     def parse_definition(txt):
         if "\n" in txt:
-            if report_warnings:
-                sys.stderr.write(
-                    "Invalid format, description was discarded: \"%s\"\n"
-                    % txt)
+            diagnostics.warn("discarded-description", txt)
             txt = txt[:txt.find("\n")]
         sep_pos = select_pos(txt.find(c) for c in (' ', '\t'))
         if sep_pos < 0:
@@ -751,15 +1085,18 @@ class PredefinedPayloadSection(PayloadSection):
 
 
 class Model(PredefinedPayloadSection):
+    __slots__ = tuple()
     NESTED_SECTION_ID = "model"
     SECTION_TYPE = "Model"
 
 
 class RRPredefinedPayloadSection(PredefinedPayloadSection, ReferenceableMixin):
+    __slots__ = tuple()
+
     def _copy_from_payload(self, payload):
         if self.name is None:
             self._name = payload.name
-        self._description = payload.description
+        self._description = payload._description
         self._media_type = payload.media_type
         self._headers = payload.headers
         self._attributes = payload.attributes
@@ -778,6 +1115,7 @@ class RRPredefinedPayloadSection(PredefinedPayloadSection, ReferenceableMixin):
 
 
 class Request(RRPredefinedPayloadSection):
+    __slots__ = "_responses",
     SECTION_TYPE = "Request"
     NESTED_SECTION_ID = "requests"
 
@@ -794,28 +1132,25 @@ class Request(RRPredefinedPayloadSection):
 
     @property
     def uri(self):
-        values = {}
-        for p in chain(self.parent.parent.parameters or tuple(),
-                       self.parent.parameters or tuple()):
-            if p.default_value is not None:
-                values[p.name] = p.default_value
-            if p.value is not None:
-                values[p.name] = p.value
-        return self.uri_template.expand(values)
+        return self.parent.uri
 
     def _add_response(self, response):
         assert isinstance(response, Response)
         self._responses.append(weakref.proxy(response))
 
-    def _fix_parents(self, parent):
-        super(Request, self)._fix_parents(parent)
-        responses = tuple(self._responses)
-        del self._responses[:]
-        for r in responses:
-            self._add_response(self.parent.responses[r.http_code])
+    def __getstate__(self):
+        state = super(Request, self).__getstate__()
+        # Action._relink() pairs the responses again
+        state["_responses"] = []
+        return state
 
 
 class Response(RRPredefinedPayloadSection):
+    """One Response is shared by all the requests which precede it in the
+    same transaction example instead of being copied for each of them.
+    """
+    # _request_names is only set between unpickling and _fix_parents()
+    __slots__ = "_requests", "_request_names"
     SECTION_TYPE = "Response"
     NESTED_SECTION_ID = "responses"
 
@@ -824,33 +1159,39 @@ class Response(RRPredefinedPayloadSection):
         super(Response, self).__init__(
             parent, name, media_type, description, headers, attributes, body,
             schema)
-        self._request = None
+        self._requests = []
+        self._request_names = None
 
     @property
     def request(self):
-        return self._request
+        """The first of the paired requests.
+        """
+        return self._requests[0] if self._requests else None
 
     @property
-    def _request(self):
-        return self.__request
+    def requests(self):
+        return tuple(self._requests)
 
-    @_request.setter
-    def _request(self, value):
-        if value is not None and not isinstance(value, weakref.ProxyType):
-            value = weakref.proxy(value)
-        self.__request = value
+    def _add_request(self, request):
+        assert isinstance(request, Request)
+        self._requests.append(weakref.proxy(request))
+
+    def __getstate__(self):
+        state = super(Response, self).__getstate__()
+        # Action._relink() pairs the requests again
+        state["_requests"] = []
+        if self._requests:
+            state["_request_names"] = [r.name for r in self._requests]
+        return state
 
     @property
     def http_code(self):
         return int(self._name)
 
-    def _fix_parents(self, parent):
-        super(Response, self)._fix_parents(parent)
-        if self.request is not None:
-            self._request = self.parent.requests[self.request.name]
-
 
 class ApiSection(NamedSection):
+    __slots__ = ("_request_method", "_uri_template", "_parameters_value",
+                 "_attributes_value", "_uri_cache")
     NESTED_SECTIONS = "parameters", "attributes"
     URL_PATH_PATH_REGEXP = re.compile("^[\w\-\.]*$]")
     NESTED_ATTRS = "_parameters", "_attributes"
@@ -865,6 +1206,7 @@ class ApiSection(NamedSection):
             if uri_template else None
         self._parameters = parameters
         self._attributes = attributes
+        self._uri_cache = None
 
     @property
     def request_method(self):
@@ -885,6 +1227,56 @@ class ApiSection(NamedSection):
     _parameters = property_with_parent("_parameters", Parameters)
     _attributes = property_with_parent("_attributes", Attributes)
 
+    @property
+    def uri_variables(self):
+        """The default values of the URI template variables.
+        """
+        return dict(self._get_uri_cache()[1])
+
+    @property
+    def uri(self):
+        """The URI template expanded with the default values.
+        """
+        return self._get_uri_cache()[2]
+
+    @property
+    def uri_expander(self):
+        """router.UriExpander of the URI template with the default values.
+        """
+        cache = self._get_uri_cache()
+        if cache[3] is None and self._uri_template is not None:
+            cache[3] = UriExpander(self._uri_template, cache[1])
+        return cache[3]
+
+    def _uri_state(self):
+        return self._uri_template, self.parameters
+
+    def _get_uri_cache(self):
+        # the parameters and the template are replaced, never changed in
+        # place, so comparing the identities is enough to invalidate
+        state = self._uri_state()
+        cache = self._uri_cache
+        if cache is not None and all(
+                a is b for a, b in zip(cache[0], state)):
+            return cache
+        values = {}
+        for params in state[1:]:
+            for p in params or tuple():
+                if p.default_value is not None:
+                    values[p.name] = p.default_value
+                if p.value is not None:
+                    values[p.name] = p.value
+        uri = self._uri_template.expand(values) \
+            if self._uri_template is not None else None
+        # [state, variables, uri, expander]
+        self._uri_cache = cache = [state, values, uri, None]
+        return cache
+
+    def __getstate__(self):
+        state = super(ApiSection, self).__getstate__()
+        state["_uri_cache"] = None
+        return state
+
     @property
     def id(self):
         if self.name is not None:
@@ -899,6 +1291,7 @@ class ApiSection(NamedSection):
 
 @add_metaclass(SelfParsingSectionRegistry)
 class Relation(Section):
+    __slots__ = "_link_id",
     NESTED_SECTION_ID = "relation"
     SECTION_TYPE = "Relation"
 
@@ -927,6 +1320,7 @@ class Relation(Section):
 
 
 class Action(ApiSection):
+    __slots__ = "_relation_value", "_requests", "_responses"
     NESTED_SECTIONS = ApiSection.NESTED_SECTIONS + ("relation",)
     NESTED_ATTRS = ApiSection.NESTED_ATTRS + \
         ("_relation", "_requests", "_responses")
@@ -968,19 +1362,30 @@ class Action(ApiSection):
     def responses(self):
         return self._responses
 
-    @property
-    def uri(self):
-        values = {}
-        for p in chain(self.parent.parameters or tuple(),
-                       self.parameters or tuple()):
-            if p.default_value is not None:
-                values[p.name] = p.default_value
-            if p.value is not None:
-                values[p.name] = p.value
-        return self.uri_template.expand(values)
+    def _uri_state(self):
+        parent = self.parent
+        return (self._uri_template,
+                parent.parameters if parent is not None else None,
+                self.parameters)
 
     _relation = property_with_parent("_relation", Relation)
 
+    def _nested_sections(self):
+        result = super(Action, self)._nested_sections()
+        result.extend(chain.from_iterable(self._responses.values()))
+        return result
+
+    def _relink(self):
+        for response in chain.from_iterable(self._responses.values()):
+            names = response._request_names
+            if names is None:
+                continue
+            response._request_names = None
+            for name in names:
+                request = self._requests[name]
+                response._add_request(request)
+                request._add_response(response)
+
     def __str__(self):
         res = "Action "
         if self.name is None:
@@ -1055,14 +1460,10 @@ class Action(ApiSection):
                     section = SelfParsingSectionRegistry[
                         section_name].parse_from_etree(None, li)
                 except KeyError:
-                    if report_warnings:
-                        sys.stderr.write(
-                            "Section \"%s\" is unknown\n" % section_name)
+                    diagnostics.warn("unknown-section", section_name)
                 except ValueError as e:
-                    if report_warnings:
-                        sys.stderr.write(
-                            "Failed to parse section \"%s\" in action "
-                            "%s: %s\n" % (section_name, adef[0], e))
+                    diagnostics.warn("invalid-action-section",
+                                     section_name, adef[0], e)
                 else:
                     if isinstance(section, Request):
                         if clear_requests:
@@ -1070,12 +1471,9 @@ class Action(ApiSection):
                         current_requests.append(section)
                     elif isinstance(section, Response):
                         clear_requests = True
-                        for i, cr in enumerate(current_requests):
-                            section._request = cr
+                        for cr in current_requests:
+                            section._add_request(cr)
                             cr._add_response(section)
-                            if i < len(current_requests) - 1:
-                                kwargs["responses"].append(section)
-                                section = deepcopy(section)
                     if section.SECTION_TYPE in ("Request", "Response"):
                         kwargs[section.NESTED_SECTION_ID].append(section)
                     else:
@@ -1092,6 +1490,7 @@ class Action(ApiSection):
 
 
 class Resource(ApiSection):
+    __slots__ = "_model_value", "_actions"
     NESTED_SECTIONS = ApiSection.NESTED_SECTIONS + ("model",)
     NESTED_ATTRS = ApiSection.NESTED_ATTRS + ("_model", "_actions")
 
@@ -1108,16 +1507,6 @@ class Resource(ApiSection):
     def model(self):
         return self._model
 
-    @property
-    def uri(self):
-        values = {}
-        for p in self.parameters or tuple():
-            if p.default_value is not None:
-                values[p.name] = p.default_value
-            if p.value is not None:
-                values[p.name] = p.value
-        return self.uri_template.expand(values)
-
     _model = property_with_parent("_model", Model)
 
     def __iter__(self):
@@ -1181,6 +1570,7 @@ class Resource(ApiSection):
 
 
 class ResourceGroup(NamedSection):
+    __slots__ = "_resources",
     NESTED_ATTRS = "_resources",
 
     def __init__(self, parent, name, description):
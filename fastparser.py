@@ -0,0 +1,300 @@
+# -*- coding: utf-8 -*-
+"""
+API Blueprint (https://github.com/apiaryio/api-blueprint) parser which uses
+Markdown (https://pythonhosted.org/Markdown/).
+
+Released under New BSD License.
+
+Copyright © 2015, Vadim Markovtsev :: AO InvestGroup
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+    * Redistributions of source code must retain the above copyright
+      notice, this list of conditions and the following disclaimer.
+    * Redistributions in binary form must reproduce the above copyright
+      notice, this list of conditions and the following disclaimer in the
+      documentation and/or other materials provided with the distribution.
+    * Neither the name of the AO InvestGroup nor the
+      names of its contributors may be used to endorse or promote products
+      derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL VADIM MARKOVTSEV BE LIABLE FOR ANY
+DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+import re
+from xml.etree.ElementTree import Element, ElementTree, SubElement
+
+from .mdparser import TitleLifter, default_parser
+from . import profiling
+
+
+REFERENCE_TITLE = r'[ ]*(\"(.*)\"|\'(.*)\'|\((.*)\))[ ]*'
+REFERENCE_REGEXP = re.compile(
+    r'^[ ]{0,3}\[([^\]]*)\]:\s*([^ ]*)[ ]*(%s)?$' % REFERENCE_TITLE)
+HEADER_REGEXP = re.compile(r'^(#{1,6})(.*?)#*$')
+LIST_ITEM_REGEXP = re.compile(r'^(?:([*+-])|\d+\.)[ ]+(.*)$')
+HR_REGEXP = re.compile(
+    r'^((-+[ ]{0,2}){3,}|(_+[ ]{0,2}){3,}|(\*+[ ]{0,2}){3,})[ ]*$')
+SETEXT_REGEXP = re.compile(r'^([=-])+[ ]*$')
+
+
+class Container(object):
+    def __init__(self, element, indent, base):
+        self.element = element
+        self.indent = indent
+        # the indentation which is removed from the continuation lines of
+        # the first paragraph
+        self.base = base
+        self.paragraph = None
+        self.lines = None
+        self.item_text = False
+        self.code = None
+        self.code_lines = None
+
+
+class BlueprintTokenizer(object):
+    """Line-oriented tokenizer which builds the same block ElementTree as
+    Markdown does for API Blueprint documents (headers, paragraphs, nested
+    lists and indented code blocks) without inline processing.
+
+    Feed the lines one by one; feed() returns the top level elements which
+    are complete so far. If detach is True, those elements are removed from
+    the root so that the tree never holds more than one of them.
+    """
+    def __init__(self, detach=False):
+        self._detach = detach
+        self._root = Element("div")
+        self._stack = [Container(self._root, 0, 0)]
+        # Markdown splits the text into blocks at blank lines; the container
+        # which received the first line of the current block
+        self._block = None
+        self._blank = True
+        self._emitted = 0
+
+    @property
+    def root(self):
+        return self._root
+
+    def feed(self, line):
+        line = line.rstrip("\r\n").expandtabs(4)
+        if REFERENCE_REGEXP.match(line):
+            line = ""
+        line = line.replace("`", "")
+        if not line.strip():
+            self._blank = True
+            top = self._stack[-1]
+            # Markdown keeps the blank lines of the nested code blocks only
+            # once
+            if top.code is not None and (
+                    top.element is self._root or top.code_lines[-1]):
+                top.code_lines.append("")
+            return self._complete()
+        indent = 0
+        while indent < len(line) and line[indent] == ' ':
+            indent += 1
+        if indent % 4:
+            # IndentationAligner
+            line = ' ' * (indent + 4 - indent % 4) + line[indent:]
+            indent += 4 - indent % 4
+        self._feed(line, indent, line[indent:])
+        self._blank = False
+        return self._complete()
+
+    def close(self):
+        while len(self._stack) > 1:
+            self._close(self._stack.pop())
+        self._close(self._stack[0])
+        result = list(self._root[self._emitted:])
+        for element in result:
+            prettify(element)
+        if self._detach:
+            del self._root[:]
+            self._emitted = 0
+        else:
+            self._emitted = len(self._root)
+        return result
+
+    def _complete(self):
+        # all the top level elements except the last one are finished
+        count = len(self._root) - 1
+        if count <= self._emitted:
+            return []
+        result = list(self._root[self._emitted:count])
+        for element in result:
+            prettify(element)
+        if self._detach:
+            del self._root[:count]
+            count = 0
+        self._emitted = count
+        return result
+
+    def _feed(self, line, indent, content):
+        block = self._block
+        if not self._blank and block is not None and \
+                indent < block.indent and block in self._stack:
+            # Markdown detabs the block and parses it inside the container,
+            # so the indentation is relative to the container
+            indent += block.indent
+            line = ' ' * indent + content
+        if content[0] == '#':
+            target = self._header_target(indent)
+            if target is not None:
+                while self._stack[-1] is not target:
+                    self._close(self._stack.pop())
+                self._close(target)
+                match = HEADER_REGEXP.match(content)
+                SubElement(target.element, "h%d" % len(match.group(1))).text \
+                    = match.group(2).strip()
+                self._block = target
+                return
+        top = self._stack[-1]
+        marker = LIST_ITEM_REGEXP.match(content)
+        if not self._blank and top.paragraph is not None:
+            if indent == 0 and self._setext(top, content):
+                return
+            # list items interrupt the text of the item but not paragraphs
+            interrupts = HR_REGEXP.match(content) and indent == 0 or \
+                marker is not None and top.item_text and \
+                indent < top.indent + 4
+            if not interrupts:
+                top.lines.append(self._dedent(line, top.base))
+                return
+        # the lines of the same block never leave its container
+        while len(self._stack) > 1 and indent < self._stack[-1].indent and \
+                (self._blank or self._stack[-1] is not self._block):
+            self._close(self._stack.pop())
+        top = self._stack[-1]
+        if self._blank:
+            self._block = top
+        if indent - top.indent >= 4:
+            self._close_paragraph(top)
+            self._add_code(top, line[top.indent + 4:])
+            return
+        self._close_paragraph(top)
+        self._close_code(top)
+        if HR_REGEXP.match(content):
+            SubElement(top.element, "hr")
+            return
+        if marker is not None:
+            self._add_item(top, indent, marker)
+            return
+        top.paragraph = SubElement(top.element, "p")
+        top.lines = [content]
+        top.item_text = False
+        top.base = top.indent
+
+    def _header_target(self, indent):
+        if self._blank or self._block not in self._stack:
+            for container in reversed(self._stack):
+                if indent >= container.indent:
+                    return container if indent == container.indent else None
+        # Markdown looks for headers in the whole block first and then in the
+        # detabbed chunks of the nested list items
+        if indent in (0, self._block.indent):
+            return self._block
+        index = self._stack.index(self._block)
+        for container in self._stack[index + 1:-1]:
+            if container.indent == indent:
+                return container
+        return None
+
+    def _setext(self, top, content):
+        if top.element is not self._root or len(top.lines) != 1:
+            return False
+        match = SETEXT_REGEXP.match(content)
+        if match is None:
+            return False
+        top.paragraph.tag = "h1" if match.group(1) == "=" else "h2"
+        top.paragraph.text = top.lines[0].strip()
+        top.paragraph = top.lines = None
+        return True
+
+    def _add_item(self, top, indent, marker):
+        parent = top.element
+        if len(parent) and parent[-1].tag in ("ul", "ol"):
+            lst = parent[-1]
+        else:
+            lst = SubElement(parent, "ul" if marker.group(1) else "ol")
+        item = Container(SubElement(lst, "li"), max(indent, top.indent) + 4,
+                         top.indent)
+        item.paragraph = item.element
+        item.lines = [marker.group(2)]
+        item.item_text = True
+        self._stack.append(item)
+
+    def _add_code(self, top, line):
+        if top.code is None:
+            top.code = SubElement(SubElement(top.element, "pre"), "code")
+            top.code_lines = []
+        top.code_lines.append(line)
+
+    def _close(self, container):
+        self._close_paragraph(container)
+        self._close_code(container)
+
+    @staticmethod
+    def _close_paragraph(container):
+        if container.paragraph is None:
+            return
+        container.paragraph.text = "\n".join(container.lines)
+        container.paragraph = container.lines = None
+        container.item_text = False
+
+    @staticmethod
+    def _close_code(container):
+        if container.code is None:
+            return
+        container.code.text = "\n".join(container.code_lines).rstrip() + "\n"
+        container.code = None
+
+    @staticmethod
+    def _dedent(line, size):
+        indent = 0
+        while indent < size and indent < len(line) and line[indent] == ' ':
+            indent += 1
+        return line[indent - indent % 4:]
+
+
+def prettify(element):
+    """Adds the line breaks between the block elements like Markdown's
+    PrettifyTreeprocessor does.
+    """
+    if element.tag != "pre":
+        if (not element.text or not element.text.strip()) and len(element):
+            element.text = "\n"
+        for child in element:
+            prettify(child)
+    if not element.tail or not element.tail.strip():
+        element.tail = "\n"
+
+
+def tokenize(lines):
+    tokenizer = BlueprintTokenizer()
+    for line in lines:
+        tokenizer.feed(line)
+    tokenizer.close()
+    return tokenizer.root
+
+
+def parse(txt):
+    """Parses API Blueprint without Markdown. Descriptions are not processed
+    by the Markdown inline patterns, so e.g. **emphasis** stays as is.
+    """
+    return default_parser("fast").parse(txt)
+
+
+def parse_tree(txt):
+    with profiling.phase("BlueprintTokenizer"):
+        root = tokenize(txt.splitlines())
+    with profiling.phase("TitleLifter"):
+        TitleLifter(None).run(root)
+    return ElementTree(root)
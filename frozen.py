@@ -0,0 +1,306 @@
+# -*- coding: utf-8 -*-
+"""
+API Blueprint (https://github.com/apiaryio/api-blueprint) parser which uses
+Markdown (https://pythonhosted.org/Markdown/).
+
+Released under New BSD License.
+
+Copyright © 2015, Vadim Markovtsev :: AO InvestGroup
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+    * Redistributions of source code must retain the above copyright
+      notice, this list of conditions and the following disclaimer.
+    * Redistributions in binary form must reproduce the above copyright
+      notice, this list of conditions and the following disclaimer in the
+      documentation and/or other materials provided with the distribution.
+    * Neither the name of the AO InvestGroup nor the
+      names of its contributors may be used to endorse or promote products
+      derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL VADIM MARKOVTSEV BE LIABLE FOR ANY
+DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+from collections import namedtuple
+import gc
+
+from six import text_type
+
+from .index import status_codes
+from .router import FrozenRouter
+
+
+# The catalog stores plain tuples with these fields, because the garbage
+# collector never untracks tuple subclasses; the named tuples are built on
+# access. The records refer to each other by index.
+FrozenGroup = namedtuple("FrozenGroup", ("name", "description", "resources"))
+FrozenResource = namedtuple("FrozenResource", (
+    "group", "id", "name", "uri_template", "uri", "description",
+    "parameters", "model", "actions"))
+FrozenAction = namedtuple("FrozenAction", (
+    "resource", "id", "name", "request_method", "uri_template", "uri",
+    "description", "relation", "parameters", "requests", "responses"))
+FrozenParameter = namedtuple("FrozenParameter", (
+    "name", "type", "required", "description", "value", "default_value",
+    "members"))
+FrozenPayload = namedtuple("FrozenPayload", (
+    "keyword", "name", "status", "media_type", "description", "headers",
+    "body", "schema"))
+
+
+def _text(value):
+    return text_type(value) if value is not None else None
+
+
+def _freeze_parameters(parameters):
+    if parameters is None:
+        return tuple()
+    return tuple((
+        _text(p.name), _text(p.type), p.required, _text(p.description),
+        _text(p.value), _text(p.default_value),
+        tuple(_text(m.name) for m in p.members)) for p in parameters)
+
+
+def _freeze_payload(payload, status=None):
+    return (
+        payload.keyword, _text(payload.name), status,
+        "/".join(payload.media_type) if payload.media_type else None,
+        _text(payload.description),
+        tuple((_text(k), _text(v)) for k, v in payload.headers)
+        if payload.headers is not None else tuple(),
+        _text(payload.body.content) if payload.body is not None else None,
+        _text(payload.schema.content) if payload.schema is not None
+        else None)
+
+
+class FrozenCatalog(object):
+    """Read-only snapshot of APIBlueprint made of tuples, strings and
+    integers which the garbage collector does not track, so the catalog
+    built before fork() stays shared between the worker processes. The
+    groups, the resources, the actions and the payloads are numbered and
+    returned as the Frozen* named tuples which refer to each other by these
+    numbers. Call prepare_fork() right before forking.
+    """
+    # the kinds of _paths values, which are index * 3 + kind
+    GROUP, RESOURCE, ACTION = range(3)
+
+    def __init__(self, api):
+        groups = []
+        resources = []
+        actions = []
+        payloads = []
+        paths = {}
+        by_name = {}
+        by_relation = {}
+        by_status = {}
+        by_media_type = {}
+        # action -> its number, for the router
+        numbers = {}
+
+        def add_payload(payload, status=None):
+            record = _freeze_payload(payload, status)
+            payloads.append(record)
+            if record[3] is not None:
+                by_media_type.setdefault(record[3], []).append(
+                    len(payloads) - 1)
+            return len(payloads) - 1
+
+        for group in api:
+            gkey = ">%s" % (group.name or "")
+            paths[gkey] = paths[group.name] = len(groups) * 3 + self.GROUP
+            group_resources = []
+            for resource in group:
+                rindex = len(resources)
+                group_resources.append(rindex)
+                rkey = "%s>%s" % (gkey, resource.id)
+                paths[rkey] = rindex * 3 + self.RESOURCE
+                model = add_payload(resource.model) \
+                    if resource.model is not None else -1
+                resource_actions = []
+                for action in resource:
+                    aindex = len(actions)
+                    resource_actions.append(aindex)
+                    numbers[action] = aindex
+                    paths["%s>%s" % (rkey, action.id)] = \
+                        aindex * 3 + self.ACTION
+                    if action.name is not None:
+                        by_name.setdefault(action.name, []).append(aindex)
+                    relation = action.relation.link_id \
+                        if action.relation is not None else None
+                    if relation is not None:
+                        by_relation.setdefault(relation, []).append(aindex)
+                    requests = tuple(add_payload(r)
+                                     for r in action.requests.values())
+                    responses = []
+                    for code, items in action.responses.items():
+                        for response in items:
+                            responses.append(add_payload(response, code))
+                            by_status.setdefault(code, []).append(
+                                responses[-1])
+                    actions.append((
+                        rindex, _text(action.id), _text(action.name),
+                        action.request_method, _text(action.uri_template),
+                        action.uri, _text(action.description), relation,
+                        _freeze_parameters(action.parameters), requests,
+                        tuple(responses)))
+                resources.append((
+                    len(groups), _text(resource.id), _text(resource.name),
+                    _text(resource.uri_template), resource.uri,
+                    _text(resource.description),
+                    _freeze_parameters(resource.parameters), model,
+                    tuple(resource_actions)))
+            groups.append((group.name, _text(group.description),
+                           tuple(group_resources)))
+        self._name = api.name
+        self._metadata = tuple(sorted(api.metadata.items()))
+        self._groups = tuple(groups)
+        self._resources = tuple(resources)
+        self._actions = tuple(actions)
+        self._payloads = tuple(payloads)
+        self._paths = paths
+        # the dicts map to the indexes in _postings, see FrozenRouter
+        postings = []
+        self._by_name = self._add_postings(by_name, postings)
+        self._by_relation = self._add_postings(by_relation, postings)
+        self._by_status = self._add_postings(by_status, postings)
+        self._by_media_type = self._add_postings(by_media_type, postings)
+        self._postings = tuple(postings)
+        self._router = FrozenRouter(api._router, numbers)
+
+    @staticmethod
+    def _add_postings(table, postings):
+        result = {}
+        for key, indexes in table.items():
+            result[key] = len(postings)
+            postings.append(tuple(indexes))
+        return result
+
+    def _lookup(self, table, key):
+        index = table.get(key)
+        return self._postings[index] if index is not None else tuple()
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def metadata(self):
+        return dict(self._metadata)
+
+    @property
+    def format(self):
+        return self.metadata.get("FORMAT")
+
+    def group(self, index):
+        return FrozenGroup._make(self._groups[index])
+
+    def resource(self, index):
+        record = self._resources[index]
+        return FrozenResource._make(record[:6] + (
+            tuple(FrozenParameter._make(p) for p in record[6]),
+            self.payload(record[7]) if record[7] >= 0 else None,
+            record[8]))
+
+    def action(self, index):
+        record = self._actions[index]
+        return FrozenAction._make(record[:8] + (
+            tuple(FrozenParameter._make(p) for p in record[8]),
+            tuple(self.payload(i) for i in record[9]),
+            tuple(self.payload(i) for i in record[10])))
+
+    def payload(self, index):
+        return FrozenPayload._make(self._payloads[index])
+
+    @property
+    def groups(self):
+        for index in range(len(self._groups)):
+            yield self.group(index)
+
+    @property
+    def resources(self):
+        for index in range(len(self._resources)):
+            yield self.resource(index)
+
+    @property
+    def actions(self):
+        for index in range(len(self._actions)):
+            yield self.action(index)
+
+    def __len__(self):
+        return len(self._groups)
+
+    def __iter__(self):
+        return self.groups
+
+    def __getitem__(self, item):
+        """Returns the group by name or the group, the resource or the action
+        by ">group>resource>action".
+        """
+        index, kind = divmod(self._paths[item], 3)
+        return (self.group, self.resource, self.action)[kind](index)
+
+    def match(self, path, method=None):
+        """Finds the action which serves the concrete request path, see
+        APIBlueprint.match().
+        """
+        result = self._router.match(path, method)
+        if result is None:
+            raise KeyError(
+                path if method is None else "%s:%s" % (path, method))
+        index, variables = result
+        return self.action(index), variables
+
+    def actions_by_name(self, name):
+        return tuple(self.action(i) for i in self._lookup(self._by_name, name))
+
+    def actions_by_relation(self, link_id):
+        return tuple(self.action(i)
+                     for i in self._lookup(self._by_relation, link_id))
+
+    def responses_by_status(self, status):
+        """status is either the exact code, e.g. 404, or the class, e.g.
+        "4xx".
+        """
+        codes = status_codes(status, self._by_status)
+        return tuple(self.payload(i) for code in codes
+                     for i in self._lookup(self._by_status, code))
+
+    def payloads_by_media_type(self, media_type):
+        if isinstance(media_type, tuple):
+            media_type = "/".join(media_type)
+        return tuple(self.payload(i) for i in self._lookup(
+            self._by_media_type, media_type))
+
+    def __str__(self):
+        return "FrozenCatalog \"%s\", format %s, with %d resource groups " \
+               "(%d resources, %d actions)" % (
+                   self.name, self.format, len(self._groups),
+                   len(self._resources), len(self._actions))
+
+
+def prepare_fork():
+    """Collects the garbage until the nested tuples and dicts which hold
+    only atomic values are untracked (one level per pass) and moves the rest
+    of the objects to the permanent generation (Python 3.7+), so that the
+    collections in the forked workers do not write to the pages shared with
+    the parent.
+    """
+    tracked = None
+    while True:
+        gc.collect()
+        count = len(gc.get_objects())
+        if count == tracked:
+            break
+        tracked = count
+    if hasattr(gc, "freeze"):
+        gc.freeze()
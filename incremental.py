@@ -0,0 +1,415 @@
+# -*- coding: utf-8 -*-
+"""
+API Blueprint (https://github.com/apiaryio/api-blueprint) parser which uses
+Markdown (https://pythonhosted.org/Markdown/).
+
+Released under New BSD License.
+
+Copyright © 2015, Vadim Markovtsev :: AO InvestGroup
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+    * Redistributions of source code must retain the above copyright
+      notice, this list of conditions and the following disclaimer.
+    * Redistributions in binary form must reproduce the above copyright
+      notice, this list of conditions and the following disclaimer in the
+      documentation and/or other materials provided with the distribution.
+    * Neither the name of the AO InvestGroup nor the
+      names of its contributors may be used to endorse or promote products
+      derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL VADIM MARKOVTSEV BE LIABLE FOR ANY
+DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+from collections import OrderedDict
+import hashlib
+import re
+
+from .entities import ResourceGroup
+from .fastparser import HEADER_REGEXP, REFERENCE_REGEXP
+from .diagnostics import Diagnostics
+from .mdparser import APIBlueprint, parse_tree
+
+
+def parse(txt, engine="markdown"):
+    """Parses API Blueprint and remembers the digests of its sections so
+    that APIBlueprint.update() can parse only the changed ones later.
+    """
+    api = APIBlueprint()
+    api._diagnostics = Diagnostics(txt)
+    with api.diagnostics.collect():
+        _parse_whole(api, txt, engine)
+    return api
+
+
+def update(api, txt, engine=None):
+    """Patches api in place to match the new source text. Only the changed
+    resource groups and resources are parsed again; the whole text is parsed
+    if the metadata, overview, link references or Data Structures changed.
+    APIBlueprint.diagnostics is replaced with the warnings of the parsed
+    sections.
+    """
+    collector = Diagnostics(txt)
+    with collector.collect():
+        _update(api, txt, engine)
+    api._diagnostics = collector
+
+
+def _update(api, txt, engine):
+    sources = api._sources
+    if engine is None:
+        engine = sources.engine if sources is not None else "markdown"
+    outline = Outline(txt)
+    if sources is None or not sources.is_compatible(outline, engine):
+        _parse_whole(api, txt, engine)
+        return
+    try:
+        Patcher(api, outline, engine).run()
+    except IncompatibleChange:
+        _parse_whole(api, txt, engine)
+
+
+class IncompatibleChange(Exception):
+    pass
+
+
+def digest(txt):
+    return hashlib.sha1(txt.encode("utf-8")).hexdigest()
+
+
+class OutlineSection(object):
+    """Top level section of the source text: a resource group, a resource
+    without group or Data Structures. Groups consist of the head and the
+    resource chunks, other sections have a single chunk.
+    """
+    def __init__(self, kind, head, chunks):
+        self.kind = kind
+        self.head = head
+        self.chunks = chunks
+        self.head_digest = digest(head) if head is not None else None
+        self.chunk_digests = [digest(c) for c in chunks]
+
+
+class Outline(object):
+    """Splits the source text into the same top level sections which
+    APIBlueprint._parse() finds in the element tree. Only the headers in
+    the Markdown blocks which start at the beginning of a line are
+    considered, so the split is verified against the parsed layout.
+    """
+    def __init__(self, txt):
+        lines = txt.splitlines()
+        headers = []
+        references = []
+        blank = True
+        top_level = False
+        for i, line in enumerate(lines):
+            line = line.expandtabs(4).rstrip()
+            if not line.strip():
+                blank = True
+                continue
+            if blank:
+                # the blocks which start with an indented line are nested
+                top_level = line[0] != ' '
+            if REFERENCE_REGEXP.match(line):
+                references.append(line)
+            if line[0] == '#' and top_level:
+                match = HEADER_REGEXP.match(line)
+                headers.append([i, len(match.group(1)),
+                                match.group(2).strip()])
+            blank = False
+        self.text = txt
+        self.lifted = self._lift(headers)
+        self.references = "\n".join(references)
+        self.sections = []
+        self.preamble = txt
+        if not headers or headers[0][1] != 1:
+            return
+        starts = [h for h in headers[1:] if h[1] == 1]
+        if not starts:
+            return
+        first = headers.index(starts[0])
+        self.preamble = "\n".join(lines[:headers[first][0]])
+        sections = []
+        for header in headers[first:]:
+            if not sections or header[1] <= sections[-1][0][1]:
+                sections.append([header])
+            else:
+                sections[-1].append(header)
+        for index, section in enumerate(sections):
+            end = sections[index + 1][0][0] if index + 1 < len(sections) \
+                else len(lines)
+            self.sections.append(self._split(
+                lines, section, end, index == len(sections) - 1))
+
+    @staticmethod
+    def _lift(headers):
+        # TitleLifter
+        if sum(1 for h in headers
+               if h[1] == 1 and h[2] != "Data Structures") != 1:
+            return False
+        for header in headers:
+            if header[1] == 1:
+                if header[2] == "Data Structures":
+                    break
+                continue
+            header[1] -= 1
+        return True
+
+    @staticmethod
+    def _split(lines, headers, end, last):
+        start = headers[0][0]
+        text = headers[0][2]
+        if not text.startswith("Group"):
+            kind = "data_structures" if last and text == "Data Structures" \
+                else "resource"
+            return OutlineSection(kind, None, ["\n".join(lines[start:end])])
+        # APIBlueprint._parse_resource_group()
+        chunks = []
+        for header in headers[1:]:
+            if chunks:
+                if header[1] <= chunks[0][1]:
+                    chunks.append(header)
+            elif header[1] == 2:
+                chunks.append(header)
+        bounds = [h[0] for h in chunks] + [end]
+        return OutlineSection(
+            "group", "\n".join(lines[start:bounds[0]]),
+            ["\n".join(lines[bounds[i]:bounds[i + 1]])
+             for i in range(len(chunks))])
+
+    def fragment(self, *parts):
+        """Returns the text of the standalone document which consists of the
+        preamble and the specified parts.
+        """
+        return "\n".join((self.preamble,) + parts + ("", self.references))
+
+
+class SourceMap(object):
+    """Digests of the source sections together with the entities which were
+    parsed from them.
+    """
+    def __init__(self, outline, engine, units):
+        self.engine = engine
+        self.preamble = digest(outline.preamble)
+        self.references = digest(outline.references)
+        self.lifted = outline.lifted
+        # (kind, head digest, group, [(chunk digest, resource), ...])
+        self.units = units
+
+    @classmethod
+    def build(cls, outline, engine, layout):
+        """Matches the outline with the layout returned by
+        APIBlueprint._parse(). Returns None if they disagree.
+        """
+        if len(layout) != len(outline.sections):
+            return None
+        units = []
+        for section, (kind, group, resources) in zip(outline.sections,
+                                                     layout):
+            if kind == "data_structures":
+                resources = [None]
+            if kind != section.kind or len(resources) != len(section.chunks):
+                return None
+            units.append((kind, section.head_digest, group,
+                          list(zip(section.chunk_digests, resources))))
+        return cls(outline, engine, units)
+
+    @property
+    def data_structures(self):
+        for kind, _, _, chunks in self.units:
+            if kind == "data_structures":
+                return chunks
+        return None
+
+    def is_compatible(self, outline, engine):
+        if engine != self.engine or outline.lifted != self.lifted or \
+                digest(outline.preamble) != self.preamble or \
+                digest(outline.references) != self.references:
+            return False
+        new = [list(zip(s.chunk_digests, (None,) * len(s.chunks)))
+               for s in outline.sections if s.kind == "data_structures"]
+        return (new[0] if new else None) == self.data_structures
+
+
+class Patcher(object):
+    """Parses the changed sections as standalone documents and replaces the
+    corresponding entities.
+    """
+    def __init__(self, api, outline, engine):
+        self._api = api
+        self._outline = outline
+        self._engine = engine
+        self._models = {}
+        self._attributes = {r.name: r.attributes for r in api.resources
+                            if r.name is not None and
+                            r.attributes is not None}
+        self._data_structures = OrderedDict(
+            (k, v) for k, v in api._data_structures.items() if v is not None)
+        self._fragments = []
+        self._parsed = []
+        self._groups = set()
+
+    def run(self):
+        api = self._api
+        old_groups = {}
+        old_resources = {}
+        for kind, head, group, chunks in api._sources.units:
+            if kind == "group":
+                old_groups.setdefault(head, []).append((group, chunks))
+            elif kind == "resource":
+                old_resources.setdefault(chunks[0][0], []).append(
+                    chunks[0][1])
+        groups = OrderedDict()
+        contents = {}
+        units = []
+        for section in self._outline.sections:
+            if section.kind == "data_structures":
+                units.append((section.kind, None, None,
+                              [(section.chunk_digests[0], None)]))
+                continue
+            if section.kind == "resource":
+                key = section.chunk_digests[0]
+                reused = old_resources.get(key)
+                if reused:
+                    resource = reused.pop(0)
+                else:
+                    resource = self._parse_resource(section.chunks[0])
+                self._add_model(resource)
+                group = groups.get(None)
+                if group is None:
+                    group = api._groups.get(None)
+                    if group is None:
+                        group = ResourceGroup(api, None, None)
+                    groups[None] = group
+                    contents[None] = []
+                resources = [resource]
+            else:
+                reused = old_groups.get(section.head_digest)
+                if reused:
+                    group, chunks = reused.pop(0)
+                    resources = self._reuse_resources(section, group, chunks)
+                else:
+                    group, resources = self._parse_group(section)
+                    for resource in resources:
+                        self._add_model(resource)
+                groups[group.name] = group
+                contents[group.name] = []
+            contents[group.name].extend(r for r in resources if r is not None)
+            units.append((section.kind, section.head_digest, group,
+                          list(zip(section.chunk_digests, resources))))
+        self._commit(groups, contents, units)
+
+    def _reuse_resources(self, section, group, chunks):
+        pool = {}
+        for key, resource in chunks:
+            pool.setdefault(key, []).append(resource)
+        resources = []
+        for key, text in zip(section.chunk_digests, section.chunks):
+            reused = pool.get(key)
+            if reused:
+                resource = reused.pop(0)
+            else:
+                resource = self._parse_chunk(section.head, text, group)
+            self._add_model(resource)
+            resources.append(resource)
+        return resources
+
+    def _add_model(self, resource):
+        # APIBlueprint._parse_resource() registers the models in order
+        if resource is not None and resource.model is not None and \
+                resource.name is not None:
+            self._models[resource.name] = resource.model
+
+    def _parse_resource(self, text):
+        layout = self._parse_fragment(text)
+        if len(layout) != 1 or layout[0][0] != "resource":
+            raise IncompatibleChange()
+        return layout[0][2][0]
+
+    def _parse_chunk(self, head, text, group):
+        layout = self._parse_fragment(head, text)
+        if len(layout) != 1 or layout[0][0] != "group" or \
+                len(layout[0][2]) != 1:
+            raise IncompatibleChange()
+        return layout[0][2][0]
+
+    def _parse_group(self, section):
+        layout = self._parse_fragment(section.head, *section.chunks)
+        if len(layout) != 1 or layout[0][0] != "group" or \
+                len(layout[0][2]) != len(section.chunks):
+            raise IncompatibleChange()
+        self._groups.add(id(layout[0][1]))
+        return layout[0][1], layout[0][2]
+
+    def _parse_fragment(self, *parts):
+        self._fragments.append("\n".join(parts))
+        mini = APIBlueprint()
+        mini._data_structures = OrderedDict(self._data_structures)
+        root = parse_tree(self._outline.fragment(*parts),
+                          self._engine).getroot()
+        layout = mini._parse(root, self._models, self._attributes)
+        for _, _, resources in layout:
+            self._parsed.extend(r for r in resources if r is not None)
+        return layout
+
+    def _check_references(self, removed):
+        """Other sections may refer to the models and attributes of the
+        changed resources by name; they must be parsed again then.
+        """
+        names = set(r.name for r in self._parsed + removed
+                    if r.name is not None and
+                    (r.model is not None or r.attributes is not None))
+        fragments = "\n".join(self._fragments)
+        for name in names:
+            regexp = re.compile(r"[(\[,]\s*%s\s*[)\],]" % re.escape(name))
+            if len(regexp.findall(self._outline.text)) > \
+                    len(regexp.findall(fragments)):
+                raise IncompatibleChange()
+
+    def _commit(self, groups, contents, units):
+        api = self._api
+        kept = set()
+        for resources in contents.values():
+            kept.update(id(r) for r in resources)
+        removed = [r for r in api.resources if id(r) not in kept]
+        self._check_references(removed)
+        for resource in removed:
+            api._unindex_resource(resource)
+        for name, group in groups.items():
+            if id(group) in self._groups:
+                group._fix_parents(api)
+            resources = group._resources = OrderedDict()
+            for resource in contents[name]:
+                resources[resource.id] = resource
+        api._groups = groups
+        api._lookups.clear()
+        parsed = set(id(r) for r in self._parsed)
+        for group in groups.values():
+            for resource in group:
+                if id(resource) not in parsed:
+                    continue
+                resource._fix_parents(group)
+                api._index_resource(resource)
+        api._sources = SourceMap(self._outline, self._engine, units)
+
+
+def _parse_whole(api, txt, engine):
+    outline = Outline(txt)
+    new = APIBlueprint()
+    layout = new._parse(parse_tree(txt, engine).getroot())
+    for attr in ("_metadata", "_name", "_overview", "_groups",
+                 "_data_structures", "_trie", "_router", "_index"):
+        setattr(api, attr, getattr(new, attr))
+    api._lookups.clear()
+    api._fix_children()
+    api._sources = SourceMap.build(outline, engine, layout)
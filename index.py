@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+"""
+API Blueprint (https://github.com/apiaryio/api-blueprint) parser which uses
+Markdown (https://pythonhosted.org/Markdown/).
+
+Released under New BSD License.
+
+Copyright © 2015, Vadim Markovtsev :: AO InvestGroup
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+    * Redistributions of source code must retain the above copyright
+      notice, this list of conditions and the following disclaimer.
+    * Redistributions in binary form must reproduce the above copyright
+      notice, this list of conditions and the following disclaimer in the
+      documentation and/or other materials provided with the distribution.
+    * Neither the name of the AO InvestGroup nor the
+      names of its contributors may be used to endorse or promote products
+      derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL VADIM MARKOVTSEV BE LIABLE FOR ANY
+DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+from collections import OrderedDict, defaultdict, namedtuple
+
+
+CacheInfo = namedtuple("CacheInfo", ("hits", "misses", "maxsize", "currsize"))
+
+
+def status_codes(status, codes):
+    """Returns the sorted codes among codes which match status: either the
+    exact code, e.g. 404, or the class, e.g. "4xx".
+    """
+    if isinstance(status, int):
+        return status,
+    if len(status) != 3 or status[1:].lower() != "xx" or \
+            not status[0].isdigit():
+        raise ValueError("Invalid status code class: %s" % status)
+    first = int(status[0])
+    return sorted(c for c in codes if c // 100 == first)
+
+
+class BlueprintIndex(object):
+    """Secondary indexes of APIBlueprint: the actions by name and by
+    relation, the responses by the status code and the requests, the
+    responses and the models by the media type. The lists keep the document
+    order.
+    """
+    def __init__(self, resources=tuple()):
+        self._actions_by_name = defaultdict(list)
+        self._actions_by_relation = defaultdict(list)
+        self._responses_by_status = defaultdict(list)
+        self._payloads_by_media_type = defaultdict(list)
+        for resource in resources:
+            self.add_resource(resource)
+
+    def actions_by_name(self, name):
+        return tuple(self._actions_by_name.get(name, tuple()))
+
+    def actions_by_relation(self, link_id):
+        return tuple(self._actions_by_relation.get(link_id, tuple()))
+
+    def responses_by_status(self, status):
+        """status is either the exact code, e.g. 404, or the class, e.g.
+        "4xx".
+        """
+        table = self._responses_by_status
+        return tuple(response for code in status_codes(status, table)
+                     for response in table.get(code, tuple()))
+
+    def payloads_by_media_type(self, media_type):
+        """media_type is either "type/subtype" or a (type, subtype) tuple.
+        """
+        if not isinstance(media_type, tuple):
+            media_type = tuple(media_type.split("/", 1))
+        return tuple(self._payloads_by_media_type.get(media_type, tuple()))
+
+    def add_resource(self, resource):
+        self.add_model(resource)
+        for action in resource:
+            self.add_action(action)
+
+    def remove_resource(self, resource):
+        self.remove_model(resource)
+        for action in resource:
+            self.remove_action(action)
+
+    def add_model(self, resource):
+        if resource.model is not None:
+            self._add_payload(resource.model)
+
+    def remove_model(self, resource):
+        if resource.model is not None:
+            self._remove_payload(resource.model)
+
+    def add_action(self, action):
+        if action.name is not None:
+            self._actions_by_name[action.name].append(action)
+        if action.relation is not None:
+            self._actions_by_relation[action.relation.link_id].append(action)
+        for request in action.requests.values():
+            self._add_payload(request)
+        for code, responses in action.responses.items():
+            for response in responses:
+                self._responses_by_status[code].append(response)
+                self._add_payload(response)
+
+    def remove_action(self, action):
+        if action.name is not None:
+            self._remove(self._actions_by_name, action.name, action)
+        if action.relation is not None:
+            self._remove(self._actions_by_relation, action.relation.link_id,
+                         action)
+        for request in action.requests.values():
+            self._remove_payload(request)
+        for code, responses in action.responses.items():
+            for response in responses:
+                self._remove(self._responses_by_status, code, response)
+                self._remove_payload(response)
+
+    def _add_payload(self, payload):
+        if payload.media_type is not None:
+            self._payloads_by_media_type[payload.media_type].append(payload)
+
+    def _remove_payload(self, payload):
+        if payload.media_type is not None:
+            self._remove(self._payloads_by_media_type, payload.media_type,
+                         payload)
+
+    @staticmethod
+    def _remove(index, key, value):
+        items = index.get(key)
+        if items is None:
+            return
+        items[:] = [item for item in items if item is not value]
+        if not items:
+            del index[key]
+
+
+class LookupCache(object):
+    """Bounded LRU map of the lookup results which counts the hits and the
+    misses. clear() drops the results but keeps the counters.
+    """
+    MISSING = object()
+
+    def __init__(self, maxsize):
+        self._maxsize = maxsize
+        self._data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Returns the cached value or LookupCache.MISSING.
+        """
+        data = self._data
+        try:
+            value = data.pop(key)
+        except KeyError:
+            self.misses += 1
+            return self.MISSING
+        data[key] = value
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        data = self._data
+        data[key] = value
+        if len(data) > self._maxsize:
+            try:
+                data.popitem(last=False)
+            except KeyError:
+                # emptied by another thread
+                pass
+
+    def clear(self):
+        self._data.clear()
+
+    def info(self):
+        return CacheInfo(self.hits, self.misses, self._maxsize,
+                         len(self._data))
@@ -31,26 +31,46 @@ ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
 SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 """
 from collections import OrderedDict, defaultdict
-from copy import deepcopy
+from copy import copy, deepcopy
 from itertools import chain
-import sys
+import threading
 
+from markdown import Markdown
 from markdown.preprocessors import Preprocessor
 from markdown.treeprocessors import Treeprocessor
 from markdown.extensions import Extension
 from markdown.serializers import ElementTree, to_html_string
 from pytrie import SortedStringTrie as trie
 from .entities import ResourceGroup, Resource, SelfParsingSectionRegistry, \
-    Action, DataStructure, Section, get_section_name, parse_description, \
-    Attributes, SmartReprMixin
-from . import entities
+    Action, DataStructure, LazyDescription, Section, get_section_name, \
+    parse_description, Attributes, SmartReprMixin
+from .profiling import ParseProfile
+from .index import BlueprintIndex, LookupCache
+from .router import Router
+from .diagnostics import Diagnostics
+from . import diagnostics, entities, profiling
 
 
 class APIBlueprintParseError(Exception):
     pass
 
 
+class MergeConflictError(ValueError):
+    """Raised by APIBlueprint.merge_many(). collisions is the list of
+    ("data_structure", name) and ("action", ">group>resource>action")
+    tuples.
+    """
+    def __init__(self, collisions):
+        super(MergeConflictError, self).__init__(
+            "%d collision(s): %s" % (len(collisions), ", ".join(
+                "%s %s" % c for c in collisions)))
+        self.collisions = collisions
+
+
 class APIBlueprint(SmartReprMixin):
+    # the number of the memoized __getitem__() results
+    LOOKUP_CACHE_SIZE = 1024
+
     def __init__(self):
         super(APIBlueprint, self).__init__()
         self._metadata = {}
@@ -58,7 +78,14 @@ class APIBlueprint(SmartReprMixin):
         self._overview = None
         self._groups = OrderedDict()
         self._trie = trie()
+        self._router = Router()
+        self._index = BlueprintIndex()
+        self._lookups = LookupCache(self.LOOKUP_CACHE_SIZE)
         self._data_structures = OrderedDict()
+        # digests of the source sections, see plueprint.incremental
+        self._sources = None
+        self._profile = None
+        self._diagnostics = Diagnostics()
 
         def strip():
             del self.strip
@@ -81,8 +108,23 @@ class APIBlueprint(SmartReprMixin):
 
     @property
     def overview(self):
+        if isinstance(self._overview, LazyDescription):
+            self._overview = self._overview.render()
         return self._overview
 
+    @property
+    def diagnostics(self):
+        """Diagnostics with the warnings of the parse call.
+        """
+        return self._diagnostics
+
+    @property
+    def profile(self):
+        """ParseProfile if the blueprint was parsed with profile=True,
+        otherwise None.
+        """
+        return self._profile
+
     @property
     def resources(self):
         for g in self:
@@ -103,6 +145,24 @@ class APIBlueprint(SmartReprMixin):
         return len(self._groups)
 
     def __getitem__(self, item):
+        """Returns the group by name, the group, the resource or the action
+        by ">group>resource>action" or the actions by "/path[:METHOD]".
+        The results are memoized until the blueprint changes, see
+        cache_info().
+        """
+        result = self._lookups.get(item)
+        if result is LookupCache.MISSING:
+            result = self._lookup(item)
+            self._lookups.put(item, result)
+        return result
+
+    def cache_info(self):
+        """Returns the hits, the misses, the maximum and the current size of
+        the __getitem__() cache.
+        """
+        return self._lookups.info()
+
+    def _lookup(self, item):
         if item:
             if item[0] == ">":
                 path = item[1:].split(">")
@@ -129,15 +189,65 @@ class APIBlueprint(SmartReprMixin):
                 values = self._trie.longest_prefix_value(item)
                 if method is None:
                     return tuple(chain.from_iterable(values.values()))
-                return values[method]
+                # not values[method], which would add an empty list
+                return values.get(method, [])
         return self._groups[item]
 
+    def actions_by_name(self, name):
+        return self._index.actions_by_name(name)
+
+    def actions_by_relation(self, link_id):
+        """Returns the actions with the specified Relation.
+        """
+        return self._index.actions_by_relation(link_id)
+
+    def responses_by_status(self, status):
+        """Returns the responses with the specified status code, e.g. 404,
+        or of the specified class, e.g. "4xx".
+        """
+        return self._index.responses_by_status(status)
+
+    def payloads_by_media_type(self, media_type):
+        """Returns the requests, the responses and the models of the
+        specified media type, e.g. "application/json".
+        """
+        return self._index.payloads_by_media_type(media_type)
+
+    def freeze(self):
+        """Returns the read-only plueprint.frozen.FrozenCatalog of this
+        blueprint which is cheap to share between forked processes.
+        """
+        from .frozen import FrozenCatalog
+        return FrozenCatalog(self)
+
+    def match(self, path, method=None):
+        """Finds the action which serves the concrete request path, e.g.
+        "/users/42/orders?limit=10", and returns it together with the
+        extracted URI template variables.
+        """
+        result = self._router.match(path, method)
+        if result is None:
+            raise KeyError(
+                path if method is None else "%s:%s" % (path, method))
+        return result
+
     def __str__(self):
         return "APIBlueprint \"%s\", format %s, with %d resource groups (%d " \
                "resources, %d actions)" % (
                 self.name, self.format, len(self), self.count_resources(),
                 self.count_actions())
 
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop("strip", None)
+        state["_lookups"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lookups = LookupCache(self.LOOKUP_CACHE_SIZE)
+        self._fix_children()
+
     def keys(self):
         return self._groups.keys()
 
@@ -150,6 +260,15 @@ class APIBlueprint(SmartReprMixin):
     def count_actions(self):
         return sum(sum(len(r) for r in g) for g in self)
 
+    def update(self, txt, engine=None):
+        """Updates the blueprint in place to match the changed source text.
+        Only the changed resource groups and resources are parsed again if
+        the blueprint was produced by plueprint.incremental.parse() or
+        update() before, otherwise the whole text is parsed.
+        """
+        from .incremental import update
+        update(self, txt, engine)
+
     def merge(self, other):
         if not isinstance(other, APIBlueprint):
             raise TypeError("Merge with plueprint.mdparser.APIBlueprint "
@@ -176,18 +295,111 @@ class APIBlueprint(SmartReprMixin):
                             if minea is not None:
                                 raise NotImplementedError(
                                     "Cannot merge actions: %s" % minea)
-                            miner[action.id] = deepcopy(action)
+                            miner._actions[action.id] = deepcopy(action)
             mineg._parent = self
             mineg._fix_parents(self)
+        self._sources = None
+        self._reset_trie()
+
+    def merge_many(self, others, consume=False):
+        """Merges several blueprints at once, rebuilding the route index
+        only once in the end. The resources, actions and data structures of
+        the others are deep copied, so the others stay intact. With
+        consume=True they are moved instead: reparented to this blueprint
+        without copying, which is faster, but the others are consumed and
+        must not be used afterwards. If any actions or data structures
+        collide, MergeConflictError lists all of them and nothing is changed.
+        """
+        others = list(others)
+        for other in others:
+            if not isinstance(other, APIBlueprint):
+                raise TypeError("Merge with plueprint.mdparser.APIBlueprint "
+                                "objects only")
+        self._check_merge_conflicts(others)
+        names = [self.name] + [o.name for o in others]
+        self._name = " & ".join(n for n in names if n) or None
+        overviews = [self.overview] + [o.overview for o in others]
+        self._overview = "\n".join(o for o in overviews if o) or None
+        # the resources which are not shared with the others
+        owned = set(id(r) for r in self.resources)
+        for other in others:
+            for name, ds in other._data_structures.items():
+                if not consume:
+                    ds = deepcopy(ds)
+                if isinstance(ds, DataStructure):
+                    ds._parent = self
+                self._data_structures[name] = ds
+            for group in other:
+                mineg = self._groups.get(group.name)
+                if mineg is None:
+                    mineg = self._groups[group.name] = ResourceGroup(
+                        self, group.name, group._description)
+                for resource in group:
+                    miner = mineg._resources.get(resource.id)
+                    if miner is None:
+                        if consume:
+                            resource._parent = mineg
+                        else:
+                            resource = deepcopy(resource)
+                            resource._fix_parents(mineg)
+                            owned.add(id(resource))
+                        mineg._resources[resource.id] = resource
+                        continue
+                    if id(miner) not in owned:
+                        miner = self._own_resource(mineg, miner)
+                        owned.add(id(miner))
+                    for action in resource:
+                        if consume:
+                            action._parent = miner
+                        else:
+                            action = deepcopy(action)
+                            action._fix_parents(miner)
+                        miner._actions[action.id] = action
+        self._sources = None
         self._reset_trie()
 
+    def _check_merge_conflicts(self, others):
+        collisions = []
+        structures = set(self._data_structures)
+        actions = {(g.name, r.id): set(r._actions) for g in self for r in g}
+        for other in others:
+            for name in other._data_structures:
+                if name in structures:
+                    collisions.append(("data_structure", name))
+                structures.add(name)
+            for group in other:
+                for resource in group:
+                    known = actions.setdefault((group.name, resource.id),
+                                               set())
+                    for action in resource._actions:
+                        if action in known:
+                            collisions.append(("action", ">%s>%s>%s" % (
+                                group.name or "", resource.id, action)))
+                        known.add(action)
+        if collisions:
+            raise MergeConflictError(collisions)
+
+    @staticmethod
+    def _own_resource(group, resource):
+        """Replaces the shared resource with a shallow copy which the other
+        actions can be added to.
+        """
+        mine = copy(resource)
+        mine._parent = group
+        mine._actions = OrderedDict(resource._actions)
+        for action in mine:
+            action._parent = mine
+        group._resources[mine.id] = mine
+        return mine
+
     @staticmethod
     def parse_from_etree(tree):
         instance = APIBlueprint()
-        instance._parse(tree.getroot())
+        with profiling.phase("APIBlueprint._parse"):
+            instance._parse(tree.getroot())
         return instance
 
-    def _parse(self, root):
+    def _parse_preamble(self, root):
         if len(root) < 3:
             raise APIBlueprintParseError("Invalid document format")
         if root[0].tag != "p":
@@ -200,10 +412,17 @@ class APIBlueprint(SmartReprMixin):
         if root[1].tag != "h1":
             raise APIBlueprintParseError("Invalid or missing name section")
         self._name = root[1].text
-        index = 2
-        self._overview, index = parse_description(root, index, "h1")
-        self._attributes = {}
-        self._models = {}
+        self._overview, index = parse_description(root, 2, "h1")
+        return index
+
+    def _parse(self, root, models=None, attributes=None):
+        """Returns the list of the parsed top level sections,
+        (kind, group, resources) tuples.
+        """
+        index = self._parse_preamble(root)
+        self._attributes = dict(attributes or {})
+        self._models = dict(models or {})
+        layout = []
         try:
             current = root[index]
             sequence = [current]
@@ -212,62 +431,137 @@ class APIBlueprint(SmartReprMixin):
             is_data_structures = self._is_data_structures(current)
             for item in root[index + 1:]:
                 if self._is_header(item) and item.tag <= tag:
-                    if is_group:
-                        self._parse_resource_group(sequence)
-                    else:
-                        self._parse_resource(sequence, None)
+                    layout.append(self._parse_top_section(sequence, is_group))
                     del sequence[:]
                     tag = item.tag
                     is_group = self._is_group(item)
                     if not is_group:
                         is_data_structures = self._is_data_structures(item)
                 sequence.append(item)
-            if is_group:
-                self._parse_resource_group(sequence)
-            elif is_data_structures:
-                self._parse_data_structure(sequence)
+            if is_data_structures and not is_group:
+                with profiling.group(sequence[0].text), \
+                        diagnostics.section(sequence[0].text):
+                    self._parse_data_structure(sequence)
+                layout.append(("data_structures", None, []))
             else:
-                self._parse_resource(sequence, None)
-            self._reset_trie()
-            self._apply_attributes_references()
+                layout.append(self._parse_top_section(sequence, is_group))
+            with profiling.phase("_reset_trie"):
+                self._reset_trie()
+            with profiling.phase("_apply_attributes_references"):
+                self._apply_attributes_references()
         finally:
             del self._attributes
             del self._models
+        return layout
+
+    def _fix_children(self):
+        for group in self:
+            group._fix_parents(self)
+        for ds in self._data_structures.values():
+            if isinstance(ds, DataStructure):
+                ds._fix_parents(self)
 
     def _reset_trie(self):
         paths = defaultdict(lambda: defaultdict(list))
         for a in self.actions:
             cu = a.uri
             if cu is not None:
-                path = ""
-                paths["/"][a.request_method].append(a)
-                for sub in cu.split('/'):
-                    if sub:
-                        path += "/" + sub
-                        paths[path][a.request_method].append(a)
+                for path in self._trie_paths(cu):
+                    paths[path][a.request_method].append(a)
         self._trie = trie(paths.items())
+        self._router = Router(self.actions)
+        self._index = BlueprintIndex(self.resources)
+        self._lookups.clear()
+
+    def _index_resource(self, resource):
+        self._index.add_model(resource)
+        for action in resource:
+            self._index_action(action)
+
+    def _unindex_resource(self, resource):
+        self._index.remove_model(resource)
+        for action in resource:
+            self._unindex_action(action)
+
+    def _index_action(self, action):
+        cu = action.uri
+        if cu is not None:
+            for path in self._trie_paths(cu):
+                self._trie.setdefault(path, defaultdict(list))[
+                    action.request_method].append(action)
+        self._router.add(action)
+        self._index.add_action(action)
+        self._lookups.clear()
+
+    def _unindex_action(self, action):
+        self._router.remove(action)
+        self._index.remove_action(action)
+        self._lookups.clear()
+        cu = action.uri
+        if cu is None:
+            return
+        for path in self._trie_paths(cu):
+            methods = self._trie.get(path)
+            if methods is None:
+                continue
+            actions = methods.get(action.request_method)
+            if actions is None or action not in actions:
+                continue
+            actions.remove(action)
+            # the stale keys would hide the shorter prefixes from lookups
+            if not actions:
+                del methods[action.request_method]
+                if not methods:
+                    del self._trie[path]
+
+    @staticmethod
+    def _trie_paths(uri):
+        yield "/"
+        path = ""
+        for sub in uri.split('/'):
+            if sub:
+                path += "/" + sub
+                yield path
+
+    def _parse_top_section(self, sequence, is_group):
+        with profiling.group(sequence[0].text):
+            if is_group:
+                resources = []
+                with diagnostics.section(sequence[0].text):
+                    group = self._parse_resource_group(sequence, resources)
+                return "group", group, resources
+            return "resource", None, [self._parse_resource(sequence, None)]
 
-    def _parse_resource_group(self, sequence):
+    def _parse_resource_group(self, sequence, resources=None):
         name = sequence[0].text
         name_pos = name.find("Group") + len("Group")
         name = name[name_pos:].strip()
         desc, index = parse_description(sequence, 1, "h2")
         self._groups[name] = group = ResourceGroup(self, name, desc)
         if len(sequence) <= index:
-            return
+            return group
         current = sequence[index]
         children = [current]
         tag = current.tag
         for item in sequence[index + 1:]:
             if self._is_header(item) and item.tag <= tag:
-                self._parse_resource(children, group)
+                resource = self._parse_resource(children, group)
+                if resources is not None:
+                    resources.append(resource)
                 del children[:]
                 tag = item.tag
             children.append(item)
         if len(children) > 0:
-            self._parse_resource(children, group)
+            resource = self._parse_resource(children, group)
+            if resources is not None:
+                resources.append(resource)
+        return group
 
     def _parse_resource(self, sequence, group):
+        with diagnostics.section(sequence[0].text):
+            return self._parse_resource_section(sequence, group)
+
+    def _parse_resource_section(self, sequence, group):
         if group is None:
             try:
                 group = self._groups[None]
@@ -277,19 +571,22 @@ class APIBlueprint(SmartReprMixin):
         desc, index = parse_description(
             sequence, 1, self._next_header_tag(sequence[0].tag), "ul")
         if len(sequence) <= index:
-            if entities.report_warnings:
-                sys.stderr.write("Skipping empty resource %s\n" % rdef[0])
-            return
+            diagnostics.warn("empty-resource", rdef[0])
+            return None
         desc_sections = False
+        text_format = entities.get_description_format() == "text"
+        text_items = []
         if sequence[index].tag in ("ul", "ol"):
             sections = []
             for s in sequence[index]:
                 section = self._parse_section(None, s, rdef[0])
                 if section is not None:
                     sections.append(section)
+                elif text_format:
+                    text_items.append("".join(s.itertext()).strip())
                 else:
-                    if desc is None:
-                        desc = "<ul>\n"
+                    if not desc_sections:
+                        desc = (desc or "") + "<ul>\n"
                     desc += to_html_string(s) + "\n"
                     desc_sections = True
             index += 1
@@ -297,6 +594,8 @@ class APIBlueprint(SmartReprMixin):
             sections = tuple()
         if desc_sections:
             desc += "</ul>"
+        if text_items:
+            desc = "\n\n".join(filter(None, (desc, "\n".join(text_items))))
         rdef += (desc,)
         kwargs = {s: None for s in Resource.NESTED_SECTIONS}
         kwargs.update({s.NESTED_SECTION_ID: s for s in sections})
@@ -307,9 +606,7 @@ class APIBlueprint(SmartReprMixin):
             action_instead_of_resource = True
             r = Resource(group, *rdef, parameters=None, attributes=None,
                          model=None)
-            if entities.report_warnings:
-                sys.stderr.write("Invalid section in resource %s: %s\n" %
-                                 (r, e))
+            diagnostics.warn("invalid-resource", r, e)
         else:
             if r.model is not None and r.name is not None:
                 self._models[r.name] = r.model
@@ -324,12 +621,10 @@ class APIBlueprint(SmartReprMixin):
                     act._request_method = r.request_method
                     act._uri_template = r.uri_template
                     r._actions[act.id] = act
-                    if entities.report_warnings:
-                        sys.stderr.write(
-                            "Assumed single implicit action in %s\n" % r)
+                    diagnostics.warn("implicit-action", r)
                 except:
                     pass
-            return
+            return r
         while index < len(sequence) and self._is_header(sequence[index]):
             action, index = Action.parse_from_etree(r, sequence, index)
             if action.uri_template is None:
@@ -341,12 +636,11 @@ class APIBlueprint(SmartReprMixin):
                 if rr._reference is None:
                     continue
                 if rr._reference not in self._models:
-                    if entities.report_warnings:
-                        sys.stderr.write("Bad reference: %s\n" %
-                                         rr._reference)
+                    diagnostics.warn("bad-reference", rr._reference)
                 else:
                     rr._copy_from_payload(self._models[rr._reference])
             r._actions[action.id] = action
+        return r
 
     def _parse_data_structure(self, sequence):
         index = 1
@@ -361,38 +655,63 @@ class APIBlueprint(SmartReprMixin):
             self._data_structures[attr.name] = attr
 
     def _apply_attributes_references(self):
-        for key, attr in self._data_structures.items():
-            ref = attr._reference
-            if ref is not None:
-                self._data_structures[key] = attr = self._attributes.get(ref)
-                if attr is None and entities.report_warnings:
-                    sys.stderr.write("Invalid attributes reference in Data "
-                                     "Structures: %s\n" % ref)
+        for key in self._data_structures:
+            self._apply_data_structure_reference(key)
         for r in self.resources:
-            oldattr = r.attributes
-            if oldattr is not None and oldattr._reference is not None:
-                r._attributes = self._attributes.get(
-                    oldattr._reference,
-                    self._data_structures.get(oldattr._reference))
-                if r.attributes is None and entities.report_warnings:
-                    sys.stderr.write("Invalid attributes reference: %s\n" %
+            self._apply_resource_attributes_references(r)
+
+    def _apply_data_structure_reference(self, key, final=True):
+        """Resolves the reference of the data structure. Unless final, the
+        unresolved reference is kept for a later call and not reported.
+        Returns the resolved data structure or None.
+        """
+        attr = self._data_structures[key]
+        ref = attr._reference
+        if ref is not None:
+            value = self._attributes.get(ref)
+            if value is None and not final:
+                return None
+            self._data_structures[key] = attr = value
+            if attr is None:
+                diagnostics.warn("invalid-data-structure-reference", ref)
+        return attr
+
+    def _apply_resource_attributes_references(self, r, final=True):
+        """Resolves the attributes references of the resource and of its
+        actions. Unless final, the unresolved references are kept for a
+        later call and not reported. Returns whether all were resolved.
+        """
+        resolved = True
+        oldattr = r.attributes
+        if oldattr is not None and oldattr._reference is not None:
+            value = self._attributes.get(
+                oldattr._reference,
+                self._data_structures.get(oldattr._reference))
+            if value is None:
+                resolved = False
+                if final:
+                    diagnostics.warn("invalid-attributes-reference",
                                      oldattr._reference)
-            for a in r:
-                if a.attributes is oldattr:
-                    a._attributes = r.attributes
-                elif a.attributes is not None and \
-                        a.attributes._reference is not None:
-                    ref = a.attributes._reference
-                    aval = self._attributes.get(ref)
-                    if aval is not None:
-                        a._attributes = aval
-                        continue
-                    dsval = self._data_structures.get(ref)
-                    if dsval is not None:
-                        a._attributes = Attributes(a, dsval.value)
-                    if a.attributes is None and entities.report_warnings:
-                        sys.stderr.write("Invalid attributes reference: %s\n"
-                                         % ref)
+            if value is not None or final:
+                r._attributes = value
+        for a in r:
+            if a.attributes is oldattr:
+                a._attributes = r.attributes
+            elif a.attributes is not None and \
+                    a.attributes._reference is not None:
+                ref = a.attributes._reference
+                aval = self._attributes.get(ref)
+                if aval is not None:
+                    a._attributes = aval
+                    continue
+                dsval = self._data_structures.get(ref)
+                if dsval is not None:
+                    a._attributes = Attributes(a, dsval.value)
+                    continue
+                resolved = False
+                if final:
+                    diagnostics.warn("invalid-attributes-reference", ref)
+        return resolved
 
     @staticmethod
     def _parse_section(parent, item, name):
@@ -401,14 +720,9 @@ class APIBlueprint(SmartReprMixin):
             return SelfParsingSectionRegistry[section_name].parse_from_etree(
                 parent, item)
         except KeyError:
-            if entities.report_warnings:
-                sys.stderr.write(
-                    "Section \"%s\" is unknown\n" % section_name)
+            diagnostics.warn("unknown-section", section_name)
         except ValueError as e:
-            if entities.report_warnings:
-                sys.stderr.write(
-                    "Failed to parse section \"%s\" in resource "
-                    "%s: %s\n" % (section_name, name, e))
+            diagnostics.warn("invalid-resource-section", section_name, name, e)
         return None
 
     @staticmethod
@@ -454,21 +768,13 @@ class IndentationAligner(Preprocessor):
 
 class TitleLifter(Treeprocessor):
     def run(self, root):
-        lifo = [root]
-        while lifo:
-            last = lifo.pop()
-            if len(lifo) > 0 and last.text == "\n" and len(last) > 0 and \
-                    last[0].tag == "p":
-                last.text = last[0].text
-                last.remove(last[0])
-            lifo.extend(last)
+        for item in root:
+            self.lift_paragraphs(item)
         h1_count = sum(1 for item in root
                        if item.tag == "h1" and item.text != "Data Structures")
         if h1_count != 1:
             return
-        if entities.report_warnings:
-            sys.stderr.write("There is only one <h1> in the document => "
-                             "raising all the other headers\n")
+        diagnostics.warn("lifted-headers")
         for item in root:
             tag = item.tag
             if tag == "h1":
@@ -480,16 +786,167 @@ class TitleLifter(Treeprocessor):
                 continue
             item.tag = "h%d" % (int(tag[1]) - 1)
 
+    @staticmethod
+    def lift_paragraphs(element):
+        lifo = [element]
+        while lifo:
+            last = lifo.pop()
+            if last.text == "\n" and len(last) > 0 and last[0].tag == "p":
+                last.text = last[0].text
+                last.remove(last[0])
+            lifo.extend(last)
+
+
+class ParsedTree(ElementTree):
+    def strip(self):
+        # trick Markdown in the end of the conversion
+        return self
+
 
 class PlueprintExtension(Extension):
     @staticmethod
     def to_apiblueprint(element):
         return APIBlueprint.parse_from_etree(ElementTree(element))
 
+    @staticmethod
+    def to_etree(element):
+        return ParsedTree(element)
+
     def extendMarkdown(self, md, md_globals):
         md.output_formats["apiblueprint"] = self.to_apiblueprint
+        md.output_formats["etree"] = self.to_etree
         md.preprocessors["remove_backquotes"] = BackQuotesRemover(md)
         md.preprocessors["align_indent"] = IndentationAligner(md)
         md.treeprocessors["lift_title"] = TitleLifter(md)
         md.postprocessors.clear()
         md.stripTopLevelTags = False
+
+
+ENGINES = "markdown", "fast"
+
+
+class BlueprintParser(object):
+    """Parses API Blueprint with the fixed configuration which does not
+    depend on the module globals. The same instance is safe to use from many
+    threads concurrently: every parse call takes a prepared Markdown
+    pipeline from the pool and returns it afterwards, the warnings and the
+    profile are recorded per call.
+    """
+    def __init__(self, engine="markdown", description_format="html",
+                 pool_size=8):
+        if engine not in ENGINES:
+            raise ValueError("Unknown engine: %s (must be one of %s)" % (
+                engine, ", ".join(ENGINES)))
+        if description_format not in entities.DESCRIPTION_FORMATS:
+            raise ValueError(
+                "Unknown description format: %s (must be one of %s)" % (
+                    description_format,
+                    ", ".join(entities.DESCRIPTION_FORMATS)))
+        self._engine = engine
+        self._description_format = description_format
+        self._pool_size = pool_size
+        self._pool = []
+        self._lock = threading.Lock()
+
+    @property
+    def engine(self):
+        return self._engine
+
+    @property
+    def description_format(self):
+        return self._description_format
+
+    def parse(self, txt, profile=None):
+        """Parses API Blueprint. The warnings are collected in
+        APIBlueprint.diagnostics. profile may be True or ParseProfile to
+        record the time spent in each parsing phase, see
+        APIBlueprint.profile.
+        """
+        collector = Diagnostics(txt)
+        with collector.collect(), \
+                entities.use_description_format(self._description_format):
+            if not profile:
+                api = APIBlueprint.parse_from_etree(self.parse_tree(txt))
+            else:
+                if profile is True:
+                    profile = ParseProfile()
+                with profile.activate():
+                    with profile.measure("parse"):
+                        with profile.measure("parse_tree"):
+                            tree = self.parse_tree(txt)
+                        api = APIBlueprint.parse_from_etree(tree)
+                api._profile = profile
+        api._diagnostics = collector
+        return api
+
+    def parse_tree(self, txt):
+        """Returns the ElementTree which APIBlueprint is parsed from.
+        """
+        if self._engine == "fast":
+            from .fastparser import parse_tree as fast_parse_tree
+            return fast_parse_tree(txt)
+        profile = profiling.current()
+        if profile is not None:
+            # instrumenting changes the pipeline, so it is not reused
+            md = self._create_markdown()
+            profile.instrument(md)
+            return md.convert(txt)
+        md = self._acquire_markdown()
+        # an aborted conversion leaves the block parser state behind, so
+        # the pipeline goes back to the pool only after a successful one
+        tree = md.convert(txt)
+        self._release_markdown(md)
+        return tree
+
+    def _create_markdown(self):
+        md = Markdown(extensions=[PlueprintExtension()])
+        if self._description_format == "text":
+            # keep the raw inline markup
+            del md.treeprocessors["inline"]
+        md.set_output_format("etree")
+        profiling.add_checkpoints(md)
+        return md
+
+    def _acquire_markdown(self):
+        with self._lock:
+            if self._pool:
+                return self._pool.pop()
+        return self._create_markdown()
+
+    def _release_markdown(self, md):
+        md.reset()
+        with self._lock:
+            if len(self._pool) < self._pool_size:
+                self._pool.append(md)
+
+
+_default_parsers = {}
+_default_parsers_lock = threading.Lock()
+
+
+def default_parser(engine="markdown"):
+    """Returns the shared BlueprintParser for the engine and the current
+    description_format, so that the module level functions reuse the pooled
+    Markdown pipelines.
+    """
+    key = engine, entities.get_description_format()
+    parser = _default_parsers.get(key)
+    if parser is None:
+        with _default_parsers_lock:
+            parser = _default_parsers.get(key)
+            if parser is None:
+                parser = _default_parsers[key] = BlueprintParser(*key)
+    return parser
+
+
+def parse(txt, engine="markdown", profile=None):
+    """Parses API Blueprint with the module level configuration, see
+    BlueprintParser.parse().
+    """
+    return default_parser(engine).parse(txt, profile)
+
+
+def parse_tree(txt, engine="markdown"):
+    """Returns the ElementTree which APIBlueprint is parsed from.
+    """
+    return default_parser(engine).parse_tree(txt)
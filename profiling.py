@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+"""
+API Blueprint (https://github.com/apiaryio/api-blueprint) parser which uses
+Markdown (https://pythonhosted.org/Markdown/).
+
+Released under New BSD License.
+
+Copyright © 2015, Vadim Markovtsev :: AO InvestGroup
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+    * Redistributions of source code must retain the above copyright
+      notice, this list of conditions and the following disclaimer.
+    * Redistributions in binary form must reproduce the above copyright
+      notice, this list of conditions and the following disclaimer in the
+      documentation and/or other materials provided with the distribution.
+    * Neither the name of the AO InvestGroup nor the
+      names of its contributors may be used to endorse or promote products
+      derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL VADIM MARKOVTSEV BE LIABLE FOR ANY
+DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+from collections import OrderedDict
+from contextlib import contextmanager
+import threading
+from timeit import default_timer
+
+
+_local = threading.local()
+
+
+def current():
+    """Returns the ParseProfile which is being recorded in this thread or
+    None.
+    """
+    return getattr(_local, "profile", None)
+
+
+def checkpoint(name):
+    """Calls the cancellation hook of this thread, if any, before the named
+    phase or section starts. The hook raises to abort the parse.
+    """
+    hook = getattr(_local, "hook", None)
+    if hook is not None:
+        hook(name)
+
+
+@contextmanager
+def cancellation(hook):
+    """Calls hook(name) in this thread before every phase and top level
+    section while the block runs, independently of profiling.
+    """
+    previous = getattr(_local, "hook", None)
+    _local.hook = hook
+    try:
+        yield
+    finally:
+        _local.hook = previous
+
+
+def _checkpointed(name, func):
+    def checked(*args, **kwargs):
+        checkpoint(name)
+        return func(*args, **kwargs)
+
+    return checked
+
+
+def add_checkpoints(md):
+    """Makes the Markdown instance call checkpoint() before every
+    preprocessor and treeprocessor, every block consumed by the block
+    parser and every text chunk of the inline processor, so that a
+    cancelled parse stops in the middle of the conversion.
+    """
+    for processors in (md.preprocessors, md.treeprocessors):
+        for processor in processors.values():
+            processor.run = _checkpointed(
+                type(processor).__name__, processor.run)
+    for processor in md.parser.blockprocessors.values():
+        processor.run = _checkpointed("BlockParser", processor.run)
+    inline = md.treeprocessors["inline"] \
+        if "inline" in md.treeprocessors else None
+    # the per text chunk method is private, so it is optional
+    handle_inline = getattr(inline, "_InlineProcessor__handleInline", None)
+    if handle_inline is not None:
+        inline._InlineProcessor__handleInline = _checkpointed(
+            "InlineProcessor", handle_inline)
+
+
+@contextmanager
+def phase(name):
+    """Measures the enclosed block as the named phase of the current
+    profile. Does nothing if no profile is being recorded.
+    """
+    checkpoint(name)
+    profile = current()
+    if profile is None:
+        yield
+        return
+    with profile.measure(name):
+        yield
+
+
+@contextmanager
+def group(name):
+    """Measures the enclosed block as the named top level section of the
+    current profile.
+    """
+    checkpoint(name)
+    profile = current()
+    if profile is None:
+        yield
+        return
+    with profile.measure(name, profile.groups):
+        yield
+
+
+class PhaseStats(object):
+    def __init__(self, depth):
+        self.depth = depth
+        self.calls = 0
+        self.time = 0.0
+        # bytes allocated on top of the phase start, None unless measured
+        self.peak = None
+
+    def __str__(self):
+        res = "%d call(s), %.3f s" % (self.calls, self.time)
+        if self.peak is not None:
+            res += ", peak %.1f MB" % (self.peak / (1024.0 * 1024))
+        return res
+
+
+class ParseProfile(object):
+    """Wall time, call counts and optionally the tracemalloc peak memory of
+    the parsing phases and of the top level sections. The times of the
+    nested phases are included in the outer ones.
+    """
+    def __init__(self, memory=False):
+        self.memory = memory
+        self.phases = OrderedDict()
+        self.groups = OrderedDict()
+        self._stack = []
+
+    @property
+    def total(self):
+        return sum(s.time for s in self.phases.values() if s.depth == 0)
+
+    @contextmanager
+    def activate(self):
+        """Records the phases in this thread while the block runs.
+        """
+        previous = current()
+        _local.profile = self
+        started_tracing = False
+        if self.memory:
+            import tracemalloc
+            if not hasattr(tracemalloc, "reset_peak"):
+                raise ValueError("Measuring memory requires Python 3.9+")
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                started_tracing = True
+        try:
+            yield self
+        finally:
+            _local.profile = previous
+            if started_tracing:
+                tracemalloc.stop()
+
+    @contextmanager
+    def measure(self, name, table=None):
+        if table is None:
+            table = self.phases
+        stats = table.get(name)
+        if stats is None:
+            stats = table[name] = PhaseStats(len(self._stack))
+        frame = self._enter()
+        start = default_timer()
+        try:
+            yield
+        finally:
+            stats.time += default_timer() - start
+            stats.calls += 1
+            peak = self._exit(frame)
+            if peak is not None:
+                stats.peak = max(stats.peak or 0, peak)
+
+    def wrap(self, name, func):
+        """Returns func which is measured as the named phase.
+        """
+        def measured(*args, **kwargs):
+            checkpoint(name)
+            with self.measure(name):
+                return func(*args, **kwargs)
+
+        return measured
+
+    def instrument(self, md):
+        """Measures the preprocessors, the block parser and the
+        treeprocessors of the Markdown instance.
+        """
+        for processors in (md.preprocessors, md.treeprocessors):
+            for processor in processors.values():
+                processor.run = self.wrap(
+                    type(processor).__name__, processor.run)
+        md.parser.parseDocument = self.wrap(
+            "BlockParser", md.parser.parseDocument)
+
+    def _enter(self):
+        # [start current memory, the highest peak seen inside]
+        frame = [0, 0]
+        if self.memory:
+            import tracemalloc
+            current_size, peak = tracemalloc.get_traced_memory()
+            if self._stack:
+                # resetting hides the peak from the outer frame
+                outer = self._stack[-1]
+                outer[1] = max(outer[1], peak)
+            frame[0] = current_size
+            tracemalloc.reset_peak()
+        self._stack.append(frame)
+        return frame
+
+    def _exit(self, frame):
+        self._stack.pop()
+        if not self.memory:
+            return None
+        import tracemalloc
+        peak = max(frame[1], tracemalloc.get_traced_memory()[1])
+        if self._stack:
+            outer = self._stack[-1]
+            outer[1] = max(outer[1], peak)
+        return peak - frame[0]
+
+    def __str__(self):
+        lines = ["Parse profile, %.3f s total" % self.total]
+        for name, stats in self.phases.items():
+            lines.append("  %s%-*s %s" % (
+                "  " * stats.depth, 36 - 2 * stats.depth, name, stats))
+        if self.groups:
+            lines.append("Top level sections:")
+            for name, stats in self.groups.items():
+                lines.append("  %-36s %s" % (name, stats))
+        return "\n".join(lines)
@@ -0,0 +1,607 @@
+# -*- coding: utf-8 -*-
+"""
+API Blueprint (https://github.com/apiaryio/api-blueprint) parser which uses
+Markdown (https://pythonhosted.org/Markdown/).
+
+Released under New BSD License.
+
+Copyright © 2015, Vadim Markovtsev :: AO InvestGroup
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+    * Redistributions of source code must retain the above copyright
+      notice, this list of conditions and the following disclaimer.
+    * Redistributions in binary form must reproduce the above copyright
+      notice, this list of conditions and the following disclaimer in the
+      documentation and/or other materials provided with the distribution.
+    * Neither the name of the AO InvestGroup nor the
+      names of its contributors may be used to endorse or promote products
+      derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL VADIM MARKOVTSEV BE LIABLE FOR ANY
+DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+import re
+from six import integer_types, string_types, text_type
+from six.moves.urllib.parse import parse_qsl, quote, unquote
+
+
+EXPRESSION_REGEXP = re.compile(r"\{([^{}]*)\}")
+OPERATORS = "+#./;?&"
+# operator: (first, separator, named, if empty, allow reserved)
+EXPANSION_RULES = {
+    "": ("", ",", False, "", False),
+    "+": ("", ",", False, "", True),
+    ".": (".", ".", False, "", False),
+    "/": ("/", "/", False, "", False),
+    ";": (";", ";", True, "", False),
+    "?": ("?", "&", True, "=", False),
+    "&": ("&", "&", True, "=", False),
+    "#": ("#", ",", False, "", True),
+}
+UNRESERVED_REGEXP = re.compile(r"[A-Za-z0-9\-._~]*\Z")
+RESERVED_SAFE = ":/?#[]@!$&'()*+,;=~%"
+BARE_PERCENT_REGEXP = re.compile(r"%(?![0-9A-Fa-f]{2})")
+
+
+def parse_expression(expr):
+    if expr and expr[0] in OPERATORS:
+        op, expr = expr[0], expr[1:]
+    else:
+        op = ""
+    names = []
+    for var in expr.split(','):
+        var = var.strip()
+        colon_pos = var.find(':')
+        if colon_pos > -1:
+            var = var[:colon_pos]
+        elif var.endswith('*'):
+            var = var[:-1]
+        if var:
+            names.append(var)
+    return op, tuple(names)
+
+
+def tokenize_template(template):
+    """Splits an RFC 6570 URI template into literal and expression tokens.
+    Literals are (None, text), expressions are (operator, names).
+    """
+    tokens = []
+    pos = 0
+    for match in EXPRESSION_REGEXP.finditer(template):
+        if match.start() > pos:
+            tokens.append((None, template[pos:match.start()]))
+        tokens.append(parse_expression(match.group(1)))
+        pos = match.end()
+    if pos < len(template):
+        tokens.append((None, template[pos:]))
+    return tokens
+
+
+def encode_value(value, reserved):
+    if UNRESERVED_REGEXP.match(value):
+        return value
+    if not isinstance(value, bytes):
+        value = value.encode("utf-8")
+    if not reserved:
+        return quote(value, safe="~")
+    return BARE_PERCENT_REGEXP.sub("%25", quote(value, safe=RESERVED_SAFE))
+
+
+class UriExpander(object):
+    """URI template compiled for the fast repeated expansion. The scalar
+    variables are expanded here, the lists and the dicts are delegated to
+    uritemplate. The defaults are used for the variables missing in the
+    expanded values.
+    """
+    def __init__(self, template, defaults=None):
+        self._template = str(template)
+        self._defaults = dict(defaults) if defaults else {}
+        self._fallback = None
+        # literal strings and (rules, ((name, prefix), ...)) expressions
+        self._parts = []
+        pos = 0
+        for match in EXPRESSION_REGEXP.finditer(self._template):
+            if match.start() > pos:
+                self._parts.append(self._template[pos:match.start()])
+            self._parts.append(self._compile_expression(match.group(1)))
+            pos = match.end()
+        if pos < len(self._template):
+            self._parts.append(self._template[pos:])
+
+    @property
+    def template(self):
+        return self._template
+
+    @property
+    def defaults(self):
+        return self._defaults
+
+    def _compile_expression(self, expr):
+        op = expr[0] if expr and expr[0] in OPERATORS else ""
+        specs = []
+        for var in expr[len(op):].split(','):
+            var = var.strip()
+            prefix = None
+            name, colon, length = var.partition(':')
+            if colon:
+                prefix = int(length)
+            elif var.endswith('*'):
+                # explode only changes how the composite values expand
+                name = var[:-1]
+            specs.append((name, prefix))
+        return EXPANSION_RULES[op], tuple(specs)
+
+    def expand(self, variables=None):
+        """Returns the URI with the variables substituted.
+        """
+        defaults = self._defaults
+        result = []
+        for part in self._parts:
+            if isinstance(part, string_types):
+                result.append(part)
+                continue
+            (first, sep, named, ifemp, reserved), specs = part
+            values = []
+            for name, prefix in specs:
+                value = variables.get(name) if variables else None
+                if value is None:
+                    value = defaults.get(name)
+                    if value is None:
+                        continue
+                if isinstance(value, bool) or \
+                        not isinstance(value, string_types + integer_types +
+                                       (float,)):
+                    return self._expand_fallback(variables)
+                value = text_type(value)
+                if prefix is not None:
+                    value = value[:prefix]
+                value = encode_value(value, reserved)
+                if named:
+                    values.append(
+                        "%s=%s" % (name, value) if value else name + ifemp)
+                else:
+                    values.append(value)
+            if values:
+                result.append(first + sep.join(values))
+        return "".join(result)
+
+    def expand_many(self, rows):
+        """Expands every dict of variables in rows and returns the list of
+        URIs.
+        """
+        expand = self.expand
+        return [expand(row) for row in rows]
+
+    def _expand_fallback(self, variables):
+        if self._fallback is None:
+            from uritemplate import URITemplate
+            self._fallback = URITemplate(self._template)
+        values = dict(self._defaults)
+        if variables:
+            values.update((k, v) for k, v in variables.items()
+                          if v is not None)
+        return self._fallback.expand(values)
+
+
+def expand_many(section, rows):
+    """Expands the URI template of an Action or a Resource with every dict
+    of variables in rows. The missing variables take the documented
+    defaults.
+    """
+    return section.uri_expander.expand_many(rows)
+
+
+class RouteTemplate(object):
+    """URI template compiled into the path segment variants and the query
+    part which the router needs.
+    """
+    def __init__(self, template):
+        self._template = template
+        self._query_names = {}
+        self._query_literals = []
+        self._variants = self._compile(tokenize_template(template))
+
+    @property
+    def template(self):
+        return self._template
+
+    @property
+    def variants(self):
+        return self._variants
+
+    @property
+    def query_names(self):
+        return self._query_names
+
+    @property
+    def query_literals(self):
+        return self._query_literals
+
+    def _compile(self, tokens):
+        # every variant is a list of segments, each segment is a list of
+        # tokens; {/var} expansions multiply the variants
+        variants = [[[]]]
+        query = None
+        for op, value in tokens:
+            if query is not None:
+                if op is None:
+                    query += value
+                elif op in ("?", "&"):
+                    self._add_query_names(value)
+                elif op != "#":
+                    query += "".join("{%s}" % n for n in value[:1])
+                continue
+            if op is None:
+                qpos = value.find('?')
+                if qpos > -1:
+                    query = value[qpos + 1:]
+                    value = value[:qpos]
+                parts = value.split('/')
+                for variant in variants:
+                    variant[-1].append((None, parts[0]))
+                    for part in parts[1:]:
+                        variant.append([(None, part)])
+            elif op == "/":
+                expanded = []
+                for variant in variants:
+                    for i in range(len(value) + 1):
+                        expanded.append(
+                            [list(s) for s in variant] +
+                            [[("", (n,))] for n in value[:i]])
+                variants = expanded
+            elif op in ("?", "&"):
+                self._add_query_names(value)
+            elif op != "#":
+                for variant in variants:
+                    variant[-1].append((op, value))
+        if query:
+            self._add_query_text(query)
+        result = []
+        for variant in variants:
+            segments = []
+            for segment in variant:
+                segment = [t for t in segment if t[0] is not None or t[1]]
+                if segment:
+                    segments.append(segment)
+            result.append(segments)
+        return result
+
+    def _add_query_names(self, names):
+        for name in names:
+            self._query_names[name] = name
+
+    def _add_query_text(self, query):
+        for pair in query.split('&'):
+            if not pair:
+                continue
+            key, _, value = pair.partition('=')
+            if len(value) > 2 and value[0] == '{' and value[-1] == '}':
+                self._query_names[key] = value[1:-1]
+            else:
+                self._query_literals.append((key, value))
+
+
+class RouterNode(object):
+    def __init__(self):
+        self.literals = {}
+        self.patterns = []
+        self.variable = None
+        self.catchall = None
+        self.routes = None
+
+
+class Route(object):
+    def __init__(self, action, slots, template):
+        self.action = action
+        self.slots = slots
+        self.query_names = template.query_names
+        self.query_literals = template.query_literals
+
+    def bind(self, captures, query):
+        return bind_variables(self.slots, self.query_names.items(),
+                              self.query_literals, captures, query)
+
+
+def bind_variables(slots, query_names, query_literals, captures, query):
+    """Returns the template variables of the matched route or None if the
+    query string does not fit.
+    """
+    variables = {}
+    for (name, reserved), value in zip(slots, captures):
+        if value is None:
+            continue
+        variables[name] = value if reserved else unquote(value)
+    if query_names or query_literals:
+        params = dict(parse_qsl(query, keep_blank_values=True))
+        for key, value in query_literals:
+            if params.get(key) != value:
+                return None
+        for key, name in query_names:
+            value = params.get(key)
+            if value is not None:
+                variables[name] = value
+    return variables
+
+
+class SegmentMatcher(object):
+    """Depth first matching of the request path segments which Router and
+    FrozenRouter share. The subclasses describe the node with _edges() as
+    (literals dict, ((regexp, child), ...), variable child, catch-all
+    child), None if absent, list the routes of the node for the method with
+    _candidates() and bind the route to the captured values with _bind().
+    """
+    def match(self, path, method=None):
+        """Returns (action, variables) or None if nothing matches.
+        """
+        path, _, query = path.partition('?')
+        # the leading and the trailing slashes do not make segments; the
+        # empty segments in between are kept, so that a malformed path like
+        # /users//orders does not bind an empty variable
+        segments = path.split('/')
+        if not segments[0]:
+            del segments[0]
+        if segments and not segments[-1]:
+            del segments[-1]
+        return self._match(self._root, segments, 0, tuple(), method, query)
+
+    def _match(self, node, segments, index, captures, method, query):
+        literals, patterns, variable, catchall = self._edges(node)
+        if index == len(segments):
+            result = self._select(node, captures, method, query)
+            if result is not None or catchall is None:
+                return result
+            return self._select(catchall, captures + ("",), method, query)
+        segment = segments[index]
+        # the templates have no empty segments, only a catch-all takes them
+        if segment:
+            child = literals.get(segment) if literals else None
+            if child is not None:
+                result = self._match(child, segments, index + 1, captures,
+                                     method, query)
+                if result is not None:
+                    return result
+            for regexp, child in patterns:
+                match = regexp.match(segment)
+                if match is not None:
+                    result = self._match(
+                        child, segments, index + 1,
+                        captures + match.groups(), method, query)
+                    if result is not None:
+                        return result
+            if variable is not None:
+                result = self._match(variable, segments, index + 1,
+                                     captures + (segment,), method, query)
+                if result is not None:
+                    return result
+        if catchall is not None:
+            return self._select(catchall,
+                                captures + ("/".join(segments[index:]),),
+                                method, query)
+        return None
+
+    def _select(self, node, captures, method, query):
+        for route in self._candidates(node, method):
+            result = self._bind(route, captures, query)
+            if result is not None:
+                return result
+        return None
+
+    def _edges(self, node):
+        raise NotImplementedError()
+
+    def _candidates(self, node, method):
+        raise NotImplementedError()
+
+    def _bind(self, route, captures, query):
+        raise NotImplementedError()
+
+
+class Router(SegmentMatcher):
+    """Segment trie which maps concrete request paths to Action-s.
+
+    Every node has literal children (dict lookup), pattern children for
+    segments which mix literals and expressions, a single-segment variable
+    child and a catch-all child for trailing {+var}. The query part of the
+    template is matched against the query string of the request.
+    """
+    def __init__(self, actions=tuple()):
+        self._root = RouterNode()
+        self._terminals = {}
+        for action in actions:
+            self.add(action)
+
+    def __len__(self):
+        return len(self._terminals)
+
+    def __contains__(self, action):
+        return action in self._terminals
+
+    def add(self, action):
+        if action.uri_template is None:
+            return
+        template = RouteTemplate(str(action.uri_template))
+        terminals = self._terminals.setdefault(action, [])
+        for variant in template.variants:
+            node = self._root
+            slots = []
+            for index, segment in enumerate(variant):
+                node = self._insert_segment(
+                    node, segment, slots, index == len(variant) - 1)
+            if node.routes is None:
+                node.routes = {}
+            node.routes.setdefault(action.request_method, []).append(
+                Route(action, tuple(slots), template))
+            terminals.append(node)
+
+    def remove(self, action):
+        for node in self._terminals.pop(action, tuple()):
+            for method, routes in list(node.routes.items()):
+                routes[:] = [r for r in routes if r.action is not action]
+                if not routes:
+                    del node.routes[method]
+
+    def _edges(self, node):
+        return node.literals, node.patterns, node.variable, node.catchall
+
+    def _candidates(self, node, method):
+        if not node.routes:
+            return tuple()
+        if method is None:
+            return (r for routes in node.routes.values() for r in routes)
+        return node.routes.get(method) or node.routes.get(None, tuple())
+
+    def _bind(self, route, captures, query):
+        variables = route.bind(captures, query)
+        if variables is None:
+            return None
+        return route.action, variables
+
+    def _insert_segment(self, node, segment, slots, last):
+        if all(op is None for op, _ in segment):
+            text = "".join(value for _, value in segment)
+            return node.literals.setdefault(text, RouterNode())
+        if len(segment) == 1 and segment[0][0] in ("", "+") and \
+                len(segment[0][1]) == 1:
+            op, (name,) = segment[0]
+            if op == "+" and last:
+                slots.append((name, True))
+                if node.catchall is None:
+                    node.catchall = RouterNode()
+                return node.catchall
+            slots.append((name, op == "+"))
+            if node.variable is None:
+                node.variable = RouterNode()
+            return node.variable
+        regexp = self._compile_segment(segment, slots)
+        for other, child in node.patterns:
+            if other.pattern == regexp:
+                return child
+        child = RouterNode()
+        node.patterns.append((re.compile(regexp), child))
+        return child
+
+    @staticmethod
+    def _compile_segment(segment, slots):
+        regexp = "^"
+        for op, value in segment:
+            if op is None:
+                regexp += re.escape(value)
+            elif op in ("", "+"):
+                regexp += "([^/,]*?)" + "(?:,([^/,]*?))?" * (len(value) - 1)
+                slots.extend((name, op == "+") for name in value)
+            elif op == ".":
+                regexp += r"(?:\.([^/.]*))?" * len(value)
+                slots.extend((name, False) for name in value)
+            elif op == ";":
+                for name in value:
+                    regexp += "(?:;%s(?:=([^/;]*))?)?" % re.escape(name)
+                    slots.append((name, False))
+        return regexp + "$"
+
+
+class FrozenRouter(SegmentMatcher):
+    """Immutable copy of Router made of tuples, strings and integers which
+    the garbage collector does not track. The nodes are the tuples
+    (literals, patterns, variable, catchall, methods) in a flat array and
+    refer to each other by index, -1 means none; methods are the pairs of
+    the HTTP method and the route indexes. A tuple which holds a dict is
+    never untracked, so the literals dicts and the compiled regular
+    expressions are kept aside and referred to by index too; the edges of
+    every node which the matching walks are resolved into a separate table
+    once. match() returns the number which the action was mapped to
+    instead of the action.
+    """
+    def __init__(self, router, numbers):
+        nodes = []
+        routes = []
+        self._literals = []
+        self._regexps = []
+        self._flatten(router._root, nodes, routes, numbers)
+        self._nodes = tuple(nodes)
+        self._routes = tuple(routes)
+        self._literals = tuple(self._literals)
+        self._regexps = tuple(self._regexps)
+        self._edges_table = tuple(self._resolve_edges(n) for n in nodes)
+        self._root = 0
+
+    def _flatten(self, node, nodes, routes, numbers):
+        if node is None:
+            return -1
+        index = len(nodes)
+        nodes.append(None)
+        literals = -1
+        if node.literals:
+            children = {text: self._flatten(child, nodes, routes, numbers)
+                        for text, child in node.literals.items()}
+            self._literals.append(children)
+            literals = len(self._literals) - 1
+        patterns = []
+        for regexp, child in node.patterns:
+            self._regexps.append(regexp)
+            patterns.append((len(self._regexps) - 1,
+                             self._flatten(child, nodes, routes, numbers)))
+        patterns = tuple(patterns)
+        variable = self._flatten(node.variable, nodes, routes, numbers)
+        catchall = self._flatten(node.catchall, nodes, routes, numbers)
+        methods = []
+        for method, items in (node.routes or {}).items():
+            indexes = []
+            for route in items:
+                indexes.append(len(routes))
+                routes.append((numbers[route.action], route.slots,
+                               tuple(route.query_names.items()),
+                               tuple(route.query_literals)))
+            if indexes:
+                methods.append((method, tuple(indexes)))
+        nodes[index] = literals, patterns, variable, catchall, tuple(methods)
+        return index
+
+    def match(self, path, method=None):
+        """Returns (action number, variables) or None if nothing matches.
+        """
+        return super(FrozenRouter, self).match(path, method)
+
+    def _resolve_edges(self, node):
+        literals, patterns, variable, catchall, _ = node
+        regexps = self._regexps
+        return (self._literals[literals] if literals >= 0 else None,
+                tuple((regexps[r], child) for r, child in patterns),
+                variable if variable >= 0 else None,
+                catchall if catchall >= 0 else None)
+
+    def _edges(self, node):
+        return self._edges_table[node]
+
+    @staticmethod
+    def _find_method(methods, method):
+        for name, routes in methods:
+            if name == method:
+                return routes
+        return tuple()
+
+    def _candidates(self, node, method):
+        methods = self._nodes[node][4]
+        if not methods:
+            return tuple()
+        if method is None:
+            return (r for _, routes in methods for r in routes)
+        return self._find_method(methods, method) or \
+            self._find_method(methods, None)
+
+    def _bind(self, route, captures, query):
+        number, slots, query_names, query_literals = self._routes[route]
+        variables = bind_variables(
+            slots, query_names, query_literals, captures, query)
+        if variables is None:
+            return None
+        return number, variables
@@ -0,0 +1,276 @@
+# -*- coding: utf-8 -*-
+"""
+API Blueprint (https://github.com/apiaryio/api-blueprint) parser which uses
+Markdown (https://pythonhosted.org/Markdown/).
+
+Released under New BSD License.
+
+Copyright © 2015, Vadim Markovtsev :: AO InvestGroup
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+    * Redistributions of source code must retain the above copyright
+      notice, this list of conditions and the following disclaimer.
+    * Redistributions in binary form must reproduce the above copyright
+      notice, this list of conditions and the following disclaimer in the
+      documentation and/or other materials provided with the distribution.
+    * Neither the name of the AO InvestGroup nor the
+      names of its contributors may be used to endorse or promote products
+      derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL VADIM MARKOVTSEV BE LIABLE FOR ANY
+DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+import asyncio
+from http.client import responses as REASONS
+import multiprocessing
+
+
+MAX_HEAD_SIZE = 64 * 1024
+ROUTE_CACHE_SIZE = 4096
+# int() accepts the signs, the spaces and the Unicode digits
+DIGITS = "0123456789"
+
+
+class MockResponse(object):
+    """HTTP response of a blueprint Response serialized to bytes once.
+    """
+    def __init__(self, status, headers=tuple(), body=b""):
+        self.status = status
+        head = "HTTP/1.1 %d %s\r\n" % (status, REASONS.get(status, "Unknown"))
+        head += "".join("%s: %s\r\n" % h for h in headers)
+        if status < 200 or status in (204, 304):
+            # RFC 7230, sections 3.3.2 and 3.3.3: 1xx, 204 and 304 never
+            # have a body, so no Content-Length either
+            body = b""
+        else:
+            head += "Content-Length: %d\r\n" % len(body)
+        self.body = body
+        # indexed by keep_alive
+        self.head = (
+            (head + "Connection: close\r\n\r\n").encode("latin-1"),
+            (head + "\r\n").encode("latin-1"))
+        self.data = tuple(h + body for h in self.head)
+
+    @staticmethod
+    def from_response(response):
+        headers = []
+        content_type = None
+        if response.headers is not None:
+            for key, value in response.headers:
+                if key.lower() == "content-length":
+                    continue
+                if key.lower() == "content-type":
+                    content_type = value
+                headers.append((key, value))
+        if content_type is None and response.media_type is not None:
+            headers.append(("Content-Type", "/".join(response.media_type)))
+        if response.body is not None and response.body.content:
+            body = response.body.content.encode("utf-8")
+        else:
+            body = b""
+        return MockResponse(response.http_code, headers, body)
+
+
+class MockEndpoint(object):
+    """The precomputed responses of an Action indexed by the status code.
+    """
+    def __init__(self, action):
+        self.responses = {}
+        for code, items in action.responses.items():
+            if items:
+                self.responses[code] = MockResponse.from_response(items[0])
+        if not self.responses:
+            self.default = MockResponse(204)
+            return
+        successful = [c for c in self.responses if 200 <= c < 300]
+        self.default = self.responses[
+            successful[0] if successful else next(iter(self.responses))]
+
+    def select(self, status):
+        if status is None:
+            return self.default
+        return self.responses.get(status, self.default)
+
+
+class MockServer(object):
+    """Answers HTTP requests with the responses documented in the blueprint.
+
+    Every action is compiled to MockEndpoint at construction time, so that
+    serving a request costs a route lookup (cached) and a single write.
+    Clients choose among the documented responses with the "Prefer:
+    status=404" header; the first 2xx response is returned otherwise.
+    """
+    def __init__(self, api):
+        self._api = api
+        self._endpoints = {a: MockEndpoint(a) for a in api.actions}
+        self._routes = {}
+        self.not_found = MockResponse(404)
+        self.method_not_allowed = MockResponse(405)
+        self.bad_request = MockResponse(400)
+        self.head_too_large = MockResponse(431)
+        self.not_implemented = MockResponse(501)
+
+    def resolve(self, method, target):
+        key = method, target
+        try:
+            return self._routes[key]
+        except KeyError:
+            pass
+        result = self._match(target, method)
+        if result is None and method == "HEAD":
+            result = self._match(target, "GET")
+        if result is None:
+            result = self.method_not_allowed \
+                if self._match(target, None) is not None else self.not_found
+        if len(self._routes) >= ROUTE_CACHE_SIZE:
+            self._routes.clear()
+        self._routes[key] = result
+        return result
+
+    def _match(self, target, method):
+        try:
+            action, _ = self._api.match(target, method)
+        except KeyError:
+            return None
+        return self._endpoints.get(action)
+
+    def respond(self, method, target, status=None):
+        endpoint = self.resolve(method, target)
+        if isinstance(endpoint, MockEndpoint):
+            return endpoint.select(status)
+        return endpoint
+
+    def protocol(self):
+        """Protocol factory for asyncio.AbstractEventLoop.create_server().
+        """
+        return MockProtocol(self)
+
+    def run(self, host="127.0.0.1", port=3000, reuse_port=None):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        server = loop.run_until_complete(loop.create_server(
+            self.protocol, host, port, reuse_port=reuse_port))
+        try:
+            loop.run_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.close()
+            loop.run_until_complete(server.wait_closed())
+            loop.close()
+
+
+class MockProtocol(asyncio.Protocol):
+    """HTTP/1.x with keep-alive and pipelining. Request bodies are skipped.
+    """
+    def __init__(self, server):
+        self._server = server
+        self._transport = None
+        self._buffer = b""
+
+    def connection_made(self, transport):
+        self._transport = transport
+
+    def connection_lost(self, exc):
+        self._transport = None
+
+    def data_received(self, data):
+        buffer = self._buffer + data if self._buffer else data
+        while buffer:
+            end = buffer.find(b"\r\n\r\n")
+            if end < 0:
+                if len(buffer) > MAX_HEAD_SIZE:
+                    self._fail(self._server.head_too_large)
+                    return
+                break
+            try:
+                method, target, version, headers = self._parse_head(
+                    buffer[:end].decode("latin-1"))
+                length = headers.get("content-length", "0")
+                if not length or length.strip(DIGITS):
+                    raise ValueError("Invalid Content-Length: %s" % length)
+                length = int(length)
+            except ValueError:
+                self._fail(self._server.bad_request)
+                return
+            if "chunked" in headers.get("transfer-encoding", ""):
+                self._fail(self._server.not_implemented)
+                return
+            if len(buffer) < end + 4 + length:
+                break
+            buffer = buffer[end + 4 + length:]
+            connection = headers.get("connection", "").lower()
+            keep_alive = int(connection != "close" if version == "HTTP/1.1"
+                             else connection == "keep-alive")
+            response = self._server.respond(
+                method, target, self._parse_prefer(headers.get("prefer")))
+            if method == "HEAD":
+                self._transport.write(response.head[keep_alive])
+            else:
+                self._transport.write(response.data[keep_alive])
+            if not keep_alive:
+                self._transport.close()
+                return
+        self._buffer = buffer
+
+    def _fail(self, response):
+        self._transport.write(response.data[0])
+        self._transport.close()
+        self._buffer = b""
+
+    @staticmethod
+    def _parse_head(head):
+        lines = head.split("\r\n")
+        method, target, version = lines[0].split(" ")
+        headers = {}
+        for line in lines[1:]:
+            key, sep, value = line.partition(":")
+            if not sep:
+                raise ValueError("Invalid header: %s" % line)
+            headers[key.strip().lower()] = value.strip()
+        return method, target, version, headers
+
+    @staticmethod
+    def _parse_prefer(prefer):
+        if not prefer:
+            return None
+        for token in prefer.replace(";", ",").split(","):
+            key, _, value = token.partition("=")
+            if key.strip().lower() == "status":
+                try:
+                    return int(value.strip().strip('"'))
+                except ValueError:
+                    return None
+        return None
+
+
+def serve(api, host="127.0.0.1", port=3000, workers=1):
+    """Serves the blueprint until interrupted. Several workers share the
+    port with SO_REUSEPORT.
+    """
+    server = MockServer(api)
+    if workers <= 1:
+        server.run(host, port)
+        return
+    processes = [multiprocessing.Process(
+        target=server.run, args=(host, port, True)) for _ in range(workers)]
+    for p in processes:
+        p.start()
+    try:
+        for p in processes:
+            p.join()
+    except KeyboardInterrupt:
+        # the workers receive SIGINT as well
+        for p in processes:
+            p.join()
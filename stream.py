@@ -0,0 +1,276 @@
+# -*- coding: utf-8 -*-
+"""
+API Blueprint (https://github.com/apiaryio/api-blueprint) parser which uses
+Markdown (https://pythonhosted.org/Markdown/).
+
+Released under New BSD License.
+
+Copyright © 2015, Vadim Markovtsev :: AO InvestGroup
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+    * Redistributions of source code must retain the above copyright
+      notice, this list of conditions and the following disclaimer.
+    * Redistributions in binary form must reproduce the above copyright
+      notice, this list of conditions and the following disclaimer in the
+      documentation and/or other materials provided with the distribution.
+    * Neither the name of the AO InvestGroup nor the
+      names of its contributors may be used to endorse or promote products
+      derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL VADIM MARKOVTSEV BE LIABLE FOR ANY
+DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+import re
+
+from six import string_types, text_type
+
+from .fastparser import BlueprintTokenizer
+from .entities import DataStructure, ResourceGroup
+from .mdparser import APIBlueprint, TitleLifter
+
+
+RESOURCE_REGEXP = re.compile(r"^(.*\[.*\]|([A-Z]+\s+)?/.*)$")
+
+
+def iterparse(source, keep=False):
+    """Parses API Blueprint incrementally and yields (event, entity) tuples
+    as soon as the entities are complete. The source is a file object or
+    any other iterable of lines, or a string.
+
+    Events: "blueprint" with the APIBlueprint once the overview is parsed,
+    then "group", "resource", "action" and "data_structure". References are
+    resolved against the entities which were parsed before; if keep is
+    True, the remaining ones are resolved in place at the end, so that the
+    entities which were yielded may change. The unresolved references are
+    reported in the diagnostics. The warnings
+    are collected in APIBlueprint.diagnostics. Unless keep is True, the
+    resources are detached from their groups after they have been yielded
+    so that the memory consumption is bounded by the largest resource;
+    otherwise, the yielded APIBlueprint is complete at the end.
+
+    This uses the fast engine (see plueprint.fastparser).
+    """
+    if isinstance(source, string_types):
+        source = source.splitlines()
+    builder = EventBuilder(keep)
+    events = _iterevents(source, builder)
+    collector = builder.api.diagnostics
+    while True:
+        # collect the warnings only while the parser runs
+        with collector.collect():
+            event = next(events, None)
+        if event is None:
+            return
+        yield event
+
+
+def _iterevents(source, builder):
+    tokenizer = BlueprintTokenizer(detach=True)
+    for line in source:
+        if not isinstance(line, text_type):
+            line = line.decode("utf-8")
+        for element in tokenizer.feed(line):
+            for event in builder.push(element):
+                yield event
+    for element in tokenizer.close():
+        for event in builder.push(element):
+            yield event
+    for event in builder.close():
+        yield event
+
+
+class EventBuilder(object):
+    """Turns the stream of top level elements into parsing events.
+    """
+    GROUP, RESOURCE, DATA_STRUCTURES = range(3)
+
+    def __init__(self, keep=False):
+        self._keep = keep
+        self._api = APIBlueprint()
+        self._api._attributes = {}
+        self._api._models = {}
+        self._preamble = []
+        # the document has a single <h1> and the headers are raised
+        self._lifted = False
+        self._kind = None
+        self._tag = None
+        self._sequence = []
+        self._group = None
+        self._chunk = []
+        # the resources and the data structures with the references to
+        # resolve at close() if keep is True
+        self._pending_resources = []
+        self._pending_structures = []
+
+    @property
+    def api(self):
+        return self._api
+
+    def push(self, element):
+        TitleLifter.lift_paragraphs(element)
+        header = APIBlueprint._is_header(element)
+        if header and self._lifted:
+            self._lift(element)
+        if self._kind is None:
+            if not header or not self._starts_section(element):
+                self._preamble.append(element)
+                return
+            if element.tag == "h2":
+                self._lifted = True
+                for item in self._preamble[2:]:
+                    self._lift(item)
+                self._lift(element)
+            self._preamble.append(element)
+            self._api._parse_preamble(self._preamble)
+            self._preamble = None
+            yield "blueprint", self._api
+        elif header and element.tag <= self._tag:
+            for event in self._flush():
+                yield event
+        else:
+            for event in self._append(element):
+                yield event
+            return
+        self._start(element)
+
+    def close(self):
+        api = self._api
+        if self._kind is None:
+            api._parse_preamble(self._preamble)
+            self._preamble = None
+            yield "blueprint", api
+        else:
+            for event in self._flush():
+                yield event
+        # the references to the entities which were parsed later
+        for name in self._pending_structures:
+            api._apply_data_structure_reference(name)
+        for resource in self._pending_resources:
+            api._apply_resource_attributes_references(resource)
+        api._reset_trie()
+        del api._attributes
+        del api._models
+
+    def _starts_section(self, element):
+        if len(self._preamble) < 2:
+            return False
+        if element.tag == "h1":
+            return True
+        if element.tag != "h2":
+            return False
+        return APIBlueprint._is_group(element) or \
+            APIBlueprint._is_data_structures(element) or \
+            RESOURCE_REGEXP.match(element.text or "") is not None
+
+    def _lift(self, element):
+        if not APIBlueprint._is_header(element):
+            return
+        if element.tag == "h1":
+            if element.text == "Data Structures":
+                self._lifted = False
+            return
+        element.tag = "h%d" % (int(element.tag[1]) - 1)
+
+    def _start(self, element):
+        self._tag = element.tag
+        if APIBlueprint._is_group(element):
+            self._kind = self.GROUP
+        elif APIBlueprint._is_data_structures(element):
+            self._kind = self.DATA_STRUCTURES
+        else:
+            self._kind = self.RESOURCE
+        self._sequence = [element]
+        self._group = None
+        self._chunk = []
+
+    def _append(self, element):
+        header = APIBlueprint._is_header(element)
+        if self._kind == self.RESOURCE:
+            self._sequence.append(element)
+        elif self._kind == self.GROUP:
+            if self._group is None:
+                if element.tag != "h2":
+                    self._sequence.append(element)
+                    return
+                for event in self._create_group():
+                    yield event
+            if self._chunk and header and element.tag <= self._chunk[0].tag:
+                for event in self._flush_resource(self._chunk, self._group):
+                    yield event
+                self._chunk = []
+            self._chunk.append(element)
+        else:
+            if len(self._sequence) > 1 and header:
+                for event in self._flush_data_structure():
+                    yield event
+            self._sequence.append(element)
+
+    def _flush(self):
+        if self._kind == self.RESOURCE:
+            return self._flush_resource(self._sequence, None)
+        if self._kind == self.DATA_STRUCTURES:
+            return self._flush_data_structure()
+        return self._flush_group()
+
+    def _flush_group(self):
+        if self._group is None:
+            for event in self._create_group():
+                yield event
+        if self._chunk:
+            for event in self._flush_resource(self._chunk, self._group):
+                yield event
+            self._chunk = []
+
+    def _create_group(self):
+        self._group = self._api._parse_resource_group(self._sequence)
+        self._sequence = []
+        yield "group", self._group
+
+    def _flush_resource(self, sequence, group):
+        api = self._api
+        if group is None:
+            # resources without a group belong to the implicit one
+            group = api._groups.get(None)
+            if group is None:
+                group = api._groups[None] = ResourceGroup(api, None, None)
+                yield "group", group
+        resource = api._parse_resource(sequence, group)
+        if resource is None:
+            return
+        resolved = api._apply_resource_attributes_references(
+            resource, not self._keep)
+        if not resolved and self._keep:
+            self._pending_resources.append(resource)
+        yield "resource", resource
+        for action in resource:
+            yield "action", action
+        if not self._keep:
+            del group._resources[resource.id]
+
+    def _flush_data_structure(self):
+        if len(self._sequence) < 2:
+            return
+        api = self._api
+        node = self._sequence[1]
+        for item in self._sequence[2:]:
+            node.append(item)
+        del self._sequence[1:]
+        attr = DataStructure.parse_from_etree(api, node)
+        api._data_structures[attr.name] = attr
+        name = attr.name
+        attr = api._apply_data_structure_reference(name, not self._keep)
+        if attr is not None:
+            yield "data_structure", attr
+        elif self._keep:
+            self._pending_structures.append(name)
@@ -31,42 +31,241 @@ ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
 SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 """
 
+import argparse
 import codecs
+import difflib
+import json
+from multiprocessing import Pool
 import os
 import sys
+import time
 
-from markdown import Markdown
+from six import text_type
 
 root = os.path.abspath(os.path.dirname(os.path.dirname(__file__)))
 if root not in sys.path:
     sys.path.insert(0, root)
 
+EXAMPLES_DIR = os.path.join(os.path.dirname(__file__), "api-blueprint",
+                            "examples")
+GOLDEN_DIR = os.path.join(os.path.dirname(__file__), "golden")
 
-def main():
-    m = Markdown(extensions=["plueprint"])
-    m.set_output_format("apiblueprint")
-    tests_dir = os.path.join(os.path.dirname(__file__), "api-blueprint",
-                             "examples")
-    skip_number = 0
-    index = 0
-    for doc in sorted(os.listdir(tests_dir)):
-        if os.path.splitext(doc)[1] != ".md" or doc == "README.md":
-            continue
-        index += 1
-        if index <= skip_number:
-            continue
-        with codecs.open(os.path.join(tests_dir, doc), "r", "utf-8") as fin:
+
+def _text(value):
+    return text_type(value) if value is not None else None
+
+
+def _attribute(attr):
+    from plueprint.entities import Attribute, Parameter
+
+    value = attr.value
+    if isinstance(value, list):
+        value = [_attribute(v) if isinstance(v, Attribute) else _text(v)
+                 for v in value]
+    else:
+        value = _text(value)
+    result = {"name": _text(attr.name), "type": _text(attr.type),
+              "required": attr.required, "value": value,
+              "description": _text(attr.description)}
+    if isinstance(attr, Parameter):
+        result["default_value"] = _text(attr.default_value)
+        result["members"] = [_text(m.name) for m in attr.members or ()]
+    return result
+
+
+def _attributes(attrs):
+    if attrs is None:
+        return None
+    return {"reference": _text(getattr(attrs, "_reference", None)),
+            "items": [_attribute(a) for a in attrs]}
+
+
+def _payload(payload):
+    if payload is None:
+        return None
+    media_type = payload.media_type
+    result = {
+        "keyword": payload.keyword, "name": _text(payload.name),
+        "media_type": "/".join(media_type) if media_type else None,
+        "description": _text(payload.description),
+        "headers": [list(p) for p in payload.headers or ()],
+        "attributes": _attributes(payload.attributes),
+        "body": _text(payload.body.content) if payload.body else None,
+        "schema": _text(payload.schema.content) if payload.schema else None,
+    }
+    requests = getattr(payload, "requests", None)
+    if requests is not None:
+        result["requests"] = [_text(r.name) for r in requests]
+    return result
+
+
+def _api_section(section):
+    return {
+        "name": _text(section.name),
+        "description": _text(section.description),
+        "request_method": section.request_method,
+        "uri_template": _text(section.uri_template),
+        "uri": section.uri,
+        "parameters": _attributes(section.parameters),
+        "attributes": _attributes(section.attributes),
+    }
+
+
+def canonical(api):
+    """Returns the serialization of the APIBlueprint which does not depend
+    on the object identities and is stable between the runs.
+    """
+    groups = []
+    for group in api:
+        resources = []
+        for resource in group:
+            actions = []
+            for action in resource:
+                item = _api_section(action)
+                item["relation"] = action.relation.link_id \
+                    if action.relation is not None else None
+                item["requests"] = [
+                    _payload(r) for r in action.requests.values()]
+                item["responses"] = [
+                    [code, [_payload(r) for r in responses]]
+                    for code, responses in action.responses.items()]
+                actions.append(item)
+            item = _api_section(resource)
+            item["model"] = _payload(resource.model)
+            item["actions"] = actions
+            resources.append(item)
+        groups.append({"name": _text(group.name),
+                       "description": _text(group.description),
+                       "resources": resources})
+    from plueprint.entities import Attribute
+
+    structures = [
+        [name, _attribute(ds) if isinstance(ds, Attribute) else _text(ds)]
+        for name, ds in api._data_structures.items()]
+    return json.dumps({
+        "name": _text(api.name), "format": _text(api.format),
+        "metadata": api.metadata, "overview": _text(api.overview),
+        "groups": groups, "data_structures": structures,
+    }, indent=1, sort_keys=True, default=text_type, ensure_ascii=False)
+
+
+def run_example(args):
+    from plueprint import parse
+
+    path, engine = args
+    start = time.time()
+    try:
+        with codecs.open(path, "r", "utf-8") as fin:
             txt = fin.read()
-        api = m.convert(txt)
-        print("-- %s --" % doc)
-        print(api)
-        try:
-            api[">"].print_resources()
-        except KeyError:
-            pass
-        print("Actions:")
-        for action in api["/"]:
-            print(action)
+        result = canonical(parse(txt, engine))
+    except Exception as e:
+        return path, None, "%s: %s" % (type(e).__name__, e), \
+            time.time() - start
+    return path, result, None, time.time() - start
+
+
+def check(path, result, golden_dir, update, allow_missing=False):
+    """Compares the serialization with the golden file. Returns the status
+    and the first lines of the difference. A missing golden file is a
+    failure unless allow_missing is set.
+    """
+    golden = os.path.join(golden_dir, os.path.splitext(
+        os.path.basename(path))[0] + ".json")
+    expected = None
+    if os.path.exists(golden):
+        with codecs.open(golden, "r", "utf-8") as fin:
+            expected = fin.read()
+    if expected == result:
+        return "ok", None
+    if update:
+        with codecs.open(golden, "w", "utf-8") as fout:
+            fout.write(result)
+        return "updated" if expected is not None else "new", None
+    if expected is None:
+        # not recorded yet, see --update
+        if allow_missing:
+            return "skipped", None
+        return "MISSING", "No golden file %s" % golden
+    diff = difflib.unified_diff(
+        expected.splitlines(), result.splitlines(), "expected", "actual",
+        lineterm="")
+    return "FAIL", "\n".join(list(diff)[:20])
+
+
+def main():
+    from plueprint.mdparser import ENGINES
+
+    parser = argparse.ArgumentParser(
+        description="Parses the API Blueprint examples in a process pool "
+                    "and compares the results with the golden files.")
+    parser.add_argument("-j", "--jobs", type=int, default=None,
+                        help="Number of parallel processes (default: the "
+                        "number of CPUs)")
+    parser.add_argument("--engine", choices=ENGINES, default="markdown",
+                        help="Parsing engine")
+    parser.add_argument("--examples", default=EXAMPLES_DIR,
+                        help="Directory with the examples")
+    parser.add_argument("--golden", default=GOLDEN_DIR,
+                        help="Directory with the golden files of every "
+                        "engine")
+    parser.add_argument("--update", action="store_true",
+                        help="Write the missing and the different golden "
+                        "files instead of failing")
+    parser.add_argument("--allow-missing", action="store_true",
+                        help="Skip the examples without a golden file "
+                        "instead of failing")
+    parser.add_argument("names", nargs="*",
+                        help="Check only these examples")
+    args = parser.parse_args()
+    if not os.path.isdir(args.examples):
+        sys.stderr.write(
+            "The examples directory %s does not exist; run \"git submodule "
+            "update --init\" or pass --examples\n" % args.examples)
+        sys.exit(2)
+    paths = [os.path.join(args.examples, doc)
+             for doc in sorted(os.listdir(args.examples))
+             if os.path.splitext(doc)[1] == ".md" and doc != "README.md" and
+             (not args.names or doc in args.names)]
+    if not paths:
+        sys.stderr.write("No examples found in %s\n" % args.examples)
+        sys.exit(2)
+    # the fast engine does not render the inline markup, so every engine
+    # has its own golden files
+    golden_dir = os.path.join(args.golden, args.engine)
+    if args.update and not os.path.isdir(golden_dir):
+        os.makedirs(golden_dir)
+    tasks = [(path, args.engine) for path in paths]
+    pool = Pool(args.jobs)
+    try:
+        results = pool.map(run_example, tasks)
+    finally:
+        pool.terminate()
+        pool.join()
+    failed = skipped = missing = 0
+    total_time = 0.0
+    for path, result, error, elapsed in results:
+        total_time += elapsed
+        if error is not None:
+            status, diff = "ERROR", error
+        else:
+            status, diff = check(path, result, golden_dir, args.update,
+                                 args.allow_missing)
+        if status == "MISSING":
+            missing += 1
+        if status in ("FAIL", "ERROR", "MISSING"):
+            failed += 1
+        elif status == "skipped":
+            skipped += 1
+        print("%-8s %7.3f s  %s" % (status, elapsed, os.path.basename(path)))
+        if diff:
+            print(diff)
+    print("%d examples, %d failed, %d skipped, %.3f s parsing" % (
+        len(results), failed, skipped, total_time))
+    if skipped or missing:
+        print("Run with --update to record the missing golden files")
+    if failed:
+        sys.exit(1)
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""
+API Blueprint (https://github.com/apiaryio/api-blueprint) parser which uses
+Markdown (https://pythonhosted.org/Markdown/).
+
+Released under New BSD License.
+
+Copyright © 2015, Vadim Markovtsev :: AO InvestGroup
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+    * Redistributions of source code must retain the above copyright
+      notice, this list of conditions and the following disclaimer.
+    * Redistributions in binary form must reproduce the above copyright
+      notice, this list of conditions and the following disclaimer in the
+      documentation and/or other materials provided with the distribution.
+    * Neither the name of the AO InvestGroup nor the
+      names of its contributors may be used to endorse or promote products
+      derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL VADIM MARKOVTSEV BE LIABLE FOR ANY
+DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+import asyncio
+import os
+import sys
+from timeit import default_timer
+import unittest
+
+root = os.path.abspath(os.path.dirname(os.path.dirname(os.path.dirname(
+    __file__))))
+if root not in sys.path:
+    sys.path.insert(0, root)
+
+
+class AsyncBlueprintParserTest(unittest.TestCase):
+    def test_cancel_frees_worker(self):
+        from plueprint import BlueprintParser
+        from plueprint.aio import AsyncBlueprintParser
+        from plueprint.benchmark import SIZES, generate
+
+        parser = BlueprintParser()
+        big = generate(**SIZES["medium"])
+        small = generate(groups=1, resources=1, actions=1)
+        start = default_timer()
+        parser.parse(big)
+        full = default_timer() - start
+
+        async def run():
+            async with AsyncBlueprintParser(parser, max_workers=1) as aparser:
+                task = asyncio.ensure_future(aparser.parse(big))
+                # the Markdown conversion takes most of the parse
+                await asyncio.sleep(full * 0.2)
+                task.cancel()
+                cancelled = default_timer()
+                api = await aparser.parse(small)
+                self.assertTrue(task.cancelled())
+                return api, default_timer() - cancelled
+
+        api, waited = asyncio.run(run())
+        self.assertEqual("Synthetic API", api.name)
+        self.assertLess(waited, full * 0.3)
+
+
+if __name__ == "__main__":
+    unittest.main()
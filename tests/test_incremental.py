@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+API Blueprint (https://github.com/apiaryio/api-blueprint) parser which uses
+Markdown (https://pythonhosted.org/Markdown/).
+
+Released under New BSD License.
+
+Copyright © 2015, Vadim Markovtsev :: AO InvestGroup
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+    * Redistributions of source code must retain the above copyright
+      notice, this list of conditions and the following disclaimer.
+    * Redistributions in binary form must reproduce the above copyright
+      notice, this list of conditions and the following disclaimer in the
+      documentation and/or other materials provided with the distribution.
+    * Neither the name of the AO InvestGroup nor the
+      names of its contributors may be used to endorse or promote products
+      derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL VADIM MARKOVTSEV BE LIABLE FOR ANY
+DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+import os
+import sys
+import unittest
+
+root = os.path.abspath(os.path.dirname(os.path.dirname(os.path.dirname(
+    __file__))))
+if root not in sys.path:
+    sys.path.insert(0, root)
+
+
+def _names(actions):
+    return sorted((a.name, a.request_method, a.uri_template)
+                  for a in actions)
+
+
+class UpdateTest(unittest.TestCase):
+    def test_moved_resource_lookups(self):
+        from plueprint import parse as parse_fresh
+        from plueprint.benchmark import generate
+        from plueprint.incremental import parse
+
+        txt = generate(groups=5, resources=6, actions=3)
+        new_txt = txt.replace("[/g3/r4/{id}]", "[/g3/r4x/{id}]")
+        self.assertNotEqual(txt, new_txt)
+        api = parse(txt)
+        api.update(new_txt)
+        fresh = parse_fresh(new_txt)
+        paths = ["/", "/g3", "/g3/r4", "/g3/r4/5", "/g3/r4x/5", "/g3/r5/1",
+                 "/g0/r0/1", "/nothing/here"]
+        for path in paths:
+            self.assertEqual(_names(fresh[path]), _names(api[path]), path)
+            for method in ("GET", "POST", "DELETE"):
+                key = "%s:%s" % (path, method)
+                self.assertEqual(_names(fresh[key]), _names(api[key]), key)
+        # falls back to the group prefix like a fresh parse
+        self.assertTrue(api["/g3/r4/5"])
+        self.assertEqual(_names(api["/g3"]), _names(api["/g3/r4/5"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+API Blueprint (https://github.com/apiaryio/api-blueprint) parser which uses
+Markdown (https://pythonhosted.org/Markdown/).
+
+Released under New BSD License.
+
+Copyright © 2015, Vadim Markovtsev :: AO InvestGroup
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+    * Redistributions of source code must retain the above copyright
+      notice, this list of conditions and the following disclaimer.
+    * Redistributions in binary form must reproduce the above copyright
+      notice, this list of conditions and the following disclaimer in the
+      documentation and/or other materials provided with the distribution.
+    * Neither the name of the AO InvestGroup nor the
+      names of its contributors may be used to endorse or promote products
+      derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL VADIM MARKOVTSEV BE LIABLE FOR ANY
+DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+import os
+import sys
+import unittest
+
+root = os.path.abspath(os.path.dirname(os.path.dirname(os.path.dirname(
+    __file__))))
+if root not in sys.path:
+    sys.path.insert(0, root)
+
+USERS = """FORMAT: 1A
+
+# Users API
+
+# Group Users
+
+## User [/users/{id}]
+
+### Get [GET]
+
++ Response 200 (application/json)
+
+        {"id": 1}
+
+## Data Structures
+
+### User Info (object)
+
++ id: 1 (number)
+"""
+
+ORDERS = """FORMAT: 1A
+
+# Orders API
+
+# Group Users
+
+## User [/users/{id}]
+
+### Delete [DELETE]
+
++ Response 204
+
+# Group Orders
+
+## Orders [/orders]
+
+### List [GET]
+
++ Response 200 (application/json)
+
+        []
+"""
+
+
+def _layout(api):
+    return [(g.name, [(r.id, r.parent.name, [
+        (a.id, a.parent.id) for a in r]) for r in g]) for g in api]
+
+
+class MergeManyTest(unittest.TestCase):
+    def setUp(self):
+        from plueprint import parse
+
+        self.api = parse(USERS)
+        self.orders = parse(ORDERS)
+        self.other = parse(ORDERS.replace("/orders", "/items").replace(
+            "Orders", "Items").replace("Delete [DELETE]", "Put [PUT]"))
+
+    def test_copy(self):
+        before = [_layout(self.orders), _layout(self.other)]
+        self.api.merge_many([self.orders, self.other])
+        self.assertEqual(before, [_layout(self.orders), _layout(self.other)])
+        self.assertEqual(["DELETE", "GET", "PUT"], sorted(
+            a.request_method for a in self.api["/users/1"]))
+        self.assertEqual(1, len(self.orders["/users/1"]))
+        self.assertEqual(1, len(self.api["/orders"]))
+        merged = next(iter(self.api["/orders"]))
+        # the parents are weak proxies which compare as their referents
+        self.assertTrue(merged.parent.parent.parent == self.api)
+        self.assertIsNot(merged, next(iter(self.orders["/orders"])))
+
+    def test_consume(self):
+        orders = next(iter(self.orders["/orders"]))
+        self.api.merge_many([self.orders, self.other], consume=True)
+        self.assertEqual(["DELETE", "GET", "PUT"], sorted(
+            a.request_method for a in self.api["/users/1"]))
+        # the entities are moved, the consumed blueprints still list them
+        # but they belong to the merged blueprint now
+        self.assertIs(orders, next(iter(self.api["/orders"])))
+        self.assertTrue(orders.parent.parent.parent == self.api)
+        self.assertTrue(orders.parent.parent == self.api._groups["Orders"])
+        self.assertFalse(
+            orders.parent.parent == self.orders._groups["Orders"])
+        self.assertTrue(orders.parent == next(iter(
+            self.orders._groups["Orders"])))
+
+
+if __name__ == "__main__":
+    unittest.main()
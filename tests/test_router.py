@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+API Blueprint (https://github.com/apiaryio/api-blueprint) parser which uses
+Markdown (https://pythonhosted.org/Markdown/).
+
+Released under New BSD License.
+
+Copyright © 2015, Vadim Markovtsev :: AO InvestGroup
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+    * Redistributions of source code must retain the above copyright
+      notice, this list of conditions and the following disclaimer.
+    * Redistributions in binary form must reproduce the above copyright
+      notice, this list of conditions and the following disclaimer in the
+      documentation and/or other materials provided with the distribution.
+    * Neither the name of the AO InvestGroup nor the
+      names of its contributors may be used to endorse or promote products
+      derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL VADIM MARKOVTSEV BE LIABLE FOR ANY
+DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+import os
+import sys
+import unittest
+
+root = os.path.abspath(os.path.dirname(os.path.dirname(os.path.dirname(
+    __file__))))
+if root not in sys.path:
+    sys.path.insert(0, root)
+
+
+class Action(object):
+    def __init__(self, request_method, uri_template):
+        self.request_method = request_method
+        self.uri_template = uri_template
+
+
+class RouterTest(unittest.TestCase):
+    def setUp(self):
+        from plueprint.router import FrozenRouter, Router
+
+        self.actions = [Action("GET", "/users/{id}"),
+                        Action("GET", "/users/{id}/orders"),
+                        Action("GET", "/files/{+path}")]
+        self.router = Router(self.actions)
+        self.frozen = FrozenRouter(self.router, {
+            action: i for i, action in enumerate(self.actions)})
+
+    def match(self, path):
+        result = self.router.match(path, "GET")
+        frozen = self.frozen.match(path, "GET")
+        if result is None:
+            self.assertIsNone(frozen)
+            return None
+        self.assertEqual((self.actions.index(result[0]), result[1]), frozen)
+        return frozen
+
+    def test_slashes(self):
+        self.assertEqual((0, {"id": "1"}), self.match("/users/1"))
+        self.assertEqual((0, {"id": "1"}), self.match("/users/1/"))
+        self.assertEqual((1, {"id": "1"}), self.match("/users/1/orders"))
+
+    def test_empty_segments(self):
+        self.assertIsNone(self.match("/users//orders"))
+        self.assertIsNone(self.match("/users//"))
+        self.assertIsNone(self.match("//users/1"))
+        self.assertEqual((2, {"path": "a//b"}), self.match("/files/a//b"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,669 @@
+# -*- coding: utf-8 -*-
+"""
+API Blueprint (https://github.com/apiaryio/api-blueprint) parser which uses
+Markdown (https://pythonhosted.org/Markdown/).
+
+Released under New BSD License.
+
+Copyright © 2015, Vadim Markovtsev :: AO InvestGroup
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+    * Redistributions of source code must retain the above copyright
+      notice, this list of conditions and the following disclaimer.
+    * Redistributions in binary form must reproduce the above copyright
+      notice, this list of conditions and the following disclaimer in the
+      documentation and/or other materials provided with the distribution.
+    * Neither the name of the AO InvestGroup nor the
+      names of its contributors may be used to endorse or promote products
+      derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL VADIM MARKOVTSEV BE LIABLE FOR ANY
+DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+from collections import Counter, namedtuple, OrderedDict
+import re
+from six import integer_types, string_types, text_type
+import weakref
+
+from . import diagnostics, entities
+from .entities import Attribute, Attributes
+
+
+ROUTE_CACHE_SIZE = 4096
+
+Violation = namedtuple("Violation", ("kind", "path", "message"))
+Exchange = namedtuple("Exchange", ("method", "path", "status", "headers",
+                                   "body"))
+
+
+def compile_response(response, data_structures=None):
+    """Returns the new ResponseValidator of the Response. Named MSON types
+    are looked up in data_structures (APIBlueprint._data_structures).
+    BlueprintValidator caches the compiled validators.
+    """
+    return ResponseValidator(response, data_structures)
+
+
+def _is_number(value):
+    return isinstance(value, integer_types + (float,)) and \
+        not isinstance(value, bool)
+
+
+def _is_integer(value):
+    return _is_number(value) and (isinstance(value, integer_types) or
+                                  value.is_integer())
+
+
+JSON_TYPES = {
+    "object": lambda v: isinstance(v, dict),
+    "array": lambda v: isinstance(v, list),
+    "string": lambda v: isinstance(v, string_types),
+    "boolean": lambda v: isinstance(v, bool),
+    "null": lambda v: v is None,
+    "number": _is_number,
+    "integer": _is_integer,
+}
+
+
+class SchemaCompiler(object):
+    """Compiles a JSON Schema into nested closures
+    validate(value, path, errors). Supported keywords: type, enum, const,
+    properties, required, additionalProperties, items, minItems, maxItems,
+    uniqueItems, minLength, maxLength, pattern, minimum, maximum,
+    exclusiveMinimum, exclusiveMaximum, allOf, anyOf, oneOf, not and local
+    $ref. The other keywords are ignored.
+    """
+    def __init__(self, root):
+        self._root = root
+        self._refs = {}
+
+    def compile(self, schema=None):
+        if schema is None:
+            schema = self._root
+        if not isinstance(schema, dict):
+            return lambda value, path, errors: None
+        checks = []
+        if "$ref" in schema:
+            checks.append(self._compile_ref(schema["$ref"]))
+        if "type" in schema:
+            checks.append(self._compile_type(schema["type"]))
+        if "enum" in schema:
+            checks.append(self._compile_enum(schema["enum"]))
+        if "const" in schema:
+            checks.append(self._compile_enum((schema["const"],)))
+        if "properties" in schema or "required" in schema or \
+                "additionalProperties" in schema:
+            checks.append(self._compile_object(schema))
+        if "items" in schema or "minItems" in schema or \
+                "maxItems" in schema or schema.get("uniqueItems"):
+            checks.append(self._compile_array(schema))
+        if "minLength" in schema or "maxLength" in schema or \
+                "pattern" in schema:
+            checks.append(self._compile_string(schema))
+        if any(k in schema for k in ("minimum", "maximum", "exclusiveMinimum",
+                                     "exclusiveMaximum")):
+            checks.append(self._compile_number(schema))
+        for key in ("allOf", "anyOf", "oneOf"):
+            if key in schema:
+                checks.append(self._compile_combination(key, schema[key]))
+        if "not" in schema:
+            checks.append(self._compile_not(schema["not"]))
+        if len(checks) == 1:
+            return checks[0]
+
+        def validate(value, path, errors):
+            for check in checks:
+                check(value, path, errors)
+
+        return validate
+
+    def _compile_ref(self, ref):
+        if not ref.startswith("#"):
+            return lambda value, path, errors: None
+        if ref not in self._refs:
+            # placeholder for the recursive references
+            self._refs[ref] = None
+            target = self._root
+            for part in ref[1:].split("/"):
+                if not part:
+                    continue
+                part = part.replace("~1", "/").replace("~0", "~")
+                try:
+                    target = target[int(part)] if isinstance(target, list) \
+                        else target[part]
+                except (KeyError, IndexError, ValueError, TypeError):
+                    raise ValueError("Unresolvable $ref: %s" % ref)
+            self._refs[ref] = self.compile(target)
+        refs = self._refs
+
+        def validate(value, path, errors):
+            refs[ref](value, path, errors)
+
+        return validate
+
+    @staticmethod
+    def _compile_type(types):
+        if isinstance(types, string_types):
+            types = types,
+        checks = [JSON_TYPES[t] for t in types if t in JSON_TYPES]
+        expected = " or ".join(types)
+
+        def validate(value, path, errors):
+            if not any(check(value) for check in checks):
+                errors.append(Violation(
+                    "schema", path, "expected %s" % expected))
+
+        return validate
+
+    @staticmethod
+    def _compile_enum(values):
+        values = list(values)
+
+        def validate(value, path, errors):
+            # True == 1 in Python, but not in JSON
+            if not any(value == v and type(value) is type(v) or
+                       _is_number(value) and _is_number(v) and value == v
+                       for v in values):
+                errors.append(Violation(
+                    "schema", path, "%r is not one of %r" % (value, values)))
+
+        return validate
+
+    def _compile_object(self, schema):
+        properties = [(name, self.compile(sub)) for name, sub in
+                      schema.get("properties", {}).items()]
+        names = set(schema.get("properties", {}))
+        required = schema.get("required", ())
+        additional = schema.get("additionalProperties", True)
+        if isinstance(additional, dict):
+            additional = self.compile(additional)
+
+        def validate(value, path, errors):
+            if not isinstance(value, dict):
+                return
+            for name in required:
+                if name not in value:
+                    errors.append(Violation(
+                        "schema", path, "missing property \"%s\"" % name))
+            for name, check in properties:
+                if name in value:
+                    check(value[name], "%s/%s" % (path, name), errors)
+            if additional is True:
+                return
+            for name in value:
+                if name in names:
+                    continue
+                if additional is False:
+                    errors.append(Violation(
+                        "schema", path, "unexpected property \"%s\"" % name))
+                else:
+                    additional(value[name], "%s/%s" % (path, name), errors)
+
+        return validate
+
+    def _compile_array(self, schema):
+        items = schema.get("items")
+        if isinstance(items, list):
+            items = [self.compile(s) for s in items]
+        elif items is not None:
+            items = self.compile(items)
+        min_items = schema.get("minItems")
+        max_items = schema.get("maxItems")
+        unique = schema.get("uniqueItems", False)
+
+        def validate(value, path, errors):
+            if not isinstance(value, list):
+                return
+            if min_items is not None and len(value) < min_items:
+                errors.append(Violation(
+                    "schema", path, "fewer than %d items" % min_items))
+            if max_items is not None and len(value) > max_items:
+                errors.append(Violation(
+                    "schema", path, "more than %d items" % max_items))
+            if unique and len(set(repr(v) for v in value)) < len(value):
+                errors.append(Violation(
+                    "schema", path, "items are not unique"))
+            if isinstance(items, list):
+                for i, (item, check) in enumerate(zip(value, items)):
+                    check(item, "%s/%d" % (path, i), errors)
+            elif items is not None:
+                for i, item in enumerate(value):
+                    items(item, "%s/%d" % (path, i), errors)
+
+        return validate
+
+    @staticmethod
+    def _compile_string(schema):
+        min_length = schema.get("minLength")
+        max_length = schema.get("maxLength")
+        pattern = schema.get("pattern")
+        if pattern is not None:
+            try:
+                pattern = re.compile(pattern)
+            except re.error as e:
+                raise ValueError("Invalid pattern %s: %s" % (pattern, e))
+
+        def validate(value, path, errors):
+            if not isinstance(value, string_types):
+                return
+            if min_length is not None and len(value) < min_length:
+                errors.append(Violation(
+                    "schema", path, "shorter than %d" % min_length))
+            if max_length is not None and len(value) > max_length:
+                errors.append(Violation(
+                    "schema", path, "longer than %d" % max_length))
+            if pattern is not None and pattern.search(value) is None:
+                errors.append(Violation(
+                    "schema", path, "does not match %s" % pattern.pattern))
+
+        return validate
+
+    @staticmethod
+    def _compile_number(schema):
+        bounds = []
+        for key, fails in (("minimum", lambda v, b: v < b),
+                           ("maximum", lambda v, b: v > b),
+                           ("exclusiveMinimum", lambda v, b: v <= b),
+                           ("exclusiveMaximum", lambda v, b: v >= b)):
+            bound = schema.get(key)
+            # draft 4 booleans modify minimum and maximum
+            if isinstance(bound, bool):
+                if bound:
+                    base = schema.get(key[len("exclusive"):].lower())
+                    if base is not None:
+                        bounds.append((key, base, fails))
+            elif bound is not None:
+                bounds.append((key, bound, fails))
+
+        def validate(value, path, errors):
+            if not _is_number(value):
+                return
+            for key, bound, fails in bounds:
+                if fails(value, bound):
+                    errors.append(Violation(
+                        "schema", path, "violates %s %s" % (key, bound)))
+
+        return validate
+
+    def _compile_combination(self, key, schemas):
+        checks = [self.compile(s) for s in schemas]
+
+        def validate(value, path, errors):
+            results = []
+            for check in checks:
+                errs = []
+                check(value, path, errs)
+                results.append(errs)
+            passed = sum(1 for errs in results if not errs)
+            if key == "allOf":
+                for errs in results:
+                    errors.extend(errs)
+            elif key == "anyOf" and not passed:
+                errors.append(Violation(
+                    "schema", path, "matches none of anyOf"))
+            elif key == "oneOf" and passed != 1:
+                errors.append(Violation(
+                    "schema", path, "matches %d of oneOf" % passed))
+
+        return validate
+
+    def _compile_not(self, schema):
+        check = self.compile(schema)
+
+        def validate(value, path, errors):
+            errs = []
+            check(value, path, errs)
+            if not errs:
+                errors.append(Violation("schema", path, "matches not"))
+
+        return validate
+
+
+MSON_TYPES = {
+    "string": JSON_TYPES["string"],
+    "number": JSON_TYPES["number"],
+    "boolean": JSON_TYPES["boolean"],
+    "object": JSON_TYPES["object"],
+    "array": JSON_TYPES["array"],
+}
+
+
+class MSONCompiler(object):
+    """Compiles the MSON attributes into validate(value, path, errors)
+    closures. The sample values are not checked, only the structure: the
+    types, the required members and the enumerations. Named types are
+    resolved in data_structures, which maps the names to DataStructure-s or
+    Attributes; the unknown types match anything.
+    """
+    def __init__(self, data_structures=None):
+        self._data_structures = data_structures or {}
+        self._named = {}
+
+    def compile_attributes(self, attributes):
+        if attributes._reference is not None and not len(attributes):
+            return self.compile_type(attributes._reference, None)
+        return self._compile_members(list(attributes))
+
+    def compile_type(self, type_, children):
+        if not isinstance(children, list):
+            # sample value
+            children = None
+        tokens = [t.strip() for t in (type_ or "object").split(",")]
+        base = tokens[0]
+        nullable = "nullable" in tokens
+        checks = []
+        if base.startswith("array"):
+            checks.append(self._compile_array(base))
+        elif base.startswith("enum"):
+            checks.append(self._compile_enum(base, children))
+            children = None
+        elif base in MSON_TYPES:
+            checks.append(self._compile_primitive(base))
+        else:
+            checks.append(self._compile_named(base))
+        if children and not base.startswith("array"):
+            checks.append(self._compile_members(children))
+
+        def validate(value, path, errors):
+            if value is None and nullable:
+                return
+            for check in checks:
+                check(value, path, errors)
+
+        return validate
+
+    def _compile_members(self, children):
+        members = [(a.name, a.required, self.compile_type(a.type, a.value))
+                   for a in children
+                   if isinstance(a, Attribute) and a.name is not None]
+
+        def validate(value, path, errors):
+            if not isinstance(value, dict):
+                errors.append(Violation("attributes", path, "expected object"))
+                return
+            for name, required, check in members:
+                try:
+                    member = value[name]
+                except KeyError:
+                    if required:
+                        errors.append(Violation(
+                            "attributes", path,
+                            "missing member \"%s\"" % name))
+                    continue
+                check(member, "%s/%s" % (path, name), errors)
+
+        return validate
+
+    @staticmethod
+    def _compile_primitive(base):
+        check = MSON_TYPES[base]
+
+        def validate(value, path, errors):
+            if not check(value):
+                errors.append(Violation(
+                    "attributes", path, "expected %s" % base))
+
+        return validate
+
+    def _compile_array(self, base):
+        try:
+            subtype = Attribute.extract_array_subtype(base)
+        except ValueError:
+            subtype = "object"
+        items = self.compile_type(subtype, None) \
+            if subtype != "object" else None
+
+        def validate(value, path, errors):
+            if not isinstance(value, list):
+                errors.append(Violation("attributes", path, "expected array"))
+                return
+            if items is not None:
+                for i, item in enumerate(value):
+                    items(item, "%s/%d" % (path, i), errors)
+
+        return validate
+
+    @staticmethod
+    def _compile_enum(base, children):
+        if not children:
+            return lambda value, path, errors: None
+        allowed = set()
+        for child in children:
+            if isinstance(child, Attribute):
+                allowed.add(child.name)
+                if isinstance(child.value, string_types):
+                    allowed.add(child.value)
+        allowed.discard(None)
+
+        def validate(value, path, errors):
+            if isinstance(value, bool):
+                text = "true" if value else "false"
+            else:
+                text = "%s" % (value,)
+            if text not in allowed:
+                errors.append(Violation(
+                    "attributes", path,
+                    "%r is not one of %s" % (value, sorted(allowed))))
+
+        return validate
+
+    def _compile_named(self, name):
+        named = self._named
+        if name not in named:
+            named[name] = None
+            ds = self._data_structures.get(name)
+            if isinstance(ds, Attributes):
+                check = self._compile_members(list(ds))
+            elif ds is not None:
+                check = self.compile_type(ds.type, ds.value)
+            else:
+                check = None
+            named[name] = check
+
+        def validate(value, path, errors):
+            check = named[name]
+            if check is not None:
+                check(value, path, errors)
+
+        return validate
+
+
+class ResponseValidator(object):
+    """Checks the recorded HTTP responses against a Response: the status
+    code, the headers, the media type, the Schema asset and the MSON
+    attributes. Compiled once, see compile_response().
+    """
+    def __init__(self, response, data_structures=None):
+        self.status = response.http_code
+        self.media_type = None
+        self.headers = OrderedDict()
+        for key, value in response.headers or tuple():
+            if key.lower() == "content-type":
+                self.media_type = self._media_type(value)
+            else:
+                self.headers[key.lower()] = value
+        if response.media_type is not None:
+            self.media_type = "/".join(response.media_type).lower()
+        self.checks = []
+        if response.schema is not None and response.schema.content:
+            try:
+                schema = entities.json_loads(
+                    text_type(response.schema.content))
+                self.checks.append(SchemaCompiler(schema).compile())
+            except ValueError as e:
+                diagnostics.warn("invalid-schema", response, e)
+        if response.attributes is not None:
+            self.checks.append(MSONCompiler(
+                data_structures).compile_attributes(response.attributes))
+
+    @staticmethod
+    def _media_type(value):
+        return value.split(";")[0].strip().lower()
+
+    def validate(self, status, headers, body, check_header_values=True):
+        """Returns the list of Violation-s. headers is a dict with lower
+        case keys.
+        """
+        errors = []
+        if status != self.status:
+            errors.append(Violation(
+                "status", "", "expected %d, got %d" % (self.status, status)))
+        for key, value in self.headers.items():
+            actual = headers.get(key)
+            if actual is None:
+                errors.append(Violation("header", key, "missing"))
+            elif check_header_values and actual != value:
+                errors.append(Violation(
+                    "header", key, "expected \"%s\", got \"%s\"" % (
+                        value, actual)))
+        media_type = None
+        if self.media_type is not None:
+            media_type = self._media_type(headers.get("content-type", ""))
+            if media_type != self.media_type:
+                errors.append(Violation(
+                    "media_type", "", "expected %s, got %s" % (
+                        self.media_type, media_type or "nothing")))
+        if self.checks and (media_type or self.media_type or "").endswith(
+                "json"):
+            try:
+                value = entities.json_loads(body)
+            except ValueError as e:
+                errors.append(Violation("body", "", "invalid JSON: %s" % e))
+            else:
+                for check in self.checks:
+                    check(value, "", errors)
+        return errors
+
+
+class ValidationReport(object):
+    """Compact summary of the violations: the counts per (route, status,
+    kind, path) and a few sample messages for each.
+    """
+    def __init__(self, samples=3):
+        self.total = 0
+        self.failed = 0
+        self.counts = Counter()
+        self.samples = {}
+        self._max_samples = samples
+
+    @property
+    def passed(self):
+        return self.total - self.failed
+
+    def add(self, route, status, violations):
+        self.total += 1
+        if not violations:
+            return
+        self.failed += 1
+        for v in violations:
+            key = route, status, v.kind, v.path
+            self.counts[key] += 1
+            samples = self.samples.setdefault(key, [])
+            if len(samples) < self._max_samples:
+                samples.append(v.message)
+
+    def __str__(self):
+        lines = ["%d exchanges, %d passed, %d failed" % (
+            self.total, self.passed, self.failed)]
+        for key, count in self.counts.most_common():
+            route, status, kind, path = key
+            lines.append("%8d  %s %s %s %s: %s" % (
+                count, route, status, kind, path or "/",
+                "; ".join(self.samples[key])))
+        return "\n".join(lines)
+
+
+class BlueprintValidator(object):
+    """Validates the recorded exchanges against the blueprint: every
+    exchange is routed to the action with APIBlueprint.match() and checked
+    with the compiled validators of the responses documented for its status.
+    """
+    def __init__(self, api, check_header_values=True):
+        self._api = api
+        self._check_header_values = check_header_values
+        self._routes = {}
+        # the named types, resolved the same way as in APIBlueprint
+        self._types = dict(api._data_structures)
+        for r in api.resources:
+            if r.name is not None and r.attributes is not None:
+                self._types[r.name] = r.attributes
+        # compiled ResponseValidator-s, they depend on self._types
+        self._validators = weakref.WeakKeyDictionary()
+
+    def _resolve(self, method, path):
+        key = method, path
+        try:
+            return self._routes[key]
+        except KeyError:
+            pass
+        try:
+            action, _ = self._api.match(path, method)
+        except KeyError:
+            action = None
+        if len(self._routes) >= ROUTE_CACHE_SIZE:
+            self._routes.clear()
+        self._routes[key] = action
+        return action
+
+    def _compile(self, response):
+        try:
+            return self._validators[response]
+        except KeyError:
+            validator = self._validators[response] = compile_response(
+                response, self._types)
+            return validator
+
+    def validate(self, method, path, status, headers, body):
+        """Returns (action, violations). action is None if the request
+        does not match any.
+        """
+        action = self._resolve(method, path)
+        if action is None:
+            return None, [Violation(
+                "route", path, "no action for %s %s" % (method, path))]
+        if isinstance(headers, dict):
+            headers = {k.lower(): v for k, v in headers.items()}
+        else:
+            headers = {k.lower(): v for k, v in headers}
+        responses = action.responses.get(status)
+        if not responses:
+            return action, [Violation(
+                "status", "", "status %d is not documented" % status)]
+        first = None
+        for response in responses:
+            errors = self._compile(response).validate(
+                status, headers, body, self._check_header_values)
+            if not errors:
+                return action, errors
+            if first is None:
+                first = errors
+        return action, first
+
+    def validate_many(self, exchanges, samples=3):
+        """Validates the iterable of Exchange-s or (method, path, status,
+        headers, body) tuples and returns ValidationReport.
+        """
+        report = ValidationReport(samples)
+        for method, path, status, headers, body in exchanges:
+            action, errors = self.validate(method, path, status, headers, body)
+            if action is None:
+                route = "%s %s" % (method, path)
+            else:
+                route = "%s %s" % (action.request_method, action.uri_template)
+            report.add(route, status, errors)
+        return report
+
+
+def validate_many(api, exchanges, samples=3, check_header_values=True):
+    return BlueprintValidator(api, check_header_values).validate_many(
+        exchanges, samples)